@@ -0,0 +1,74 @@
+# app/blob_upload.py
+"""Chunked, parallel block upload for Azure-style block blobs.
+
+The source is read in fixed-size chunks and each chunk is staged as its own
+block; at most ``max_concurrency`` blocks are in flight at once, so memory per
+upload stays around ``chunk_size * max_concurrency``. The (blocking) SDK calls
+run in worker threads so the event loop keeps serving other requests.
+"""
+from __future__ import annotations
+import asyncio
+from typing import Any, Protocol
+
+
+class AsyncReader(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+
+def _block_id(index: int) -> str:
+    # Block ids must all have the same length within a blob; the SDK base64s them.
+    return f"{index:08d}"
+
+
+async def upload_in_blocks(
+    blob_client: Any,
+    source: AsyncReader,
+    *,
+    chunk_size: int,
+    max_concurrency: int,
+    content_settings: Any = None,
+) -> int:
+    """Stage ``source`` block by block, then commit the block list. Returns bytes written.
+
+    ``blob_client`` only needs ``stage_block`` and ``commit_block_list``
+    (``azure.storage.blob.BlobClient`` or a test double).
+    """
+    slots = asyncio.Semaphore(max_concurrency)
+    block_ids: list[str] = []
+    tasks: list[asyncio.Task] = []
+    failed: list[BaseException] = []
+    total = 0
+
+    async def _stage(block_id: str, data: bytes) -> None:
+        try:
+            await asyncio.to_thread(blob_client.stage_block, block_id=block_id, data=data)
+        except BaseException as exc:
+            failed.append(exc)
+            raise
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            # Wait for a free slot *before* reading, which is what bounds memory.
+            await slots.acquire()
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                slots.release()
+                break
+            block_id = _block_id(len(block_ids))
+            block_ids.append(block_id)
+            total += len(chunk)
+            tasks.append(asyncio.create_task(_stage(block_id, chunk)))
+            # Surface a failed block early instead of reading the rest of the file.
+            if failed:
+                raise failed[0]
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    await asyncio.to_thread(blob_client.commit_block_list, block_ids, content_settings=content_settings)
+    return total
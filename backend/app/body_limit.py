@@ -0,0 +1,66 @@
+# app/body_limit.py
+"""Request body size limits, as a plain ASGI middleware.
+
+Limits are per route (``"METHOD /path/{param}"`` templates, matched like
+Starlette routes, trailing slash optional) with a default for any other
+request that carries a body. A declared ``Content-Length`` over the limit is
+refused before the app runs; otherwise ``receive`` counts bytes as they
+stream in and raises 413 the moment the limit is crossed, so chunked
+transfer encoding gets no way around it. Requests without a limit (GET,
+HEAD, websockets...) are handed to the app untouched.
+"""
+from __future__ import annotations
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+
+def _strip(path: str) -> str:
+    return path.rstrip("/") or "/"
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app: ASGIApp, limits: dict[str, int] | None = None, default: int | None = None):
+        self.app = app
+        self.default = default
+        self.rules = []
+        for rule, limit in (limits or {}).items():
+            method, path = rule.split(" ", 1)
+            self.rules.append((method.upper(), compile_path(_strip(path))[0], limit))
+
+    def limit_for(self, method: str, path: str) -> int | None:
+        path = _strip(path)
+        for rule_method, regex, limit in self.rules:
+            if rule_method == method and regex.match(path):
+                return limit
+        return self.default if method in BODY_METHODS else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.limit_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await JSONResponse({"detail": "Request body too large"}, status_code=413)(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # an HTTPException passes through FastAPI's body parsing and
+                    # becomes the 413 response in ExceptionMiddleware
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
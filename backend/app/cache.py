@@ -0,0 +1,75 @@
+# app/cache.py
+"""Small in-process caches shared by the request path."""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    With ``maxweight``, entries are also evicted once the summed ``weigh(value)``
+    (e.g. byte length) would exceed it.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, maxweight: int | None = None, weigh: Callable[[Any], int] = len):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.maxweight, self._weigh = maxweight, weigh
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.weight = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, value = self._data.pop(key)
+        if self.maxweight is not None:
+            self.weight -= self._weigh(value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        if self.maxweight is not None and self._weigh(value) > self.maxweight:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, value)
+            if self.maxweight is not None:
+                self.weight += self._weigh(value)
+            while len(self._data) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                   "evictions": self.evictions}
+            if self.maxweight is not None:
+                out.update(weight=self.weight, maxweight=self.maxweight)
+            return out
@@ -0,0 +1,126 @@
+# app/cli.py
+"""Maintenance commands: python -m app.cli <command>"""
+import argparse
+import asyncio
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+from . import crud, processing, ranking, search, similar, upload_gc
+from .database import DATABASE_URL, Base, SessionLocal, add_missing_columns, engine
+from .settings import settings
+
+
+def rebuild_rating_stats(args):
+    db = SessionLocal()
+    try:
+        n = crud.rebuild_rating_stats(db)
+    finally:
+        db.close()
+    print(f"rebuilt rating stats for {n} videos")
+
+
+def rebuild_search_index(args):
+    db = SessionLocal()
+    try:
+        n = search.rebuild(db)
+    finally:
+        db.close()
+    print(f"rebuilt search index for {n} videos")
+
+
+def process_videos(args):
+    db = SessionLocal()
+    try:
+        ids = args.ids or crud.get_video_ids_by_status(db, args.status.split(","))
+    finally:
+        db.close()
+
+    async def run():
+        # explicit runs process even with MEDIA_PROCESSING_ENABLED=false (which only skips it on upload)
+        await asyncio.gather(*(processing.process_video(video_id) for video_id in ids))
+    asyncio.run(run())
+    print(f"processed {len(ids)} videos")
+
+
+def gc_uploads(args):
+    print(f"removed {asyncio.run(upload_gc.collect())} abandoned upload sessions")
+    print(f"removed {asyncio.run(upload_gc.collect_blobs())} unreferenced blobs")
+
+
+def rank_videos(args):
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            ranking.rebuild(db)
+        passes = 1
+        while ranking.refresh_scores(db):  # None (a running app's pass won) just ends this run
+            passes += 1
+    finally:
+        db.close()
+    print(f"ranked videos in {passes} pass(es)")
+
+
+def similar_videos(args):
+    if not similar.available():
+        raise SystemExit("similar-videos needs numpy and scipy (pip install numpy scipy)")
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            similar.rebuild(db)
+        n = similar.refresh_lists(db)
+    finally:
+        db.close()
+    print("a running app's pass won; nothing written" if n is None else f"updated {n} similar-video lists")
+
+
+def replicate_sqlite(args):
+    """Stand-in replicator for trying DATABASE_READ_URL locally: snapshot the primary file into the replica."""
+    target = args.to or settings.DATABASE_READ_URL
+    if not (DATABASE_URL.startswith("sqlite") and target.startswith("sqlite")):
+        raise SystemExit("replicate-sqlite needs SQLite DATABASE_URL and replica URL (--to or DATABASE_READ_URL)")
+    primary, replica = make_url(DATABASE_URL).database, make_url(target).database
+    while True:
+        src = sqlite3.connect(f"file:{primary}?mode=ro", uri=True)
+        dst = sqlite3.connect(replica)
+        try:
+            src.backup(dst)  # consistent copy; replica readers see it at their next transaction
+        finally:
+            src.close(); dst.close()
+        if args.once:
+            break
+        time.sleep(args.interval)
+    print(f"replicated {primary} -> {replica}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild-rating-stats", help="recompute video_rating_stats from ratings").set_defaults(func=rebuild_rating_stats)
+    sub.add_parser("rebuild-search-index", help="repopulate the video full-text index").set_defaults(func=rebuild_search_index)
+    proc = sub.add_parser("process-videos", help="run the post-upload pipeline (faststart, probe, checksum)")
+    proc.add_argument("ids", nargs="*", type=int, help="video ids (default: by --status)")
+    proc.add_argument("--status", default="pending,processing,failed")
+    proc.set_defaults(func=process_videos)
+    sub.add_parser("gc-uploads", help="drop resumable uploads idle past UPLOAD_SESSION_TTL_HOURS and unreferenced blobs").set_defaults(func=gc_uploads)
+    rank = sub.add_parser("rank-videos", help="fold new activity into the trending/top scores")
+    rank.add_argument("--rebuild", action="store_true", help="recompute from scratch (drops view history)")
+    rank.set_defaults(func=rank_videos)
+    sim = sub.add_parser("similar-videos", help="fold rating changes into the similar-video lists")
+    sim.add_argument("--rebuild", action="store_true", help="recompute every list")
+    sim.set_defaults(func=similar_videos)
+    rep = sub.add_parser("replicate-sqlite", help="copy the SQLite primary to the replica file (local stand-in for replication)")
+    rep.add_argument("--to", default="", help="replica URL (default: DATABASE_READ_URL)")
+    rep.add_argument("--interval", type=float, default=1.0, help="seconds between copies, i.e. simulated lag")
+    rep.add_argument("--once", action="store_true")
+    rep.set_defaults(func=replicate_sqlite)
+    args = parser.parse_args(argv)
+    if settings.is_dev:
+        Base.metadata.create_all(bind=engine)  # same bootstrap as the app, for an older dev.db
+        add_missing_columns(engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from . import models, schemas
+from sqlalchemy import func, or_, and_, case, delete, insert, select
+from . import models, schemas, search
 from pydantic import EmailStr
 from .utils import hash_password
+from datetime import datetime
+
+def _out_columns(schema, model) -> list:
+    """``model``'s columns for the fields of ``schema`` (an ``*Out`` schema), in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+def _dicts(db: Session, stmt) -> list[dict]:
+    """Plain dicts keyed by column label, ready for app/fastjson.py (no ORM objects, no per-row models)."""
+    return [row._asdict() for row in db.execute(stmt)]
+
+def chunked(ids: list[int], n: int = 500):
+    """``ids`` in slices of ``n``, so ``IN (...)`` lists stay under the drivers' parameter limits."""
+    for i in range(0, len(ids), n):
+        yield ids[i:i + n]
+
+def _attach(db: Session, obj):
+    """Bring an object loaded by another session (e.g. a read-only one) into ``db`` without re-selecting it."""
+    return obj if obj in db else db.merge(obj, load=False)
 
 # Users
 def get_user_by_email(db: Session, email: EmailStr):
@@ -12,8 +31,9 @@ def get_user_by_email(db: Session, email: EmailStr):
 def get_user_by_username(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_pw = hash_password(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str | None = None):
+    # async callers hash on the dedicated pool and pass the result in
+    hashed_pw = hashed_password or hash_password(user.password)
 
    
     incoming_role = getattr(user, "role", None)         
@@ -29,27 +49,271 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def set_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(models.User).filter(models.User.user_id == user_id).update({"hashed_password": hashed_password})
+    db.commit()
+
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.user_id == user_id).first()
 
 def get_users(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.User).offset(skip).limit(limit).all()
 
+def get_user_rows(db: Session, skip: int = 0, limit: int = 10):
+    """``get_users`` as ``UserOut``-shaped dicts."""
+    return _dicts(db, select(*_out_columns(schemas.UserOut, models.User)).offset(skip).limit(limit))
+
+def update_user(db: Session, db_user: models.User, changes: dict):
+    db_user = _attach(db, db_user)
+    for k, v in changes.items():
+        setattr(db_user, k, v)
+    db.commit(); db.refresh(db_user)
+    return db_user
+
+def delete_user(db: Session, db_user: models.User):
+    """Delete a user with their videos, comments and ratings; returns the blob_uris to remove from storage.
+
+    Children are deleted here rather than left to ON DELETE CASCADE, which SQLite
+    only applies with ``PRAGMA foreign_keys`` on.
+    """
+    discount_user_ratings(db, db_user.user_id)
+    orphans = [_delete_video_rows(db, video) for video in db.query(models.Video).filter_by(creator_id=db_user.user_id).all()]
+    db.query(models.Comment).filter_by(user_id=db_user.user_id).delete(synchronize_session=False)
+    db.query(models.Rating).filter_by(user_id=db_user.user_id).delete(synchronize_session=False)
+    db.delete(_attach(db, db_user)); db.commit()
+    return [uri for uri in orphans if uri]
+
+# Blobs (content-addressed, shared between videos)
+def get_blob_by_sha256(db: Session, sha256: str):
+    return db.query(models.Blob).filter(models.Blob.sha256 == sha256).first()
+
+def _acquire_blob(db: Session, blob_url: str | None, sha256: str | None, size: int | None):
+    """Take a reference on the blob holding ``sha256``, registering ``blob_url`` if the content is new.
+
+    ``blob_url`` may be None when the caller skipped the transfer because the
+    content was already stored; LookupError if that blob has gone since.
+    """
+    B = models.Blob
+    if sha256:
+        if db.query(B).filter(B.sha256 == sha256).update({B.refcount: B.refcount + 1}, synchronize_session=False):
+            return db.query(B).filter(B.sha256 == sha256).one()
+    if blob_url is None:
+        raise LookupError(sha256)
+    blob = B(sha256=sha256, blob_uri=blob_url, size=size, refcount=1)
+    try:
+        with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # the same content was registered concurrently: share that one
+        return _acquire_blob(db, None, sha256, size)
+    return blob
+
+def _release_blob(db: Session, blob_id: int, n: int = 1):
+    """Drop ``n`` references; returns the blob if nothing references it any more."""
+    B = models.Blob
+    db.query(B).filter(B.blob_id == blob_id).update({B.refcount: B.refcount - n}, synchronize_session=False)
+    return db.query(B).filter(B.blob_id == blob_id, B.refcount <= 0).first()
+
+def drop_unreferenced_blobs(db: Session, limit: int = 500):
+    """Delete blob rows left at refcount 0 (blob_uri edits); returns their URIs for storage cleanup."""
+    B, uris = models.Blob, []
+    for blob_id, blob_uri in db.query(B.blob_id, B.blob_uri).filter(B.refcount <= 0).limit(limit).all():
+        # re-checked per row: an upload may have picked the blob up again meanwhile
+        if db.query(B).filter(B.blob_id == blob_id, B.refcount <= 0).delete(synchronize_session=False):
+            uris.append(blob_uri)
+    db.commit()
+    return uris
+
 # Videos
-def create_video(db: Session, video: schemas.VideoCreate, creator_id: int, blob_url: str):
+def create_video(db: Session, video: schemas.VideoCreate, creator_id: int, blob_url: str | None,
+                 sha256: str | None = None, size: int | None = None):
+    """``sha256``/``size`` describe the uploaded bytes; identical content shares one blob.
+
+    The returned video's ``blob_uri`` may differ from ``blob_url`` when the same
+    content was stored concurrently; the caller then deletes its own copy.
+    """
+    blob = _acquire_blob(db, blob_url, sha256, size)
     db_video = models.Video(
         title=video.title, publisher=video.publisher, producer=video.producer,
-        genre=video.genre, age_rating=video.age_rating, blob_uri=blob_url,
+        genre=video.genre, age_rating=video.age_rating, blob_uri=blob.blob_uri, blob_id=blob.blob_id,
         creator_id=creator_id,
     )
-    db.add(db_video); db.commit(); db.refresh(db_video)
+    db.add(db_video)
+    search.index_video(db, db_video)
+    db.commit(); db.refresh(db_video)
     return db_video
 
 def get_video(db: Session, video_id: int):
     return db.query(models.Video).filter(models.Video.video_id == video_id).first()
 
-def get_videos(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Video).order_by(models.Video.upload_date.desc()).offset(skip).limit(limit).all()
+def update_video(db: Session, db_video: models.Video, changes: dict):
+    db_video = _attach(db, db_video)
+    if db_video.blob_id is not None and changes.get("blob_uri", db_video.blob_uri) != db_video.blob_uri:
+        _release_blob(db, db_video.blob_id)  # an orphan is removed by the GC sweep
+        db_video.blob_id = None
+    for k, v in changes.items():
+        setattr(db_video, k, v)
+    if changes.keys() & set(search.FIELDS):
+        search.index_video(db, db_video)
+    db.commit(); db.refresh(db_video)
+    return db_video
+
+def delete_video(db: Session, db_video: models.Video):
+    """Returns the blob_uri to remove from storage, or None while other videos still share the blob.
+
+    Only a blob row whose last reference this was is ever removed: a bare ``blob_uri``
+    (set through ``update_video``, or a pre-dedup row) may point at anything, so it is left alone.
+    """
+    orphan = _delete_video_rows(db, _attach(db, db_video))
+    db.commit()
+    return orphan
+
+def _delete_video_rows(db: Session, db_video: models.Video):
+    blob = _release_blob(db, db_video.blob_id) if db_video.blob_id is not None else None
+    orphan = blob and blob.blob_uri
+    search.remove_video(db, db_video.video_id)
+    for model in (models.VideoScore, models.Comment, models.Rating):
+        db.query(model).filter_by(video_id=db_video.video_id).delete(synchronize_session=False)
+    N = models.VideoNeighbor
+    db.query(N).filter(or_(N.video_id == db_video.video_id, N.neighbor_id == db_video.video_id)).delete(synchronize_session=False)
+    db.delete(db_video); db.flush()
+    if blob:
+        db.delete(blob)
+    return orphan
+
+def set_video_processing(db: Session, video_id: int, changes: dict):
+    """Apply pipeline state/results; returns the video's blob_uri, or None if it no longer exists."""
+    V = models.Video
+    if not db.query(V).filter(V.video_id == video_id).update(changes, synchronize_session=False):
+        return None
+    blob_uri = db.query(V.blob_uri).filter(V.video_id == video_id).scalar()
+    db.commit()
+    return blob_uri
+
+PROCESSED_FIELDS = ("duration_seconds", "width", "height", "bitrate", "size_bytes", "checksum_sha256")
+
+def copy_processing_from_shared_blob(db: Session, video_id: int) -> bool:
+    """Reuse pipeline results of a ready video on the same blob; False if there is none."""
+    V = models.Video
+    blob_id = db.query(V.blob_id).filter(V.video_id == video_id).scalar()
+    done = blob_id is not None and db.query(*(getattr(V, f) for f in PROCESSED_FIELDS)).filter(
+        V.blob_id == blob_id, V.video_id != video_id, V.processing_status == "ready").first()
+    if not done:
+        return False
+    db.query(V).filter(V.video_id == video_id).update({**done._asdict(), "processing_status": "ready"}, synchronize_session=False)
+    db.commit()
+    return True
+
+def get_video_ids_by_status(db: Session, statuses: list[str]):
+    V = models.Video
+    return [vid for (vid,) in db.query(V.video_id).filter(V.processing_status.in_(statuses)).order_by(V.video_id)]
+
+def _page_feed(q, skip: int, limit: int, cursor: tuple[datetime, int] | None):
+    q = q.order_by(models.Video.upload_date.desc(), models.Video.video_id.desc())
+    if cursor is not None:
+        # keyset: rows strictly "older" than the cursor, served from ix_videos_upload_date_id
+        ts, vid = cursor
+        q = q.filter(or_(
+            models.Video.upload_date < ts,
+            and_(models.Video.upload_date == ts, models.Video.video_id < vid),
+        ))
+    else:
+        q = q.offset(skip)
+    return q.limit(limit)
+
+def get_videos(db: Session, skip: int = 0, limit: int = 10, cursor: tuple[datetime, int] | None = None):
+    return _page_feed(db.query(models.Video), skip, limit, cursor).all()
+
+def get_video_rows(db: Session, skip: int = 0, limit: int = 10, cursor: tuple[datetime, int] | None = None):
+    """``get_videos`` as ``VideoOut``-shaped dicts."""
+    return _dicts(db, _page_feed(select(*_out_columns(schemas.VideoOut, models.Video)), skip, limit, cursor))
+
+FEED_EXPANSIONS = {"creator", "stats"}
+
+def _expanded_query(expand: set[str]):
+    V, U, S, C = models.Video, models.User, models.VideoRatingStats, models.Comment
+    columns = _out_columns(schemas.VideoOut, V)
+    if "creator" in expand:
+        columns += [U.username, U.display_name]
+    if "stats" in expand:
+        # correlated count per row, answered from ix_comments_video_created
+        comment_count = select(func.count(C.comment_id)).where(C.video_id == V.video_id).scalar_subquery()
+        columns += [S.rating_sum, S.rating_count, comment_count.label("comment_count")]
+    q = select(*columns)
+    if "creator" in expand:
+        q = q.join(U, U.user_id == V.creator_id)
+    if "stats" in expand:
+        q = q.outerjoin(S, S.video_id == V.video_id)
+    return q
+
+def _expanded_item(row, expand: set[str]) -> dict:
+    item = dict(zip(schemas.VideoOut.model_fields, row))  # the VideoOut columns come first
+    if "creator" in expand:
+        item["creator"] = {"user_id": row.creator_id, "username": row.username, "display_name": row.display_name}
+    if "stats" in expand:
+        count = row.rating_count or 0
+        item["stats"] = {
+            "rating_average": row.rating_sum / count if count else 0.0,
+            "rating_count": count,
+            "comment_count": row.comment_count,
+        }
+    return item
+
+def get_videos_expanded(db: Session, expand: set[str], skip: int = 0, limit: int = 10, cursor: tuple[datetime, int] | None = None):
+    """Feed page plus creator and/or stats columns, all from one SELECT (no relationship lazy loads).
+
+    Returns ``VideoFeedOut``-shaped dicts carrying only the requested ``creator``/``stats`` keys.
+    """
+    return [_expanded_item(row, expand) for row in db.execute(_page_feed(_expanded_query(expand), skip, limit, cursor))]
+
+def get_videos_by_ids(db: Session, video_ids: list[int], expand: set[str] = frozenset()):
+    """Feed dicts (as ``get_videos_expanded``) in the order of ``video_ids`` (ranked pages); ids that no longer exist are skipped."""
+    if not video_ids:
+        return []
+    by_id = {row.video_id: row for row in db.execute(_expanded_query(expand).where(models.Video.video_id.in_(video_ids)))}
+    return [_expanded_item(by_id[vid], expand) for vid in video_ids if vid in by_id]
+
+def get_similar_videos(db: Session, video_id: int, limit: int):
+    """Stored neighbours (app/similar.py), best first; None if the video doesn't exist."""
+    V, N = models.Video, models.VideoNeighbor
+    videos = (db.query(V).join(N, N.neighbor_id == V.video_id).filter(N.video_id == video_id)
+              .order_by(N.score.desc(), N.neighbor_id).limit(limit).all())
+    if not videos and db.get(V, video_id) is None:
+        return None
+    return videos
+
+# Upload sessions
+def create_upload_session(db: Session, **fields):
+    upload = models.UploadSession(**fields)
+    db.add(upload); db.commit(); db.refresh(upload)
+    return upload
+
+def get_upload_session(db: Session, upload_id: str, user_id: int):
+    U = models.UploadSession
+    return db.query(U).filter(U.upload_id == upload_id, U.user_id == user_id).first()
+
+def record_upload_chunk(db: Session, upload_id: str, chunk_index: int, size: int):
+    """Idempotent: a re-sent chunk overwrites its row. Also keeps the session alive for GC."""
+    db.merge(models.UploadChunk(upload_id=upload_id, chunk_index=chunk_index, size=size))
+    U = models.UploadSession
+    db.query(U).filter(U.upload_id == upload_id).update({U.updated_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+def get_upload_chunks(db: Session, upload_id: str):
+    C = models.UploadChunk
+    return db.query(C.chunk_index, C.size).filter(C.upload_id == upload_id).order_by(C.chunk_index).all()
+
+def delete_upload_session(db: Session, upload_id: str) -> bool:
+    """False if the session was already gone: deleting it is how a request claims it."""
+    # explicit child delete: SQLite doesn't enforce ON DELETE CASCADE here
+    db.query(models.UploadChunk).filter_by(upload_id=upload_id).delete(synchronize_session=False)
+    deleted = db.query(models.UploadSession).filter_by(upload_id=upload_id).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+def get_expired_upload_sessions(db: Session, idle_since: datetime, limit: int = 500):
+    U = models.UploadSession
+    return db.query(U.upload_id, U.blob_key).filter(U.updated_at < idle_since).limit(limit).all()
 
 # Comments
 def create_comment(db: Session, video_id: int, user_id: int, comment_text: str):
@@ -57,17 +321,137 @@ def create_comment(db: Session, video_id: int, user_id: int, comment_text: str):
     db.add(db_comment); db.commit(); db.refresh(db_comment)
     return db_comment
 
+def get_comment(db: Session, video_id: int, comment_id: int):
+    C = models.Comment
+    return db.query(C).filter(C.comment_id == comment_id, C.video_id == video_id).first()
+
+def update_comment(db: Session, comment: models.Comment, changes: dict):
+    comment = _attach(db, comment)
+    for k, v in changes.items():
+        setattr(comment, k, v)
+    db.commit(); db.refresh(comment)
+    return comment
+
+def delete_comment(db: Session, comment: models.Comment):
+    db.delete(_attach(db, comment)); db.commit()
+
+def get_comments(db: Session, video_id: int, limit: int = 50, cursor: tuple[datetime, int] | None = None):
+    """Newest first, keyset-paged over ix_comments_video_created."""
+    C = models.Comment
+    q = db.query(C).filter(C.video_id == video_id)
+    if cursor is not None:
+        ts, cid = cursor
+        q = q.filter(or_(C.created_at < ts, and_(C.created_at == ts, C.comment_id < cid)))
+    return q.order_by(C.created_at.desc(), C.comment_id.desc()).limit(limit).all()
+
+def get_comment_rows(db: Session, video_id: int, limit: int = 50, cursor: tuple[datetime, int] | None = None):
+    """``get_comments`` as ``CommentOut``-shaped dicts."""
+    C = models.Comment
+    stmt = select(*_out_columns(schemas.CommentOut, C)).where(C.video_id == video_id)
+    if cursor is not None:
+        ts, cid = cursor
+        stmt = stmt.where(or_(C.created_at < ts, and_(C.created_at == ts, C.comment_id < cid)))
+    return _dicts(db, stmt.order_by(C.created_at.desc(), C.comment_id.desc()).limit(limit))
+
+def iter_comment_rows(db: Session, video_id: int, batch_size: int = 500):
+    """Plain rows for every comment on a video, fetched ``batch_size`` at a time (constant memory)."""
+    C = models.Comment
+    stmt = (
+        select(*_out_columns(schemas.CommentOut, C))
+        .where(C.video_id == video_id)
+        .order_by(C.created_at.desc(), C.comment_id.desc())
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt)
+
 # Ratings
+STAR_VALUES = (1, 2, 3, 4, 5)
+
+def _star_column(value: int):
+    return getattr(models.VideoRatingStats, f"stars_{value}")
+
+def _bump_rating_stats(db: Session, video_id: int, old: int | None, new: int | None):
+    """Apply one rating change (add: old=None, remove: new=None) to video_rating_stats; caller commits."""
+    if old == new:
+        return
+    S = models.VideoRatingStats
+    now = datetime.utcnow()
+    values = {
+        S.rating_sum: S.rating_sum + (new or 0) - (old or 0),
+        S.rating_count: S.rating_count + int(new is not None) - int(old is not None),
+        S.updated_at: now,
+    }
+    if new is not None:
+        values[_star_column(new)] = _star_column(new) + 1
+    if old is not None:
+        values[_star_column(old)] = _star_column(old) - 1
+    updated = db.query(S).filter(S.video_id == video_id).update(values, synchronize_session=False)
+    if not updated and new is not None:
+        # first rating for this video (or stats never built): seed the row from the ratings themselves
+        db.flush()
+        try:
+            with db.begin_nested():
+                db.execute(insert(S).from_select(_STATS_COLUMNS, _rating_aggregates().where(models.Rating.video_id == video_id)))
+        except IntegrityError:
+            # another first rating seeded the row concurrently (without ours, still uncommitted): apply the delta to it
+            db.query(S).filter(S.video_id == video_id).update(values, synchronize_session=False)
+        else:
+            db.query(S).filter(S.video_id == video_id).update({S.updated_at: now}, synchronize_session=False)
+
+def _rating_aggregates():
+    R = models.Rating
+    # the join skips ratings orphaned by user deletes where the DB doesn't enforce ON DELETE CASCADE (SQLite)
+    return select(
+        R.video_id,
+        func.sum(R.rating),
+        func.count(R.rating),
+        *[func.sum(case((R.rating == v, 1), else_=0)) for v in STAR_VALUES],
+    ).join(models.User, models.User.user_id == R.user_id).group_by(R.video_id)
+
+_STATS_COLUMNS = ["video_id", "rating_sum", "rating_count", *[f"stars_{v}" for v in STAR_VALUES]]
+
 def upsert_rating(db: Session, video_id: int, user_id: int, rating_value: int):
     existing = db.query(models.Rating).filter_by(video_id=video_id, user_id=user_id).first()
     if existing:
+        old_value = existing.rating
         existing.rating = rating_value
+        _bump_rating_stats(db, video_id, old=old_value, new=rating_value)
         db.commit(); db.refresh(existing)
         return existing
     db_rating = models.Rating(video_id=video_id, user_id=user_id, rating=rating_value)
-    db.add(db_rating); db.commit(); db.refresh(db_rating)
+    db.add(db_rating)
+    _bump_rating_stats(db, video_id, old=None, new=rating_value)
+    db.commit(); db.refresh(db_rating)
     return db_rating
 
+def discount_user_ratings(db: Session, user_id: int):
+    """Take a user's ratings out of the aggregates before the user (and their ratings) is deleted."""
+    for video_id, value in db.query(models.Rating.video_id, models.Rating.rating).filter_by(user_id=user_id).all():
+        _bump_rating_stats(db, video_id, old=value, new=None)
+
+def _summary_from_stats(video_id: int, stats: models.VideoRatingStats | None):
+    count = stats.rating_count if stats else 0
+    return {
+        "video_id": video_id,
+        "average": stats.rating_sum / count if count else 0.0,
+        "count": count,
+        "histogram": {v: getattr(stats, f"stars_{v}") if stats else 0 for v in STAR_VALUES},
+    }
+
 def rating_summary(db: Session, video_id: int):
-    avg_, cnt_ = db.query(func.avg(models.Rating.rating), func.count(models.Rating.rating)).filter_by(video_id=video_id).one()
-    return {"video_id": video_id, "average": float(avg_) if avg_ is not None else 0.0, "count": int(cnt_)}
+    return _summary_from_stats(video_id, db.get(models.VideoRatingStats, video_id))
+
+def rating_summaries(db: Session, video_ids: list[int]):
+    """Summaries for many videos in one query; videos without ratings get zeros."""
+    rows = db.query(models.VideoRatingStats).filter(models.VideoRatingStats.video_id.in_(video_ids)).all()
+    by_id = {r.video_id: r for r in rows}
+    return {vid: _summary_from_stats(vid, by_id.get(vid)) for vid in video_ids}
+
+def rebuild_rating_stats(db: Session) -> int:
+    """Recompute video_rating_stats from the ratings table; returns the number of videos rebuilt."""
+    S = models.VideoRatingStats
+    db.execute(delete(S))
+    db.execute(insert(S).from_select(_STATS_COLUMNS, _rating_aggregates()))
+    db.query(S).update({S.updated_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return db.query(func.count(S.video_id)).scalar()
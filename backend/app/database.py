@@ -1,22 +1,267 @@
+import asyncio
+import hashlib
+import logging
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+from .cache import TTLCache
 from .settings import settings
 
+logger = logging.getLogger("uvicorn.error")
+
 DATABASE_URL = settings.DATABASE_URL
 is_sqlite = DATABASE_URL.startswith("sqlite")
 
+
+def _engine_kw(url: str) -> dict:
+    sqlite = url.startswith("sqlite")
+    kw = {"connect_args": {"check_same_thread": False}} if sqlite else {}
+    # in-memory SQLite gets a single-connection pool that takes no sizing
+    if not (sqlite and make_url(url).database in (None, "", ":memory:")):
+        kw.update(pool_size=settings.DATABASE_POOL_SIZE, max_overflow=settings.DATABASE_MAX_OVERFLOW)
+    return kw
+
+_pool_kw = {k: v for k, v in _engine_kw(DATABASE_URL).items() if k != "connect_args"}
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if is_sqlite else {},
     pool_pre_ping=True,
     pool_recycle=1800,  # keep SQL Azure connections fresh
+    **_engine_kw(DATABASE_URL),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- Read routing. Request reads use read_engine: the primary, a read-only SQLite pool
+# (SQLITE_TUNED) or a replica (DATABASE_READ_URL). Writes always reach the primary.
+READ_URL = DATABASE_URL
+read_engine = engine
+write_queue = None
+if settings.SQLITE_TUNED and is_sqlite and _pool_kw:
+    from . import sqlite_perf
+    sqlite_perf.apply_pragmas(engine)
+    with engine.connect():
+        pass  # switch the file to WAL before any read-only connection opens it
+    READ_URL = sqlite_perf.readonly_url(DATABASE_URL)
+    read_engine = create_engine(READ_URL, **_engine_kw(DATABASE_URL))
+    sqlite_perf.apply_pragmas(read_engine, read_only=True)
+    _write_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, pool_size=1, max_overflow=0)
+    sqlite_perf.apply_pragmas(_write_engine)
+    sqlite_perf.use_immediate_transactions(_write_engine)
+    write_queue = sqlite_perf.WriteQueue(_write_engine, settings.SQLITE_WRITE_BATCH)
+
+if settings.DATABASE_READ_URL:
+    READ_URL = settings.DATABASE_READ_URL
+    read_engine = create_engine(READ_URL, pool_pre_ping=True, pool_recycle=1800, **_engine_kw(READ_URL))
+
+# reads may lag behind the primary
+has_replica = bool(settings.DATABASE_READ_URL)
+
+# for streaming reads outside Database (e.g. exports)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def add_missing_columns(bind) -> list[str]:
+    """Dev stand-in for migrations: ALTER TABLE ADD COLUMN for model columns an existing table lacks.
+
+    create_all only creates missing tables; this keeps an older dev.db usable
+    after a model grows (new columns must be nullable or carry a server_default).
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+
+    inspector, added = inspect(bind), []
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# --- Async stack (request path). The sync engine above stays for the CLI, scripts and create_all.
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mssql": "aioodbc"}
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    driver = ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {u.get_backend_name()!r}; set DATABASE_ASYNC_URL")
+    return u.set(drivername=f"{u.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+async_engine = async_read_engine = None
+AsyncSessionLocal = AsyncReadSessionLocal = None
+if settings.DATABASE_ASYNC:
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        def _async_engine(url: str):
+            kw = _engine_kw(url)
+            kw.pop("connect_args", None)
+            return create_async_engine(
+                url,
+                pool_pre_ping=True,
+                pool_recycle=1800,
+                **kw,
+                # aiosqlite otherwise defaults to NullPool: a new connection (and thread) per call
+                **({"poolclass": AsyncAdaptedQueuePool} if url.startswith("sqlite") else {}),
+            )
+
+        async_engine = _async_engine(settings.DATABASE_ASYNC_URL or async_url(DATABASE_URL))
+        async_read_engine = async_engine if read_engine is engine else _async_engine(async_url(READ_URL))
+        if write_queue is not None and not has_replica:
+            sqlite_perf.apply_pragmas(async_read_engine.sync_engine, read_only=True)
+        # objects are serialized after the session call returns, outside the greenlet: no lazy refreshes
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+    except (ImportError, ValueError):
+        # async driver not installed -> fall back to the sync engine on the threadpool
+        async_engine = async_read_engine = None
+        logger.warning("async database driver unavailable; using the sync stack", exc_info=True)
+
+
+# sync-stack request sessions: objects outlive each unit of work (see Database.run)
+RequestSessionLocal = sessionmaker(autoflush=False, bind=engine, expire_on_commit=False)
+RequestReadSessionLocal = sessionmaker(autoflush=False, bind=read_engine, expire_on_commit=False)
+
+# Clients that wrote recently keep reading from the primary until the replica catches up.
+# Per process: behind several workers a follow-up read can still land on a stale replica.
+_recent_writers = TTLCache(10000, settings.DATABASE_READ_YOUR_WRITES_SECONDS)
+
+
+def _client_key(conn: HTTPConnection) -> str | None:
+    auth = conn.headers.get("authorization")
+    return hashlib.blake2b(auth.encode(), digest_size=16).hexdigest() if auth else None
+
+
+def _unit_of_work(session, fn, args, kwargs):
+    try:
+        result = fn(session, *args, **kwargs)
+        session.commit()  # no-op after crud's own commit; ends read transactions
+        return result
+    except BaseException:
+        session.rollback()
+        raise
+
+
+def write_now(fn, /, *args, **kwargs):
+    """Blocking counterpart of ``Database.write`` for background jobs and scripts."""
+    if write_queue is not None:
+        return write_queue.submit(fn, args, kwargs).result()
+    with SessionLocal() as session:
+        return _unit_of_work(session, fn, args, kwargs)
+
+
+class Database:
+    """Request-scoped handle over whichever stack is active.
+
+    ``await db.run(fn, *args)`` calls ``fn(session, *args)`` with a regular sync
+    ``Session``. On the async stack that happens via ``AsyncSession.run_sync``:
+    the driver awaits on the event loop and no thread is used. On the sync
+    stack it runs in the threadpool. Either way crud stays plain sync code.
+
+    Each call is its own transaction, so the pooled connection is returned
+    between calls instead of being held for the whole request. Holding it
+    across threadpool hops can deadlock once requests outnumber connections.
+
+    ``run`` reads through ``read_engine``; calls that modify data use
+    ``db.write``, which goes to the primary (through the single writer in
+    SQLite production mode). Objects loaded by ``run`` are re-attached by
+    crud. With a replica, a client that just wrote keeps reading from the
+    primary for ``DATABASE_READ_YOUR_WRITES_SECONDS``. Reads that must not
+    lag even without a token to key that on (login, register's uniqueness
+    checks) use ``db.read_primary``.
+    """
+
+    def __init__(self, client_key: str | None = None):
+        self.is_async = AsyncSessionLocal is not None
+        self.client_key = client_key
+        self.reads_primary = read_engine is engine or (client_key is not None and _recent_writers.get(client_key) is not None)
+        self._primary = self._read = None
+
+    def _session(self, primary: bool):
+        if primary or self.reads_primary:
+            if self._primary is None:
+                self._primary = AsyncSessionLocal() if self.is_async else RequestSessionLocal()
+            return self._primary
+        if self._read is None:
+            self._read = AsyncReadSessionLocal() if self.is_async else RequestReadSessionLocal()
+        return self._read
+
+    async def _call(self, session, fn, args, kwargs):
+        if self.is_async:
+            return await session.run_sync(_unit_of_work, fn, args, kwargs)
+        return await run_in_threadpool(_unit_of_work, session, fn, args, kwargs)
+
+    async def run(self, fn, /, *args, **kwargs):
+        return await self._call(self._session(primary=False), fn, args, kwargs)
+
+    async def read_primary(self, fn, /, *args, **kwargs):
+        return await self._call(self._session(primary=True), fn, args, kwargs)
+
+    async def write(self, fn, /, *args, **kwargs):
+        if write_queue is not None:
+            result = await asyncio.wrap_future(write_queue.submit(fn, args, kwargs))
+        else:
+            result = await self._call(self._session(primary=True), fn, args, kwargs)
+        if has_replica:
+            self.reads_primary = True
+            if self.client_key is not None:
+                _recent_writers.set(self.client_key, True)
+        return result
+
+    async def close(self) -> None:
+        for session in (self._primary, self._read):
+            if session is None:
+                continue
+            if self.is_async:
+                await session.close()
+            else:
+                await run_in_threadpool(session.close)
+
+
+def engines() -> dict:
+    """Every engine this configuration built, by role; shared engines appear under their first role."""
+    found = {"primary": engine, "read": read_engine, "async": async_engine, "async_read": async_read_engine,
+             "writer": write_queue.engine if write_queue is not None else None}
+    seen, unique = set(), {}
+    for name, eng in found.items():
+        sync = getattr(eng, "sync_engine", eng)
+        if eng is not None and id(sync) not in seen:
+            seen.add(id(sync))
+            unique[name] = eng
+    return unique
+
+
+async def dispose_engines() -> None:
+    # aiosqlite connections own non-daemon threads
+    if async_read_engine is not None and async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    engine.dispose()
+
+
+async def get_database(conn: HTTPConnection):
+    db = Database(_client_key(conn))
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,31 +1,57 @@
 # app/main.py
 from __future__ import annotations
-import logging, os
+import asyncio, hmac, logging, os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.requests import Request
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 
 from .settings import settings
-from .database import engine, Base
-from .routers import auth, users, videos, ratings, comments
+from .body_limit import BodySizeLimitMiddleware
+from .database import engine, Base, add_missing_columns, dispose_engines
+from . import metrics, principals, processing, ranking, response_cache, similar, sql_profiler, upload_gc, utils
+from .routers import auth, users, videos, ratings, comments, uploads
 
 
 # --- Dev bootstrap: create tables + dev upload dir
 if settings.is_dev:
     Base.metadata.create_all(bind=engine)  # Use Alembic in prod
+    add_missing_columns(engine)
     os.makedirs(settings.LOCAL_DEV_UPLOAD_DIR, exist_ok=True)
 
-app = FastAPI(title="Cloud-Native Video API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(upload_gc.run_forever())]
+    if settings.RANKING_ENABLED:
+        tasks.append(asyncio.create_task(ranking.run_forever()))
+    if settings.SIMILAR_ENABLED:
+        tasks.append(asyncio.create_task(similar.run_forever()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await processing.shutdown()
+    await dispose_engines()
+
+app = FastAPI(title="Cloud-Native Video API", lifespan=lifespan)
 
 # --- Mount /static ONLY in dev (or if dir exists)
 if settings.is_dev and Path(settings.LOCAL_DEV_UPLOAD_DIR).exists():
     app.mount("/static", StaticFiles(directory=settings.LOCAL_DEV_UPLOAD_DIR), name="static")
 
+# --- Request body size limits (counted as the body streams, chunked or not; inside CORS so a 413 keeps its headers)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "POST /videos/": settings.MAX_UPLOAD_BYTES,
+        "PUT /uploads/{upload_id}/chunks/{index}": uploads.MAX_CHUNK_BYTES,
+    },
+    default=settings.MAX_REQUEST_BODY_BYTES,
+)
+
 # --- CORS
 app.add_middleware(
     CORSMiddleware,
@@ -33,19 +59,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[utils.NEXT_CURSOR_HEADER, sql_profiler.HEADER],
 )
 
-# --- Upload size guard
-MAX_UPLOAD_BYTES = 200 * 1024 * 1024  # 200 MB
-class LimitUploadSizeMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        if request.method == "POST" and request.url.path.startswith("/videos"):
-            cl = request.headers.get("content-length")
-            if cl and int(cl) > MAX_UPLOAD_BYTES:
-                return JSONResponse({"detail": "File too large"}, status_code=413)
-        return await call_next(request)
+# --- SQL profiler (opt-in): X-SQL-Profile header, N+1 and slow-query logs
+if settings.SQL_PROFILE_ENABLED:
+    sql_profiler.instrument_database()
+    app.add_middleware(sql_profiler.SQLProfilerMiddleware)
 
-app.add_middleware(LimitUploadSizeMiddleware)
+# --- Request metrics (added last, so outermost: the timings include every middleware above)
+if settings.METRICS_ENABLED:
+    metrics.instrument_database()
+    app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
 
 # --- Error handler
 logger = logging.getLogger("uvicorn.error")
@@ -54,18 +79,41 @@ async def unhandled_ex_handler(request: Request, exc: Exception):
     logger.exception("Unhandled error on %s %s", request.method, request.url.path)
     return JSONResponse({"detail": "Internal Server Error"}, status_code=500)
 
+@app.exception_handler(utils.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: utils.HashingBusy):
+    # shed auth load instead of queueing without bound
+    return JSONResponse(
+        {"detail": "Server busy, please retry"},
+        status_code=503,
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
 # --- Routers
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(videos.router)
+app.include_router(uploads.router)
 app.include_router(comments.router)
 app.include_router(ratings.router)
+app.include_router(ratings.batch_router)
 
 # --- Health + Root
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"status": "ok"}
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint(request: Request):
+        expected = f"Bearer {settings.METRICS_BEARER_TOKEN}"
+        if settings.METRICS_BEARER_TOKEN and not hmac.compare_digest(request.headers.get("authorization", ""), expected):
+            return JSONResponse({"detail": "Not authenticated"}, status_code=401)
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/cache-stats", dependencies=[Depends(auth.require_admin)])
+async def cache_stats():
+    return {"auth": principals.stats(), "responses": response_cache.stats()}
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Video Sharing App API"}
@@ -0,0 +1,251 @@
+# app/media.py
+"""Pure-Python MP4/MOV (ISO BMFF) helpers for the upload pipeline.
+
+``process_file`` makes one pass over an uploaded file: it reads the atom
+layout, probes duration / dimensions / bitrate from ``moov``, and if ``moov``
+sits behind ``mdat`` rewrites the file with ``moov`` up front ("faststart",
+chunk offsets patched, stco widened to co64 past 4 GiB) so players can start
+without fetching the tail. The SHA-256 is computed over the bytes as
+finally stored. Files that aren't MP4/MOV (e.g. WebM) only get size and
+checksum.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator
+
+COPY_CHUNK = 1024 * 1024
+MAX_MOOV_BYTES = 64 * 1024 * 1024  # anything bigger is not a sane index; leave the file alone
+TOP_LEVEL = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pdin", b"uuid", b"meta", b"moof", b"mfra", b"styp", b"sidx"}
+# containers on the path from moov to the chunk offset tables
+CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf"}
+
+
+class MediaError(Exception):
+    """The file claims to be MP4/MOV but its atom structure is broken."""
+
+
+@dataclass
+class Atom:
+    kind: bytes
+    offset: int  # of the header
+    size: int  # including the header
+    header: int  # 8 or 16 bytes
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+
+@dataclass
+class MediaInfo:
+    size_bytes: int
+    sha256: str
+    duration_seconds: float | None = None
+    width: int | None = None
+    height: int | None = None
+    bitrate: int | None = None  # bits per second over the whole file
+    faststart_applied: bool = False
+
+
+# --- Atom parsing
+def _atoms(buf: bytes, start: int = 0, end: int | None = None) -> Iterator[Atom]:
+    end = len(buf) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise MediaError("truncated 64-bit atom header")
+            size, header = struct.unpack_from(">Q", buf, pos + 8)[0], 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise MediaError(f"bad {kind!r} atom size at {pos}")
+        yield Atom(kind, pos, size, header)
+        pos += size
+
+
+def top_level_atoms(f: BinaryIO, file_size: int) -> list[Atom]:
+    atoms, pos = [], 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        raw = f.read(16)
+        size, kind = struct.unpack_from(">I4s", raw)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from(">Q", raw, 8)[0], 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header or pos + size > file_size:
+            raise MediaError(f"bad top-level {kind!r} atom size at {pos}")
+        atoms.append(Atom(kind, pos, size, header))
+        pos += size
+    return atoms
+
+
+def _child(buf: bytes, parent: Atom, kind: bytes) -> Atom | None:
+    return next((a for a in _atoms(buf, parent.offset + parent.header, parent.end) if a.kind == kind), None)
+
+
+def _path(buf: bytes, parent: Atom, *kinds: bytes) -> Atom | None:
+    for kind in kinds:
+        parent = _child(buf, parent, kind)
+        if parent is None:
+            return None
+    return parent
+
+
+# --- Probe
+def probe_moov(moov: bytes) -> dict:
+    """Duration, dimensions of the first video track; ``moov`` is the whole atom."""
+    root = Atom(b"moov", 0, len(moov), 8)
+    out: dict = {}
+    mvhd = _child(moov, root, b"mvhd")
+    if mvhd is not None:
+        body = mvhd.offset + mvhd.header
+        if moov[body] == 1:
+            timescale, duration = struct.unpack_from(">IQ", moov, body + 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", moov, body + 12)
+        if timescale:
+            out["duration_seconds"] = duration / timescale
+    for trak in _atoms(moov, root.header, root.end):
+        if trak.kind != b"trak":
+            continue
+        hdlr = _path(moov, trak, b"mdia", b"hdlr")
+        if hdlr is None or moov[hdlr.offset + hdlr.header + 8:hdlr.offset + hdlr.header + 12] != b"vide":
+            continue
+        tkhd = _child(moov, trak, b"tkhd")
+        if tkhd is not None:
+            body = tkhd.offset + tkhd.header
+            dims = body + (88 if moov[body] == 1 else 76)  # after ids, duration, layer/volume and the matrix
+            width, height = struct.unpack_from(">II", moov, dims)
+            out["width"], out["height"] = width >> 16, height >> 16  # 16.16 fixed point
+        break
+    return out
+
+
+# --- Faststart
+def _patch_chunk_offsets(moov: bytearray, shift) -> None:
+    """Rewrite every stco/co64 entry in place with ``shift(offset)``."""
+    def walk(parent: Atom):
+        for a in _atoms(moov, parent.offset + parent.header, parent.end):
+            if a.kind in CONTAINERS:
+                walk(a)
+            elif a.kind in (b"stco", b"co64"):
+                body = a.offset + a.header
+                (count,) = struct.unpack_from(">I", moov, body + 4)
+                fmt, width = (">I", 4) if a.kind == b"stco" else (">Q", 8)
+                for i in range(count):
+                    pos = body + 8 + i * width
+                    new = shift(struct.unpack_from(fmt, moov, pos)[0])
+                    if a.kind == b"stco" and new > 0xFFFFFFFF:
+                        raise OverflowError("chunk offset no longer fits stco")
+                    struct.pack_into(fmt, moov, pos, new)
+    walk(Atom(b"moov", 0, len(moov), 8))
+
+
+def _co64(moov: bytes) -> bytearray:
+    """``moov`` with every stco table widened to co64, container sizes adjusted."""
+    def body(parent: Atom) -> bytes:
+        out = bytearray()
+        for a in _atoms(moov, parent.offset + parent.header, parent.end):
+            if a.kind in CONTAINERS:
+                inner = body(a)
+                out += struct.pack(">I4s", 8 + len(inner), a.kind) + inner
+            elif a.kind == b"stco":
+                version_flags, count = struct.unpack_from(">4sI", moov, a.offset + a.header)
+                entries = struct.unpack_from(f">{count}I", moov, a.offset + a.header + 8)
+                out += struct.pack(f">I4s4sI{count}Q", 16 + 8 * count, b"co64", version_flags, count, *entries)
+            else:
+                out += moov[a.offset:a.end]
+        return bytes(out)
+    inner = body(Atom(b"moov", 0, len(moov), 8))
+    return bytearray(struct.pack(">I4s", 8 + len(inner), b"moov") + inner)
+
+
+def _faststart_moov(moov: bytes, insert_at: int, moov_at: int) -> bytearray:
+    """``moov`` patched for moving from ``moov_at`` to ``insert_at``; bytes in between shift right by its size.
+
+    Tables whose offsets would pass 4 GiB are widened to co64 first, which grows ``moov`` and so the shift.
+    """
+    out = bytearray(moov)
+    try:
+        _patch_chunk_offsets(out, lambda off: off + len(out) if insert_at <= off < moov_at else off)
+    except OverflowError:
+        out = _co64(moov)
+        _patch_chunk_offsets(out, lambda off: off + len(out) if insert_at <= off < moov_at else off)
+    return out
+
+
+def _copy(src: BinaryIO, dst: BinaryIO, start: int, length: int, digest) -> None:
+    src.seek(start)
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK, length))
+        if not chunk:
+            raise MediaError("file shrank while copying")
+        dst.write(chunk)
+        digest.update(chunk)
+        length -= len(chunk)
+
+
+def _sha256(f: BinaryIO) -> str:
+    f.seek(0)
+    digest = hashlib.sha256()
+    while chunk := f.read(COPY_CHUNK):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def process_file(path: str) -> MediaInfo:
+    """Probe, faststart (in place, atomically) and checksum ``path``."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(8)
+        if len(head) < 8 or head[4:8] not in TOP_LEVEL:
+            return MediaInfo(size_bytes=size, sha256=_sha256(f))  # not ISO BMFF
+        atoms = top_level_atoms(f, size)
+        moov = next((a for a in atoms if a.kind == b"moov"), None)
+        mdat = next((a for a in atoms if a.kind == b"mdat"), None)
+        if moov is None or moov.size > MAX_MOOV_BYTES:
+            return MediaInfo(size_bytes=size, sha256=_sha256(f))
+        f.seek(moov.offset)
+        moov_bytes = bytearray(f.read(moov.size))
+        if moov.header == 16:
+            raise MediaError("64-bit moov header is not supported")
+        info = MediaInfo(size_bytes=size, sha256="", **probe_moov(bytes(moov_bytes)))
+        if info.duration_seconds:
+            info.bitrate = int(size * 8 / info.duration_seconds)
+
+        if mdat is None or moov.offset < mdat.offset:
+            info.sha256 = _sha256(f)  # already faststart
+            return info
+
+        # moov moves to just before the first mdat
+        insert_at, moov_at = mdat.offset, moov.offset
+        moov_bytes = _faststart_moov(moov_bytes, insert_at, moov_at)
+        if len(moov_bytes) != moov.size:  # widened to co64
+            info.size_bytes = size + len(moov_bytes) - moov.size
+            if info.duration_seconds:
+                info.bitrate = int(info.size_bytes * 8 / info.duration_seconds)
+
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".faststart")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                _copy(f, out, 0, insert_at, digest)
+                out.write(moov_bytes)
+                digest.update(moov_bytes)
+                _copy(f, out, insert_at, moov_at - insert_at, digest)
+                _copy(f, out, moov.end, size - moov.end, digest)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    info.sha256, info.faststart_applied = digest.hexdigest(), True
+    return info
@@ -0,0 +1,274 @@
+# app/metrics.py
+"""In-process metrics in the Prometheus text format, served at ``/metrics``.
+
+No client library or push gateway: counters, gauges and fixed-bucket
+histograms live in this module and are rendered on scrape. What is measured:
+
+* HTTP: per-route latency histogram, request count by status, in-flight
+  gauge (``MetricsMiddleware``; the route label is the path template).
+* Database: statement count and duration per engine, plus per-request
+  statement count and time (engine events, attributed through a contextvar
+  that follows the request into threadpool and async sessions and onto the
+  SQLite writer thread). Pool size, checked-out and overflow connections are
+  read at scrape time.
+* Uploads: bytes received and transfer throughput per upload kind.
+* Storage: per-operation latency and errors (``storage.InstrumentedStorage``).
+
+Every worker process keeps its own numbers; scrape each worker (or run one).
+Updates take a per-metric lock, so threads never lose increments.
+"""
+from __future__ import annotations
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from starlette.routing import Match, Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9)
+
+_registry: list["_Metric"] = []
+_collectors: list[Callable[[], None]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# --- Primitives
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def expose(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield from self._lines(labels, value)
+
+    def _lines(self, labels: tuple, value) -> Iterable[str]:
+        yield f"{self.name}{_labels(self.labels, labels)} {_num(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, labels: tuple, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with le >= value
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def _lines(self, labels: tuple, value) -> Iterable[str]:
+        counts, total = value
+        running = 0
+        for le, n in zip((*map(_num, self.buckets), "+Inf"), counts):
+            running += n
+            bucket = 'le="' + le + '"'
+            yield f"{self.name}_bucket{_labels(self.labels, labels, bucket)} {running}"
+        yield f"{self.name}_sum{_labels(self.labels, labels)} {_num(total)}"
+        yield f"{self.name}_count{_labels(self.labels, labels)} {running}"
+
+
+def render() -> str:
+    for collect in _collectors:
+        collect()
+    return "\n".join(line for metric in _registry for line in metric.expose()) + "\n"
+
+
+# --- HTTP
+HTTP_REQUESTS = Counter("http_requests_total", "Requests handled, by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time from request start to the end of the response body.", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.", ("method", "route"))
+DB_PER_REQUEST = Histogram("db_statements_per_request", "SQL statements executed while handling one request.", ("route",), COUNT_BUCKETS)
+DB_TIME_PER_REQUEST = Histogram("db_time_per_request_seconds", "Time spent in SQL statements while handling one request.", ("route",), SQL_BUCKETS)
+
+# [statement count, seconds] for the request being handled; None outside requests
+_request_db: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_db", default=None)
+
+
+class MetricsMiddleware:
+    """Pure ASGI: times every HTTP request under its route template (``/videos/{video_id}``).
+
+    The route is resolved before the app runs, so the in-flight gauge can carry
+    it; resolutions are cached per (method, path). Unknown paths share one
+    label to keep cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp, routes: list, cache_size: int = 10_000):
+        self.app, self.routes, self.cache_size = app, routes, cache_size
+        self._route_cache: dict[tuple[str, str], str] = {}
+
+    def route_for(self, scope: Scope) -> str:
+        key = (scope["method"], scope["path"])
+        label = self._route_cache.get(key)
+        if label is None:
+            label = "unmatched"
+            for route in self.routes:
+                match, _ = route.matches(scope)
+                if match is not Match.NONE:
+                    label = route.path + "/{path}" if isinstance(route, Mount) else route.path
+                    if match is Match.FULL:
+                        break
+            if len(self._route_cache) >= self.cache_size:
+                self._route_cache.clear()
+            self._route_cache[key] = label
+        return label
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, route = scope["method"], self.route_for(scope)
+        status = 500  # unless the app gets as far as starting a response
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        HTTP_IN_FLIGHT.inc((method, route))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec((method, route))
+            _request_db.reset(token)
+            HTTP_REQUESTS.inc((method, route, str(status)))
+            HTTP_LATENCY.observe((method, route), elapsed)
+            DB_PER_REQUEST.observe((route,), db[0])
+            DB_TIME_PER_REQUEST.observe((route,), db[1])
+
+
+# --- Database
+DB_STATEMENTS = Counter("db_statements_total", "SQL statements executed, by engine.", ("engine",))
+DB_STATEMENT_TIME = Histogram("db_statement_duration_seconds", "SQL statement execution time, by engine.", ("engine",), SQL_BUCKETS)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections handed out by the pool.", ("engine",))
+DB_POOL_CONNECTS = Counter("db_pool_connects_total", "New DBAPI connections opened.", ("engine",))
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size.", ("engine",))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out.", ("engine",))
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size (negative: unused pool slots).", ("engine",))
+SQLITE_WRITER = Gauge("sqlite_writer", "SQLite write queue counters (SQLITE_TUNED).", ("stat",))
+
+_instrumented: set[int] = set()
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Statement and pool metrics for a sync or async engine; repeated calls are no-ops."""
+    sync = getattr(engine, "sync_engine", engine)
+    if id(sync) in _instrumented:
+        return
+    _instrumented.add(id(sync))
+    labels = (name,)
+
+    @event.listens_for(sync, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync, "after_cursor_execute")
+    def _done(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        DB_STATEMENTS.inc(labels)
+        DB_STATEMENT_TIME.observe(labels, elapsed)
+        db = _request_db.get()
+        if db is not None:
+            db[0] += 1
+            db[1] += elapsed
+
+    pool = sync.pool
+    event.listen(pool, "checkout", lambda *_: DB_POOL_CHECKOUTS.inc(labels))
+    event.listen(pool, "connect", lambda *_: DB_POOL_CONNECTS.inc(labels))
+
+    def collect():
+        # QueuePool and its async variant; NullPool/StaticPool have nothing to report
+        for gauge, attr in ((DB_POOL_SIZE, "size"), (DB_POOL_CHECKED_OUT, "checkedout"), (DB_POOL_OVERFLOW, "overflow")):
+            if hasattr(pool, attr):
+                gauge.set(labels, getattr(pool, attr)())
+    _collectors.append(collect)
+
+
+def instrument_database() -> None:
+    """Instrument every engine app.database built for this configuration."""
+    from . import database
+
+    if database.write_queue is not None:
+        _collectors.append(lambda: [SQLITE_WRITER.set((k,), v) for k, v in database.write_queue.stats().items()])
+    for name, engine in database.engines().items():
+        instrument_engine(engine, name)
+
+
+# --- Uploads and storage
+UPLOADS = Counter("uploads_total", "Finished uploads, by kind and whether identical content was already stored.", ("kind", "result"))
+UPLOAD_BYTES = Counter("upload_bytes_received_total", "Upload body bytes accepted, by kind.", ("kind",))
+UPLOAD_THROUGHPUT = Histogram("upload_throughput_bytes_per_second", "Bytes per second of each upload's transfer into storage.", ("kind",), THROUGHPUT_BUCKETS)
+STORAGE_LATENCY = Histogram("storage_operation_duration_seconds", "Storage backend call latency.", ("backend", "op"))
+STORAGE_ERRORS = Counter("storage_operation_errors_total", "Storage backend calls that raised.", ("backend", "op"))
+
+
+def record_upload(kind: str, size: int, seconds: float | None = None, deduplicated: bool | None = None) -> None:
+    """``seconds`` is the storage transfer time (None when nothing was transferred)."""
+    UPLOAD_BYTES.inc((kind,), size)
+    if seconds:
+        UPLOAD_THROUGHPUT.observe((kind,), size / seconds)
+    if deduplicated is not None:
+        UPLOADS.inc((kind, "deduplicated" if deduplicated else "stored"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import BigInteger, Column, Integer, Float, String, DateTime, Enum, ForeignKey, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -25,6 +25,11 @@ class User(Base):
 
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        # keyset pagination of the feed: (upload_date, video_id) desc
+        Index("ix_videos_upload_date_id", "upload_date", "video_id"),
+    )
+
     video_id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     publisher = Column(String)
@@ -32,13 +37,24 @@ class Video(Base):
     genre = Column(String)
     age_rating = Column(String)
     blob_uri = Column(String)  # Azure blob URL
+    blob_id = Column(Integer, ForeignKey("blobs.blob_id"), index=True)  # None for external URLs and pre-dedup rows
     upload_date = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # filled in by the post-upload pipeline (app/processing.py)
+    processing_status = Column(String(16), default="pending", server_default="pending", nullable=False)
+    duration_seconds = Column(Float)
+    width = Column(Integer)
+    height = Column(Integer)
+    bitrate = Column(Integer)  # bits/s over the whole file
+    size_bytes = Column(BigInteger)
+    checksum_sha256 = Column(String(64))
+
     creator_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
 
     creator  = relationship("User", back_populates="videos")
     comments = relationship("Comment", back_populates="video", cascade="all, delete-orphan", passive_deletes=True)
     ratings  = relationship("Rating", back_populates="video", cascade="all, delete-orphan", passive_deletes=True)
+    rating_stats = relationship("VideoRatingStats", back_populates="video", uselist=False, cascade="all, delete-orphan")
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -71,3 +87,118 @@ class Rating(Base):
     video = relationship("Video", back_populates="ratings")
     user  = relationship("User", back_populates="ratings")
 
+class VideoRatingStats(Base):
+    """Running rating aggregates per video, kept in step by crud.upsert_rating."""
+    __tablename__ = "video_rating_stats"
+
+    video_id = Column(Integer, ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    rating_sum   = Column(Integer, default=0, nullable=False)
+    rating_count = Column(Integer, default=0, nullable=False)
+    # histogram: number of 1..5 star ratings
+    stars_1 = Column(Integer, default=0, nullable=False)
+    stars_2 = Column(Integer, default=0, nullable=False)
+    stars_3 = Column(Integer, default=0, nullable=False)
+    stars_4 = Column(Integer, default=0, nullable=False)
+    stars_5 = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, index=True)  # last change; app/ranking.py re-scores "top" from here
+
+    video = relationship("Video", back_populates="rating_stats")
+
+class VideoSearchTerm(Base):
+    """Inverted index for video search on databases without FTS5 (see app/search.py)."""
+    __tablename__ = "video_search_terms"
+    __table_args__ = (
+        Index("ix_video_search_terms_video", "video_id"),
+    )
+
+    term = Column(String(64), primary_key=True)
+    video_id = Column(Integer, ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    weight = Column(Integer, nullable=False)  # field-weighted occurrences of term in the video
+
+class VideoScore(Base):
+    """Materialized ranking scores, maintained incrementally by app/ranking.py."""
+    __tablename__ = "video_scores"
+    __table_args__ = (
+        # ranked pages past the in-memory snapshot: keyset on (score, video_id) desc
+        Index("ix_video_scores_trending", "trending", "video_id"),
+        Index("ix_video_scores_top", "top", "video_id"),
+    )
+
+    video_id = Column(Integer, ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    # log2 of exponentially decayed activity (uploads, views, comments, ratings), scaled to ranking.EPOCH
+    trending = Column(Float, nullable=False)
+    top = Column(Float, nullable=False)  # Bayesian average rating
+    views = Column(BigInteger, default=0, nullable=False)
+
+class RankingState(Base):
+    """Single row: how far app/ranking.py has folded each event source into video_scores."""
+    __tablename__ = "ranking_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)  # bumped by every pass; guards concurrent passes
+    last_video_id = Column(Integer, default=0, nullable=False)
+    last_comment_id = Column(Integer, default=0, nullable=False)
+    last_rating_id = Column(Integer, default=0, nullable=False)
+    late_ids = Column(JSON)  # {"video"|"comment"|"rating": {id: first missed at}}: skipped ids that may still commit
+    stats_seen_at = Column(DateTime)  # VideoRatingStats.updated_at already scored
+    refreshed_at = Column(DateTime)
+
+class VideoNeighbor(Base):
+    """Top-K similar videos per video (item-item cosine over ratings), maintained by app/similar.py."""
+    __tablename__ = "video_neighbors"
+    __table_args__ = (
+        # incremental passes: which lists contain a video whose ratings changed
+        Index("ix_video_neighbors_neighbor", "neighbor_id"),
+    )
+
+    video_id = Column(Integer, ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("videos.video_id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+class SimilarState(Base):
+    """Single row: which rating-stats changes app/similar.py has folded into video_neighbors."""
+    __tablename__ = "similar_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)  # bumped by every pass; guards concurrent passes
+    stats_seen_at = Column(DateTime)  # None: never built, the next pass computes every list
+    refreshed_at = Column(DateTime)
+
+class Blob(Base):
+    """One stored file, shared by every video whose upload had the same bytes.
+
+    ``sha256`` is the digest of the bytes as uploaded (the pipeline may later
+    faststart the file in place); it is None when the backend could not hash
+    the upload. The physical blob is deleted once ``refcount`` reaches zero.
+    """
+    __tablename__ = "blobs"
+
+    blob_id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), unique=True)
+    blob_uri = Column(String, nullable=False)
+    size = Column(BigInteger)
+    refcount = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class UploadSession(Base):
+    """A resumable upload in progress (see routers/uploads.py); chunks are staged in storage."""
+    __tablename__ = "upload_sessions"
+
+    upload_id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    blob_key = Column(String, nullable=False)
+    filename = Column(String)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    sha256 = Column(String(64))  # set when the declared content was already stored: nothing to upload
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)  # last chunk; drives GC
+
+class UploadChunk(Base):
+    """One received chunk; re-sending a chunk just overwrites it."""
+    __tablename__ = "upload_chunks"
+
+    upload_id = Column(String(32), ForeignKey("upload_sessions.upload_id", ondelete="CASCADE"), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    size = Column(Integer, nullable=False)
@@ -0,0 +1,63 @@
+# app/principals.py
+"""Cache of verified tokens and user principals for get_current_user.
+
+Tokens map to their ``sub`` until the sooner of the cache TTL and the JWT
+``exp``; principals are immutable snapshots of the user row. Anything that
+changes a user's role/profile or deletes them must call ``invalidate_user``.
+
+Both caches are per process, and so is ``invalidate_user``: the worker that
+served the change applies it on the next request, other workers once their
+entry ages out (``AUTH_CACHE_TTL_SECONDS``).
+"""
+from __future__ import annotations
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from . import models
+from .cache import TTLCache
+from .settings import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only stand-in for ``models.User`` handed to route handlers."""
+    user_id: int
+    email: str
+    username: str
+    display_name: Optional[str]
+    role: models.UserRole
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.user_id, user.email, user.username, user.display_name, user.role)
+
+
+_tokens = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+_principals = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def token_subject(token: str) -> int | None:
+    return _tokens.get(token)
+
+
+def remember_token(token: str, user_id: int, exp: float | None) -> None:
+    ttl = None if exp is None else exp - time.time()
+    if ttl is None or ttl > 0:
+        _tokens.set(token, user_id, ttl)
+
+
+def get_principal(user_id: int) -> Principal | None:
+    return _principals.get(user_id)
+
+
+def remember_principal(principal: Principal) -> None:
+    _principals.set(principal.user_id, principal)
+
+
+def invalidate_user(user_id: int) -> None:
+    _principals.pop(user_id)
+
+
+def stats() -> dict:
+    return {"tokens": _tokens.stats(), "principals": _principals.stats()}
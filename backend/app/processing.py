@@ -0,0 +1,101 @@
+# app/processing.py
+"""Post-upload pipeline: faststart, probe and checksum each new video.
+
+``enqueue(video_id)`` is called once ``create_video`` has committed. Jobs run
+as tasks on the event loop; at most ``MEDIA_WORKERS`` at a time, with the
+file work on a dedicated thread pool so they never take threads from request
+handling. Local files are rewritten in place; other backends are staged to a
+temp file and uploaded back under the same key if faststart changed them.
+
+A video sharing its blob with one that is already ``ready`` (a deduplicated
+re-upload) copies that video's results instead of redoing the work.
+
+The video row goes ``pending -> processing -> ready | failed``. Anything left
+``pending`` (process restart) can be re-run with ``python -m app.cli process-videos``.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+import aiofiles
+
+from . import crud, media, response_cache
+from .database import write_now
+from .settings import settings
+from .storage import get_storage
+
+logger = logging.getLogger("uvicorn.error")
+
+PENDING, PROCESSING, READY, FAILED = "pending", "processing", "ready", "failed"
+
+_pool = ThreadPoolExecutor(max_workers=settings.MEDIA_WORKERS, thread_name_prefix="media")
+_slots = asyncio.Semaphore(settings.MEDIA_WORKERS)
+_tasks: set[asyncio.Task] = set()
+
+
+async def _in_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+
+
+def enqueue(video_id: int) -> None:
+    """Schedule processing on the running loop; returns immediately."""
+    if not settings.MEDIA_PROCESSING_ENABLED:
+        return
+    task = asyncio.get_running_loop().create_task(process_video(video_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _stage(storage, key: str, size: int) -> str:
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+    os.close(fd)
+    async with aiofiles.open(path, "wb") as f:
+        async for chunk in storage.get_range(key, 0, size - 1):
+            await f.write(chunk)
+    return path
+
+
+async def process_video(video_id: int) -> None:
+    async with _slots:
+        blob_uri = await _in_pool(write_now, crud.set_video_processing, video_id, {"processing_status": PROCESSING})
+        if blob_uri is None:
+            return  # deleted before we got to it
+        if await _in_pool(write_now, crud.copy_processing_from_shared_blob, video_id):
+            await response_cache.invalidate("videos", f"video:{video_id}")
+            return  # a re-upload of content that is already processed
+        staged = None
+        try:
+            storage = get_storage()
+            key = storage.key_for_uri(blob_uri)
+            stat = await storage.stat(key) if key else None
+            if stat is None:
+                raise FileNotFoundError(blob_uri)
+            path = storage.local_path(key)
+            if path is None:
+                path = staged = await _stage(storage, key, stat.size)
+            info = await _in_pool(media.process_file, path)
+            if staged and info.faststart_applied:
+                async with aiofiles.open(staged, "rb") as f:
+                    await storage.put_stream(key, f, stat.content_type or mimetypes.guess_type(key)[0])
+            changes = {k: v for k, v in asdict(info).items() if k != "faststart_applied"}
+            changes["checksum_sha256"] = changes.pop("sha256")
+            await _in_pool(write_now, crud.set_video_processing, video_id, {**changes, "processing_status": READY})
+            logger.info("processed video %s (faststart=%s)", video_id, info.faststart_applied)
+        except Exception:
+            logger.warning("processing video %s failed", video_id, exc_info=True)
+            await _in_pool(write_now, crud.set_video_processing, video_id, {"processing_status": FAILED})
+        finally:
+            if staged:
+                os.unlink(staged)
+    await response_cache.invalidate("videos", f"video:{video_id}")
+
+
+async def shutdown() -> None:
+    for task in list(_tasks):
+        task.cancel()  # rows stay pending/processing; the CLI picks them up again
+    await asyncio.gather(*list(_tasks), return_exceptions=True)
@@ -0,0 +1,308 @@
+# app/ranking.py
+"""Ranked feeds: ``GET /videos?sort=trending|top``.
+
+Scores are materialized in ``video_scores`` and maintained incrementally.
+Each pass folds in only what happened since the previous one: new videos,
+comments and ratings (id watermarks, rechecking ids that commit out of
+order), changed rating stats (``updated_at``) and the views this worker
+counted in memory. So its cost follows activity, not catalog size.
+
+* trending: exponentially decayed activity. An event of weight ``w`` at time
+  ``t`` adds ``w * 2 ** ((t - EPOCH) / half-life)``. Rows store the log2 of
+  the sum, so an event never rescales other rows, and the order is the
+  decayed order at any "now".
+* top: Bayesian average rating, with ``RANKING_TOP_PRIOR_VOTES`` ratings of
+  ``RANKING_TOP_PRIOR_MEAN`` blended in, so one 5-star vote doesn't top the
+  chart.
+
+Each worker serves pages from an in-memory snapshot of the best
+``RANKING_SNAPSHOT_SIZE`` ids per sort. A new snapshot is read through the
+score index after a pass and swapped in with one assignment, so readers
+never wait and never see a half-built ranking. Cursors are keyset
+``(score, video_id)``: a page is a bisect plus a primary-key lookup of
+``limit`` rows, whatever the catalog size. Pages past the snapshot come from
+the index instead.
+
+Every worker runs ``run_forever``. Passes are serialized by a version check
+on ``ranking_state``; a worker that loses the race keeps its views for its
+next pass. Deleted comments and ratings are not subtracted (their activity
+decays away). ``python -m app.cli rank-videos --rebuild`` recomputes
+everything except view history.
+"""
+from __future__ import annotations
+import asyncio
+import bisect
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import crud, models, response_cache
+from .database import SessionLocal, write_now
+from .settings import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+EPOCH = datetime(2024, 1, 1)
+NO_ACTIVITY = -1e9  # log2 score of nothing; adding anything to it gives that thing
+WEIGHTS = {"upload": 4.0, "view": 1.0, "comment": 3.0, "star": 0.5}  # a rating weighs stars * "star"
+BATCH = 5000  # events per source per pass
+OVERLAP = timedelta(seconds=5)  # how late a write may commit and still be seen
+LATE_IDS = 1000  # skipped ids rechecked per source; an id jump larger than this is not waited for
+
+VS, State = models.VideoScore, models.RankingState
+SORTS = {"trending": VS.trending, "top": VS.top}
+
+
+def _log2_add(a: float, b: float) -> float:
+    """log2(2**a + 2**b) without leaving log space."""
+    hi, lo = (a, b) if a >= b else (b, a)
+    return hi + math.log2(1 + 2 ** (lo - hi))
+
+
+def _stamp(at: datetime, weight: float) -> float:
+    return math.log2(weight) + (at - EPOCH).total_seconds() / (settings.RANKING_HALF_LIFE_HOURS * 3600)
+
+
+def bayes(rating_sum: int, rating_count: int) -> float:
+    prior = settings.RANKING_TOP_PRIOR_VOTES
+    return (prior * settings.RANKING_TOP_PRIOR_MEAN + rating_sum) / (prior + rating_count)
+
+
+# --- Incremental pass
+def _state(db: Session) -> models.RankingState:
+    state = db.get(State, 1)
+    if state is None:
+        try:
+            with db.begin_nested():
+                db.add(State(id=1, version=0, last_video_id=0, last_comment_id=0, last_rating_id=0))
+        except IntegrityError:
+            pass  # another worker's first pass created it
+        state = db.get(State, 1)
+    return state
+
+
+def _scan(db: Session, cols: tuple, last_id: int, late: dict[str, str] | None, now: datetime):
+    """Rows past the ``last_id`` watermark (one batch), plus rows for ids skipped by earlier passes.
+
+    Ids are handed out at insert but become visible when their transaction
+    commits, so a pass can read id 12 while 11 is still in flight. Ids the
+    watermark jumps over are kept in ``late`` and looked up again each pass
+    until they show up or are older than OVERLAP (rolled back or deleted).
+    ``cols`` starts with the id column. Returns the rows, the new watermark,
+    the new ``late`` and whether the batch was full.
+    """
+    key = cols[0]
+    rows = db.query(*cols).filter(key > last_id).order_by(key).limit(BATCH).all()
+    mark, seen = (rows[-1][0] if rows else last_id), {row[0] for row in rows}
+    waiting = {int(i): datetime.fromisoformat(at) for i, at in (late or {}).items()}
+    waiting.update((i, now) for i in range(max(last_id + 1, mark - LATE_IDS), mark) if i not in seen)
+    more = len(rows) == BATCH
+    for ids in crud.chunked(sorted(waiting)):
+        found = db.query(*cols).filter(key.in_(ids)).all()
+        rows += found
+        for row in found:
+            del waiting[row[0]]
+    keep = sorted(i for i, at in waiting.items() if now - at <= OVERLAP)[-LATE_IDS:]
+    return rows, mark, {str(i): waiting[i].isoformat() for i in keep}, more
+
+
+def refresh_scores(db: Session, views: dict[int, int] | None = None, now: datetime | None = None) -> bool | None:
+    """One incremental pass, safe to run from several workers at once.
+
+    Returns whether events are still pending (call again), or None when
+    another pass committed first and nothing was written.
+    """
+    now, views = now or datetime.utcnow(), views or {}
+    state = _state(db)
+    version = state.version
+    # claim the pass first: a concurrent one blocks here or finds the version moved on
+    if not db.query(State).filter(State.id == 1, State.version == version).update(
+            {State.version: version + 1, State.refreshed_at: now}, synchronize_session=False):
+        db.rollback()
+        return None
+
+    V, C, R, S = models.Video, models.Comment, models.Rating, models.VideoRatingStats
+    late = state.late_ids or {}
+    videos, video_mark, late_videos, more_videos = _scan(
+        db, (V.video_id, V.upload_date), state.last_video_id, late.get("video"), now)
+    comments, comment_mark, late_comments, more_comments = _scan(
+        db, (C.comment_id, C.video_id, C.created_at), state.last_comment_id, late.get("comment"), now)
+    ratings, rating_mark, late_ratings, more_ratings = _scan(
+        db, (R.rating_id, R.video_id, R.rating, R.created_at), state.last_rating_id, late.get("rating"), now)
+    stats = db.query(S.video_id, S.rating_sum, S.rating_count)
+    if state.stats_seen_at is not None:
+        stats = stats.filter(S.updated_at > state.stats_seen_at)
+    stats = stats.all()
+
+    gains: dict[int, float] = {}
+
+    def gain(video_id: int, at: datetime, weight: float):
+        gains[video_id] = _log2_add(gains.get(video_id, NO_ACTIVITY), _stamp(at, weight))
+
+    for video_id, uploaded in videos:
+        gain(video_id, uploaded, WEIGHTS["upload"])
+    for _, video_id, created in comments:
+        gain(video_id, created, WEIGHTS["comment"])
+    for _, video_id, stars, created in ratings:
+        gain(video_id, created, WEIGHTS["star"] * stars)
+    for video_id, n in views.items():
+        gain(video_id, now, WEIGHTS["view"] * n)
+    tops = {video_id: bayes(rating_sum, count) for video_id, rating_sum, count in stats}
+
+    touched = sorted(gains.keys() | tops.keys())
+    rows = {}
+    for ids in crud.chunked(touched):
+        rows.update((r.video_id, r) for r in db.query(VS.video_id, VS.trending, VS.views).filter(VS.video_id.in_(ids)))
+    missing = [vid for vid in touched if vid not in rows]
+    alive = set()
+    for ids in crud.chunked(missing):
+        alive.update(vid for (vid,) in db.query(V.video_id).filter(V.video_id.in_(ids)))
+
+    inserts, updates = [], []
+    for vid in touched:
+        row = rows.get(vid)
+        if row is None and vid not in alive:
+            continue  # deleted since (views, or rows SQLite didn't cascade)
+        values = {"video_id": vid, "trending": _log2_add(row.trending if row else NO_ACTIVITY, gains.get(vid, NO_ACTIVITY)),
+                  "views": (row.views if row else 0) + views.get(vid, 0)}
+        if row is None or vid in tops:
+            values["top"] = tops.get(vid, bayes(0, 0))
+        (updates if row else inserts).append(values)
+    if inserts:
+        db.execute(insert(VS), inserts)
+    if updates:
+        db.execute(update(VS), updates)  # bulk UPDATE by primary key
+
+    # stats stamped within OVERLAP of now get re-scored next pass too (in case they commit late)
+    seen_at = max(filter(None, (state.stats_seen_at, now - OVERLAP)))
+    db.query(State).filter(State.id == 1).update({
+        State.last_video_id: video_mark,
+        State.last_comment_id: comment_mark,
+        State.last_rating_id: rating_mark,
+        State.late_ids: {"video": late_videos, "comment": late_comments, "rating": late_ratings},
+        State.stats_seen_at: seen_at,
+    }, synchronize_session=False)
+    db.commit()
+    return more_videos or more_comments or more_ratings
+
+
+def rebuild(db: Session) -> None:
+    """Forget every score and watermark; the following passes recompute them (view history is lost)."""
+    db.query(VS).delete(synchronize_session=False)
+    db.query(State).delete(synchronize_session=False)
+    db.commit()
+
+
+# --- Snapshots
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    ids: list[int]  # best first
+    scores: list[float]
+    keys: list[tuple[float, int]]  # (-score, -video_id): ascending in ranked order, for bisect
+    complete: bool  # False: more rows exist past the last id
+
+    def page(self, after: tuple[float, int] | None, skip: int, limit: int) -> list[tuple[int, float]] | None:
+        """``(video_id, score)`` rows after the cursor; None when the page runs past the snapshot."""
+        start = bisect.bisect_right(self.keys, (-after[0], -after[1])) if after else skip
+        if start + limit > len(self.ids) and not self.complete:
+            return None
+        return list(zip(self.ids[start:start + limit], self.scores[start:start + limit]))
+
+
+def _ranked(db: Session, sort: str):
+    score = SORTS[sort]
+    return (db.query(VS.video_id, score).join(models.Video, models.Video.video_id == VS.video_id)
+            .order_by(score.desc(), VS.video_id.desc()))
+
+
+def load_snapshot(db: Session, sort: str, version: int) -> Snapshot:
+    size = settings.RANKING_SNAPSHOT_SIZE
+    rows = _ranked(db, sort).limit(size).all()
+    return Snapshot(version, [r[0] for r in rows], [r[1] for r in rows], [(-r[1], -r[0]) for r in rows], len(rows) < size)
+
+
+def page_from_index(db: Session, sort: str, after: tuple[float, int] | None, skip: int, limit: int) -> list[tuple[int, float]]:
+    q = _ranked(db, sort)
+    if after is not None:
+        score, vid = after
+        # the redundant `<= score` gives the planner a range on ix_video_scores_*
+        q = q.filter(SORTS[sort] <= score, or_(SORTS[sort] < score, and_(SORTS[sort] == score, VS.video_id < vid)))
+    else:
+        q = q.offset(skip)
+    return [(vid, score) for vid, score in q.limit(limit)]
+
+
+def current_version(db: Session) -> int:
+    return db.query(State.version).filter(State.id == 1).scalar() or 0
+
+
+_snapshots: dict[str, Snapshot] = {}
+_pending_views: dict[int, int] = {}
+
+
+async def page(db, sort: str, after: tuple[float, int] | None, skip: int, limit: int) -> list[tuple[int, float]]:
+    """A ranked page from this worker's snapshot, or from the index past its end (or before the first pass)."""
+    snapshot = _snapshots.get(sort)
+    rows = snapshot.page(after, skip, limit) if snapshot is not None else None
+    if rows is None:
+        rows = await db.run(page_from_index, sort, after, skip, limit)
+    return rows
+
+
+def record_view(video_id: int) -> None:
+    """Count a playback start; folded into trending by this worker's next pass."""
+    _pending_views[video_id] = _pending_views.get(video_id, 0) + 1
+
+
+def _read(fn, *args):
+    with SessionLocal() as db:
+        return fn(db, *args)
+
+
+async def reload_snapshots() -> bool:
+    """Swap in fresh snapshots if any worker's pass committed since ours were read."""
+    global _snapshots
+    version = await asyncio.to_thread(_read, current_version)
+    if _snapshots and next(iter(_snapshots.values())).version == version:
+        return False
+    fresh = {sort: await asyncio.to_thread(_read, load_snapshot, sort, version) for sort in SORTS}
+    _snapshots = fresh
+    await response_cache.invalidate("ranking")
+    return True
+
+
+async def refresh() -> None:
+    """Passes until caught up (this worker's views included), then new snapshots if anything changed."""
+    global _pending_views
+    while True:
+        views, _pending_views = _pending_views, {}
+        try:
+            more = await asyncio.to_thread(write_now, refresh_scores, views)
+        except BaseException:
+            _requeue(views)
+            raise
+        if more is None:
+            _requeue(views)  # another worker's pass won; ours goes next time
+        if not more:
+            break
+    await reload_snapshots()
+
+
+def _requeue(views: dict[int, int]) -> None:
+    for video_id, n in views.items():
+        _pending_views[video_id] = _pending_views.get(video_id, 0) + n
+
+
+async def run_forever() -> None:
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.warning("ranking refresh failed", exc_info=True)
+        await asyncio.sleep(settings.RANKING_REFRESH_SECONDS)
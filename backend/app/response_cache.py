@@ -0,0 +1,227 @@
+# app/response_cache.py
+"""Read-through cache of serialized JSON responses for public GET endpoints.
+
+An entry is keyed by the request (path + query) *and* the current version of
+every tag the response depends on (``video:12``, ``videos``, ...). Write paths
+call ``invalidate(*tags)``, which only bumps those versions: entries built
+from older versions are never looked up again and age out of the LRU.
+
+Without ``RESPONSE_CACHE_REDIS_URL`` versions and bodies live in this process,
+so each uvicorn worker only sees its own invalidations. With it, versions are
+read from Redis on every lookup and bodies are shared there too (with a local
+copy of hot entries, which is safe because the key embeds the versions).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .cache import TTLCache
+from .settings import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+CACHE_CONTROL = "no-cache"  # clients may store, but must revalidate (cheap 304s)
+ALL = "all"  # implicit tag on every entry; invalidate(ALL) drops everything
+VERSION_SLOTS = 1 << 16
+
+
+@dataclass(frozen=True)
+class Entry:
+    body: bytes
+    etag: str
+    headers: tuple[tuple[str, str], ...] = ()
+
+
+def _weigh(entry: Entry) -> int:
+    return len(entry.body) + 128
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _request_key(request: Request, versions: Iterable[int]) -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    raw = f"{request.url.path}?{query}|{','.join(map(str, versions))}"
+    return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+
+# --- Backends
+class LocalBackend:
+    """Per-process LRU bounded by entries and bytes; tag versions in a fixed counter table."""
+    name = "local"
+
+    def __init__(self):
+        self.entries = TTLCache(
+            settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS,
+            maxweight=settings.RESPONSE_CACHE_MAX_BYTES, weigh=_weigh,
+        )
+        # Tags hash into a fixed table so memory stays flat however many ids get written;
+        # a collision only costs an extra invalidation.
+        self._versions = [0] * VERSION_SLOTS
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _slot(tag: str) -> int:
+        return zlib.crc32(tag.encode()) % VERSION_SLOTS
+
+    async def versions(self, tags: list[str]) -> list[int]:
+        return [self._versions[self._slot(t)] for t in tags]
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for t in tags:
+                self._versions[self._slot(t)] += 1
+
+    async def get(self, key: str) -> Entry | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, entry: Entry) -> None:
+        self.entries.set(key, entry)
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+class RedisBackend(LocalBackend):
+    """Versions and bodies in Redis so every worker agrees; the local LRU fronts hot bodies."""
+    name = "redis"
+    prefix = "rc:"
+
+    def __init__(self, url: str):
+        # Import here so the app runs without redis installed.
+        from redis import asyncio as aioredis
+        super().__init__()
+        self._redis = aioredis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    async def versions(self, tags):
+        return [int(v or 0) for v in await self._redis.mget([f"{self.prefix}v:{t}" for t in tags])]
+
+    async def bump(self, tags):
+        pipe = self._redis.pipeline(transaction=False)
+        for t in tags:
+            pipe.incr(f"{self.prefix}v:{t}")
+        await pipe.execute()
+
+    async def get(self, key):
+        entry = await super().get(key)
+        if entry is not None:
+            return entry
+        raw = await self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b"\n")
+        etag, headers = json.loads(meta)
+        entry = Entry(body, etag, tuple(map(tuple, headers)))
+        await super().set(key, entry)
+        return entry
+
+    async def set(self, key, entry):
+        await super().set(key, entry)
+        meta = json.dumps([entry.etag, entry.headers]).encode()
+        await self._redis.set(self.prefix + key, meta + b"\n" + entry.body, ex=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+_backend: LocalBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> LocalBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = LocalBackend()
+                if settings.RESPONSE_CACHE_REDIS_URL:
+                    try:
+                        _backend = RedisBackend(settings.RESPONSE_CACHE_REDIS_URL)
+                    except ImportError:
+                        logger.warning("redis not installed; response cache is per-process")
+    return _backend
+
+
+# --- Counters
+_counts = {"hits": 0, "misses": 0, "not_modified": 0, "bytes_from_cache": 0, "bytes_saved": 0, "errors": 0}
+_counts_lock = threading.Lock()
+
+
+def _count(**deltas: int) -> None:
+    with _counts_lock:
+        for k, v in deltas.items():
+            _counts[k] += v
+
+
+def stats() -> dict:
+    with _counts_lock:
+        out = dict(_counts)
+    lookups = out["hits"] + out["misses"]
+    out["hit_ratio"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+    backend = get_backend()
+    out["backend"] = backend.name
+    out["local"] = backend.stats()
+    return out
+
+
+# --- Request path
+async def invalidate(*tags: str) -> None:
+    """Call after committing a write that changes what responses tagged ``tags`` would contain."""
+    if not settings.RESPONSE_CACHE_ENABLED or not tags:
+        return
+    try:
+        await get_backend().bump(tags)
+    except Exception:
+        _count(errors=1)
+        logger.warning("response cache invalidation failed for %s", tags, exc_info=True)
+
+
+async def respond(
+    request: Request,
+    tags: Iterable[str],
+    render: Callable[[], Awaitable[bytes | tuple[bytes, dict[str, str]]]],
+) -> Response:
+    """Serve ``request`` from the cache, or await ``render()`` for the JSON body (and extra headers) and store it.
+
+    ``render`` may raise HTTPException; errors are never cached.
+    """
+    tags = [*tags, ALL]
+    backend, key, entry = get_backend(), None, None
+    if settings.RESPONSE_CACHE_ENABLED:
+        try:
+            key = _request_key(request, await backend.versions(tags))
+            entry = await backend.get(key)
+        except Exception:
+            # shared backend down: serve uncached rather than risk a stale hit
+            key = None
+            _count(errors=1)
+            logger.warning("response cache lookup failed", exc_info=True)
+
+    if entry is not None:
+        _count(hits=1, bytes_from_cache=len(entry.body))
+        status = "HIT"
+    else:
+        out = await render()
+        body, headers = out if isinstance(out, tuple) else (out, {})
+        entry = Entry(body, _etag(body), tuple(headers.items()))
+        if key is not None:
+            try:
+                await backend.set(key, entry)
+            except Exception:
+                _count(errors=1)
+                logger.warning("response cache store failed", exc_info=True)
+        _count(misses=1)
+        status = "MISS"
+
+    headers = {"ETag": entry.etag, "Cache-Control": CACHE_CONTROL, "X-Cache": status, **dict(entry.headers)}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or entry.etag in (t.strip() for t in inm.split(","))):
+        _count(not_modified=1, bytes_saved=len(entry.body))
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
@@ -1,10 +1,10 @@
 # app/routers/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import JWTError, jwt
-from .. import schemas, crud, models, utils
-from ..database import get_db
+from sqlalchemy.exc import IntegrityError
+from .. import schemas, crud, models, utils, principals
+from ..database import Database, get_database
 from ..settings import settings
 
 ALGORITHM = utils.ALGORITHM
@@ -12,42 +12,61 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if crud.get_user_by_email(db, user.email):
+async def register(user: schemas.UserCreate, db: Database = Depends(get_database)):
+    # on the primary: a replica lagging behind a double-submit would let both through
+    if await db.read_primary(crud.get_user_by_email, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
         # check username
-    if crud.get_user_by_username(db, user.username):
+    if await db.read_primary(crud.get_user_by_username, user.username):
         raise HTTPException(status_code=400, detail="Username already taken")
-    # role is forced to consumer in CRUD
-    return crud.create_user(db, user)
+    hashed = await utils.hash_password_async(user.password)
+    # role is forced to consumer in CRUD; no connection is held while bcrypt runs
+    try:
+        return await db.write(crud.create_user, user, hashed)
+    except IntegrityError:
+        # registered concurrently, between the checks above and this insert
+        raise HTTPException(status_code=400, detail="Email or username already registered")
 
 @router.post("/login", response_model=schemas.TokenWithUser)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, form.username)
-    if not user or not utils.verify_password(form.password, user.hashed_password):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_database)):
+    # on the primary, so logging in right after registering works; no connection is held while bcrypt runs
+    user = await db.read_primary(crud.get_user_by_email, form.username)
+    valid, new_hash = await utils.verify_and_update_async(form.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password", headers={"WWW-Authenticate": "Bearer"})
+    if new_hash:
+        # cost parameter changed since this hash was made: upgrade it transparently
+        await db.write(crud.set_password_hash, user.user_id, new_hash)
     token = utils.create_access_token(data={"sub": str(user.user_id)})
     return {"access_token": token, "token_type": "bearer", "user": user}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = Depends(get_database)) -> principals.Principal:
     creds_exc = HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
+    user_id = principals.token_subject(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+            sub = payload.get("sub")
+            if sub is None:
+                raise creds_exc
+            user_id = int(sub)
+        except (JWTError, ValueError):
             raise creds_exc
-    except JWTError:
-        raise creds_exc
-    user = crud.get_user(db, int(user_id))
-    if not user:
-        raise creds_exc
-    return user
+        principals.remember_token(token, user_id, payload.get("exp"))
+    principal = principals.get_principal(user_id)
+    if principal is None:
+        user = await db.run(crud.get_user, user_id)
+        if not user:
+            raise creds_exc
+        principal = principals.Principal.from_user(user)
+        principals.remember_principal(principal)
+    return principal
 
-def require_admin(user: models.User = Depends(get_current_user)):
+async def require_admin(user: models.User = Depends(get_current_user)):
     if user.role != models.UserRole.admin:
         raise HTTPException(status_code=403, detail="Admin only")
     return user
 
 @router.get("/me", response_model=schemas.UserOut)
-def me(current_user: models.User = Depends(get_current_user)):
+async def me(current_user: models.User = Depends(get_current_user)):
     return current_user
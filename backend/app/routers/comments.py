@@ -1,40 +1,67 @@
 # app/routers/comments.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from typing import List
-from .auth import get_current_user
-from .. import schemas, crud, models
-from ..database import get_db
+from .auth import get_current_user, require_admin
+from .. import schemas, crud, fastjson, models, response_cache, utils
+from ..database import Database, ReadSessionLocal, get_database
 
 router = APIRouter(prefix="/videos/{video_id}/comments", tags=["Comments"])
 
 @router.post("/", response_model=schemas.CommentOut, status_code=status.HTTP_201_CREATED)
-def create_comment(video_id: int, payload: schemas.CommentBase, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    return crud.create_comment(db, video_id=video_id, user_id=user.user_id, comment_text=payload.comment_text)
+async def create_comment(video_id: int, payload: schemas.CommentBase, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    comment = await db.write(crud.create_comment, video_id=video_id, user_id=user.user_id, comment_text=payload.comment_text)
+    await response_cache.invalidate("comments")  # feed comment counts
+    return comment
 
 @router.get("/", response_model=List[schemas.CommentOut])
-def list_comments(video_id: int, db: Session = Depends(get_db)):
-    from ..models import Comment
-    return db.query(Comment).filter(Comment.video_id == video_id).order_by(Comment.created_at.desc()).all()
+async def list_comments(
+    video_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Database = Depends(get_database),
+):
+    try:
+        after = utils.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    comments = await db.run(crud.get_comment_rows, video_id, limit=limit, cursor=after)
+    headers = {}
+    if len(comments) == limit:
+        last = comments[-1]
+        headers[utils.NEXT_CURSOR_HEADER] = utils.encode_cursor(last["created_at"], last["comment_id"])
+    return fastjson.response(comments, headers)
+
+@router.get("/export", response_class=StreamingResponse, responses={200: {"content": {"application/x-ndjson": {}}}},
+            dependencies=[Depends(require_admin)])
+async def export_comments(video_id: int, db: Database = Depends(get_database)):
+    """Every comment as NDJSON, newest first (moderation, admins only); memory stays flat however many there are."""
+    if not await db.run(crud.get_video, video_id):
+        raise HTTPException(status_code=404, detail="Video not found")
+    def rows():
+        # own session: the request-scoped one is closed before the body streams
+        db = ReadSessionLocal()
+        try:
+            for row in crud.iter_comment_rows(db, video_id):
+                yield fastjson.dumps(row._asdict()) + b"\n"
+        finally:
+            db.close()
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
 
 @router.put("/{comment_id}", response_model=schemas.CommentOut)
-def update_comment(video_id: int, comment_id: int, payload: schemas.CommentUpdate, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    from ..models import Comment
-    comment = db.query(Comment).filter(Comment.comment_id == comment_id, Comment.video_id == video_id).first()
+async def update_comment(video_id: int, comment_id: int, payload: schemas.CommentUpdate, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    comment = await db.run(crud.get_comment, video_id, comment_id)
     if not comment: raise HTTPException(status_code=404, detail="Comment not found")
     if user.role != models.UserRole.admin and comment.user_id != user.user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
-    for k, v in payload.dict(exclude_unset=True).items():
-        setattr(comment, k, v)
-    db.commit(); db.refresh(comment)
-    return comment
+    return await db.write(crud.update_comment, comment, payload.dict(exclude_unset=True))
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(video_id: int, comment_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    from ..models import Comment
-    comment = db.query(Comment).filter(Comment.comment_id == comment_id, Comment.video_id == video_id).first()
+async def delete_comment(video_id: int, comment_id: int, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    comment = await db.run(crud.get_comment, video_id, comment_id)
     if not comment: raise HTTPException(status_code=404, detail="Comment not found")
     if user.role != models.UserRole.admin and comment.user_id != user.user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
-    db.delete(comment); db.commit()
+    await db.write(crud.delete_comment, comment)
+    await response_cache.invalidate("comments")
     return None
@@ -1,17 +1,42 @@
 # app/routers/ratings.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import TypeAdapter
 from typing import Dict
 from .auth import get_current_user
-from .. import schemas, crud, models
-from ..database import get_db
+from .. import schemas, crud, models, response_cache
+from ..database import Database, get_database
 
 router = APIRouter(prefix="/videos/{video_id}/ratings", tags=["Ratings"])
+# Batch endpoints that aren't scoped to a single video
+batch_router = APIRouter(prefix="/videos/ratings", tags=["Ratings"])
+
+MAX_SUMMARY_IDS = 100
+
+_summary_map = TypeAdapter(Dict[int, schemas.RatingSummary])
 
 @router.put("/", response_model=schemas.RatingOut)
-def rate(video_id: int, payload: schemas.RatingBase, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    return crud.upsert_rating(db, video_id=video_id, user_id=user.user_id, rating_value=payload.rating)
+async def rate(video_id: int, payload: schemas.RatingBase, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    rating = await db.write(crud.upsert_rating, video_id=video_id, user_id=user.user_id, rating_value=payload.rating)
+    await response_cache.invalidate("ratings", f"ratings:{video_id}")
+    return rating
+
+@router.get("/summary", response_model=schemas.RatingSummary)
+async def rating_summary(video_id: int, request: Request, db: Database = Depends(get_database)):
+    async def render():
+        summary = await db.run(crud.rating_summary, video_id)
+        return schemas.RatingSummary.model_validate(summary).model_dump_json().encode()
+    return await response_cache.respond(request, [f"ratings:{video_id}"], render)
 
-@router.get("/summary", response_model=dict)
-def rating_summary(video_id: int, db: Session = Depends(get_db)) -> Dict[str, float | int]:
-    return crud.rating_summary(db, video_id)
+@batch_router.get("/summary", response_model=Dict[int, schemas.RatingSummary])
+async def rating_summaries(request: Request, ids: str = Query(..., description="Comma-separated video ids, at most 100"), db: Database = Depends(get_database)):
+    try:
+        video_ids = list(dict.fromkeys(int(x) for x in ids.split(",") if x.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not video_ids:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(video_ids) > MAX_SUMMARY_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SUMMARY_IDS} ids per request")
+    async def render():
+        return _summary_map.dump_json(_summary_map.validate_python(await db.run(crud.rating_summaries, video_ids)))
+    return await response_cache.respond(request, [f"ratings:{i}" for i in video_ids], render)
@@ -0,0 +1,187 @@
+# app/routers/uploads.py
+"""Resumable uploads: create a session, PUT numbered chunks (any order, in
+parallel, retried freely), check what arrived, then finish into a Video.
+
+Chunks are staged through the storage layer (sparse file locally, uncommitted
+blocks on Azure) and assembled on finish; sessions idle for
+UPLOAD_SESSION_TTL_HOURS are garbage-collected (app/upload_gc.py).
+
+Content the server already stores is not stored twice: a client that declares
+the file's SHA-256 up front gets a session that is complete from the start,
+and on finish the staged bytes are hashed (where the backend can read them
+back) and dropped in favour of an existing identical blob.
+"""
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+
+from .auth import get_current_user
+from .videos import VIDEO_CONTENT_TYPES
+from .. import crud, metrics, models, processing, response_cache, schemas
+from ..database import Database, get_database
+from ..settings import settings
+from ..storage import get_storage, new_blob_key
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+MAX_CHUNKS = 50_000  # Azure's limit on blocks per block blob
+
+
+def _chunk_count(upload: models.UploadSession) -> int:
+    return -(-upload.size // upload.chunk_size)
+
+
+def _chunk_length(upload: models.UploadSession, index: int) -> int:
+    return min(upload.chunk_size, upload.size - index * upload.chunk_size)
+
+
+def _ranges(indexes: list[int]) -> list[tuple[int, int]]:
+    out: list[tuple[int, int]] = []
+    for i in indexes:
+        if out and out[-1][1] == i - 1:
+            out[-1] = (out[-1][0], i)
+        else:
+            out.append((i, i))
+    return out
+
+
+def _status(upload: models.UploadSession, chunks) -> schemas.UploadSessionOut:
+    if upload.sha256:
+        chunks = [(i, _chunk_length(upload, i)) for i in range(_chunk_count(upload))]
+    return schemas.UploadSessionOut(
+        upload_id=upload.upload_id,
+        size=upload.size,
+        chunk_size=upload.chunk_size,
+        chunk_count=_chunk_count(upload),
+        received=_ranges([i for i, _ in chunks]),
+        received_bytes=sum(n for _, n in chunks),
+        complete=len(chunks) == _chunk_count(upload),
+        deduplicated=upload.sha256 is not None,
+        expires_at=upload.updated_at + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+    )
+
+
+async def _own_upload(upload_id: str, db: Database, user: models.User) -> models.UploadSession:
+    upload = await db.run(crud.get_upload_session, upload_id, user.user_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.post("/", response_model=schemas.UploadSessionOut, status_code=status.HTTP_201_CREATED)
+async def create_upload(payload: schemas.UploadSessionCreate, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    if user.role not in (models.UserRole.creator, models.UserRole.admin):
+        raise HTTPException(status_code=403, detail="Only creators or admins can upload videos")
+    if payload.content_type not in VIDEO_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+    if payload.size > settings.UPLOAD_SESSION_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    chunk_size = min(max(payload.chunk_size or settings.UPLOAD_SESSION_CHUNK_BYTES, MIN_CHUNK_BYTES), MAX_CHUNK_BYTES)
+    chunk_size = max(chunk_size, -(-payload.size // MAX_CHUNKS))  # big files get bigger chunks, so they can be committed
+    if chunk_size > MAX_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    upload_id, key = uuid4().hex, new_blob_key(user.user_id, payload.filename)
+    known = await db.run(crud.get_blob_by_sha256, payload.sha256) if payload.sha256 else None
+    if known is None or known.size != payload.size:
+        known = None
+        await get_storage().stage_open(upload_id, key, payload.size)
+    upload = await db.write(
+        crud.create_upload_session,
+        upload_id=upload_id, user_id=user.user_id, blob_key=key, filename=payload.filename,
+        content_type=payload.content_type, size=payload.size, chunk_size=chunk_size,
+        sha256=known and known.sha256,
+    )
+    return _status(upload, [])
+
+
+@router.get("/{upload_id}", response_model=schemas.UploadSessionOut)
+async def upload_status(upload_id: str, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    """What has arrived so far; a resuming client re-sends only the gaps."""
+    upload = await _own_upload(upload_id, db, user)
+    return _status(upload, await db.run(crud.get_upload_chunks, upload_id))
+
+
+@router.put("/{upload_id}/chunks/{index}", status_code=status.HTTP_204_NO_CONTENT)
+async def put_chunk(upload_id: str, index: int, request: Request, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    """Raw chunk body (application/octet-stream). Idempotent: re-sending a chunk overwrites it."""
+    upload = await _own_upload(upload_id, db, user)
+    if not 0 <= index < _chunk_count(upload):
+        raise HTTPException(status_code=404, detail="Chunk index out of range")
+    if upload.sha256:
+        raise HTTPException(status_code=409, detail="Content already stored; complete the upload")
+    expected = _chunk_length(upload, index)
+    declared = request.headers.get("content-length")
+    if declared is not None and declared.isdigit() and int(declared) != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+
+    body = bytearray()
+    async for part in request.stream():
+        body += part
+        if len(body) > expected:
+            raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+    if len(body) != expected:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected} bytes")
+
+    started = time.perf_counter()
+    await get_storage().stage_chunk(upload_id, upload.blob_key, index, index * upload.chunk_size, bytes(body))
+    metrics.record_upload("chunk", expected, time.perf_counter() - started)
+    await db.write(crud.record_upload_chunk, upload_id, index, expected)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/{upload_id}/complete", response_model=schemas.VideoOut, status_code=status.HTTP_201_CREATED)
+async def complete_upload(upload_id: str, payload: schemas.UploadFinish, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    upload = await _own_upload(upload_id, db, user)
+    chunks = await db.run(crud.get_upload_chunks, upload_id)
+    state = _status(upload, chunks)
+    if not state.complete:
+        raise HTTPException(status_code=409, detail={"message": "Upload incomplete", "received": state.received})
+
+    # claim the session: of two concurrent completes only one gets past here, so the
+    # chunks are committed and the Video created once
+    if not await db.write(crud.delete_upload_session, upload_id):
+        raise HTTPException(status_code=409, detail="Upload already finished or expired")
+
+    storage, blob_url, sha256 = get_storage(), None, upload.sha256
+    try:
+        if sha256 is None:
+            sha256 = await storage.stage_digest(upload_id)
+            if sha256 and await db.run(crud.get_blob_by_sha256, sha256):
+                await storage.stage_abort(upload_id, upload.blob_key)
+            else:
+                try:
+                    blob_url = await storage.stage_commit(upload_id, upload.blob_key, state.chunk_count, upload.content_type)
+                except FileNotFoundError:
+                    raise HTTPException(status_code=409, detail="Upload already finished or expired")
+        db_video = await db.write(
+            crud.create_video, video=schemas.VideoCreate(**payload.model_dump(), blob_uri=blob_url),
+            creator_id=user.user_id, blob_url=blob_url, sha256=sha256, size=upload.size,
+        )
+    except LookupError:
+        # the identical blob we were relying on has been deleted since
+        raise HTTPException(status_code=409, detail="Stored copy no longer exists; upload the file again")
+    except BaseException:
+        # the session is gone, so nothing else will clean up after it
+        await storage.stage_abort(upload_id, upload.blob_key)
+        if blob_url:
+            await storage.delete_many([storage.key_for_uri(blob_url)])
+        raise
+    if blob_url and db_video.blob_uri != blob_url:
+        await storage.delete_many([storage.key_for_uri(blob_url)])  # lost a race to an identical upload
+    metrics.UPLOADS.inc(("resumable", "stored" if blob_url else "deduplicated"))
+    await response_cache.invalidate("videos")
+    processing.enqueue(db_video.video_id)
+    return db_video
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(upload_id: str, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    upload = await _own_upload(upload_id, db, user)
+    await db.write(crud.delete_upload_session, upload_id)
+    await get_storage().stage_abort(upload_id, upload.blob_key)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,30 +1,32 @@
 # app/routers/users.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from typing import List
 from .auth import get_current_user, require_admin
-from .. import schemas, crud, models
-from ..database import get_db
+from .. import schemas, crud, fastjson, models, principals, response_cache, utils
+from ..database import Database, get_database
+from ..storage import get_storage
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.post("/", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_admin)])
-def create_user_admin(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return crud.create_user(db, user)
+async def create_user_admin(user: schemas.UserCreate, db: Database = Depends(get_database)):
+    return await db.write(crud.create_user, user, await utils.hash_password_async(user.password))
 
 @router.get("/{user_id}", response_model=schemas.UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id)
-    if not db_user: raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+async def read_user(user_id: int, request: Request, db: Database = Depends(get_database)):
+    async def render():
+        db_user = await db.run(crud.get_user, user_id)
+        if not db_user: raise HTTPException(status_code=404, detail="User not found")
+        return schemas.UserOut.model_validate(db_user).model_dump_json().encode()
+    return await response_cache.respond(request, [f"user:{user_id}"], render)
 
 @router.get("/", response_model=List[schemas.UserOut], dependencies=[Depends(require_admin)])
-def list_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_users(db, skip=skip, limit=limit)
+async def list_users(skip: int = 0, limit: int = 10, db: Database = Depends(get_database)):
+    return fastjson.response(await db.run(crud.get_user_rows, skip=skip, limit=limit))
 
 @router.put("/{user_id}", response_model=schemas.UserOut)
-def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Depends(get_db), current: models.User = Depends(get_current_user)):
-    db_user = crud.get_user(db, user_id)
+async def update_user(user_id: int, user_update: schemas.UserUpdate, db: Database = Depends(get_database), current: models.User = Depends(get_current_user)):
+    db_user = await db.run(crud.get_user, user_id)
     if not db_user: raise HTTPException(status_code=404, detail="User not found")
     # Only admin can change role; users can change own profile fields
     if user_update.role and current.role != models.UserRole.admin:
@@ -35,29 +37,34 @@ def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Dep
 
     # email uniqueness
     if "email" in payload:
-        existing = crud.get_user_by_email(db, payload["email"])
+        existing = await db.run(crud.get_user_by_email, payload["email"])
         if existing and existing.user_id != user_id:
             raise HTTPException(status_code=400, detail="Email already in use")
 
     
 
-    for k, v in payload.items():
-        setattr(db_user, k, v)
-    db.commit();
-    db.refresh(db_user)
+    db_user = await db.write(crud.update_user, db_user, payload)
+    principals.invalidate_user(user_id)
+    await response_cache.invalidate(f"user:{user_id}", "users")
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id)
+async def delete_user(user_id: int, background_tasks: BackgroundTasks, db: Database = Depends(get_database)):
+    db_user = await db.run(crud.get_user, user_id)
     if not db_user: raise HTTPException(status_code=404, detail="User not found")
-    db.delete(db_user); db.commit()
+    orphans = await db.write(crud.delete_user, db_user)
+    storage = get_storage()
+    if keys := [k for k in map(storage.key_for_uri, orphans) if k]:
+        background_tasks.add_task(storage.delete_many, keys)
+    principals.invalidate_user(user_id)
+    # their videos, comments and ratings are gone too
+    await response_cache.invalidate(response_cache.ALL)
     return None
 
 @router.post("/me/role", response_model=schemas.UserOut)
-def set_my_role(
+async def set_my_role(
     payload: schemas.UserRoleChange,
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current: models.User = Depends(get_current_user)
 ):
     """
@@ -70,10 +77,13 @@ def set_my_role(
     if role_value not in (models.UserRole.consumer.value, models.UserRole.creator.value):
         raise HTTPException(status_code=403, detail="You can only choose consumer or creator.")
 
-    current.role = models.UserRole(role_value)
-    db.commit(); db.refresh(current)
-    return current
+    db_user = await db.run(crud.get_user, current.user_id)
+    if not db_user: raise HTTPException(status_code=404, detail="User not found")
+    db_user = await db.write(crud.update_user, db_user, {"role": models.UserRole(role_value)})
+    principals.invalidate_user(db_user.user_id)
+    await response_cache.invalidate(f"user:{db_user.user_id}", "users")
+    return db_user
 
 @router.post("/admin", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_admin)])
-def create_user_with_role(user: schemas.AdminUserCreate, db: Session = Depends(get_db)):
-    return crud.create_user(db, user)
\ No newline at end of file
+async def create_user_with_role(user: schemas.AdminUserCreate, db: Database = Depends(get_database)):
+    return await db.write(crud.create_user, user, await utils.hash_password_async(user.password))
\ No newline at end of file
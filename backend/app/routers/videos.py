@@ -1,39 +1,24 @@
-from urllib.parse import urlparse
-from uuid import uuid4
-from typing import List
+import mimetypes
+import time
+from typing import List, Literal
 
-from fastapi import APIRouter, Depends, Form, File, UploadFile, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, File, UploadFile, HTTPException, Query, Request, status
+from fastapi.responses import RedirectResponse
+from pydantic import TypeAdapter
 
 from ..models import UserRole
-from ..settings import settings
 from .auth import get_current_user
-from .. import schemas, crud, models
-from ..database import get_db
+from .. import schemas, crud, fastjson, metrics, models, processing, ranking, response_cache, search, utils
+from ..storage import get_storage, new_blob_key, sha256_stream
+from ..streaming import range_response
+from ..database import Database, get_database
+from ..settings import settings
 
 router = APIRouter(prefix="/videos", tags=["Videos"])
 
-# --- Azure optional import (so local dev works without azure-storage-blob)
-_blob_service = None
-_ContentSettings = None
-_container_client = None
-if settings.AZURE_STORAGE_CONNECTION_STRING:
-    try:
-        from azure.storage.blob import BlobServiceClient, ContentSettings  # type: ignore
-        _blob_service = BlobServiceClient.from_connection_string(
-            settings.AZURE_STORAGE_CONNECTION_STRING
-        )
-        _ContentSettings = ContentSettings
-        _container_client = _blob_service.get_container_client(settings.AZURE_BLOB_CONTAINER)
-        try:
-            _container_client.create_container()
-        except Exception:
-            pass  
-    except ImportError:
-        # Azure libs not installed -> fall back to local filesystem
-        _blob_service = None
-        _ContentSettings = None
-        _container_client = None
+VIDEO_CONTENT_TYPES = {"video/mp4", "video/quicktime", "video/webm"}
+
+_video_list = TypeAdapter(List[schemas.VideoOut])
 
 
 def _ensure_owner_or_admin(db_video: models.Video, user: models.User):
@@ -51,92 +36,177 @@ async def create_video(
     genre: str | None = Form(None),
     age_rating: str | None = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_database),
     current_user: models.User = Depends(get_current_user),
 ):
     if current_user.role not in (UserRole.creator, UserRole.admin):
         raise HTTPException(status_code=403, detail="Only creators or admins can upload videos")
 
-    if file.content_type not in {"video/mp4", "video/quicktime", "video/webm"}:
+    if file.content_type not in VIDEO_CONTENT_TYPES:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    if _container_client:
-        # Azure branch
-        data = await file.read()  # simple (can be streamed later)
-        blob_name = f"{current_user.user_id}/{uuid4()}_{file.filename}"
-        content_settings = _ContentSettings(content_type=file.content_type) if _ContentSettings else None
-        _container_client.upload_blob(name=blob_name, data=data, overwrite=True, content_settings=content_settings)
-        blob_url = _container_client.get_blob_client(blob=blob_name).url
-    else:
-        # DEV branch: write to disk
-        import os, aiofiles
-        from pathlib import Path
-        root = settings.LOCAL_DEV_UPLOAD_DIR
-        os.makedirs(root, exist_ok=True)
-        dev_name = f"{current_user.user_id}_{uuid4()}_{file.filename}"
-        full_path = Path(root) / dev_name
-        async with aiofiles.open(full_path, "wb") as f:
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB chunks
-                if not chunk:
-                    break
-                await f.write(chunk)
-        blob_url = f"/static/{dev_name}"
-
-    db_video = crud.create_video(
-        db,
-        video=schemas.VideoCreate(
-            title=title, publisher=publisher, producer=producer,
-            genre=genre, age_rating=age_rating, blob_uri=blob_url
-        ),
-        creator_id=current_user.user_id,
-        blob_url=blob_url,
+    storage = get_storage()
+
+    async def transfer():
+        await file.seek(0)
+        return await storage.put_stream(new_blob_key(current_user.user_id, file.filename), file, file.content_type)
+
+    # the body is already spooled locally, so hashing first lets a re-upload skip the transfer
+    sha256, size = await sha256_stream(file)
+    started = time.perf_counter()
+    blob_url = None if await db.run(crud.get_blob_by_sha256, sha256) else await transfer()
+    metrics.record_upload("single", size, blob_url and time.perf_counter() - started, deduplicated=blob_url is None)
+    video = schemas.VideoCreate(
+        title=title, publisher=publisher, producer=producer,
+        genre=genre, age_rating=age_rating, blob_uri=blob_url
     )
+    try:
+        try:
+            db_video = await db.write(crud.create_video, video=video, creator_id=current_user.user_id, blob_url=blob_url, sha256=sha256, size=size)
+        except LookupError:
+            # the matching blob was deleted since we looked: store ours after all
+            blob_url = await transfer()
+            db_video = await db.write(crud.create_video, video=video, creator_id=current_user.user_id, blob_url=blob_url, sha256=sha256, size=size)
+    except BaseException:
+        # no blob row points at our copy, so nothing else would ever remove it
+        if blob_url:
+            await storage.delete_many([storage.key_for_uri(blob_url)])
+        raise
+    if blob_url and db_video.blob_uri != blob_url:
+        await storage.delete_many([storage.key_for_uri(blob_url)])  # lost a race to an identical upload
+    await response_cache.invalidate("videos")
+    processing.enqueue(db_video.video_id)
     return db_video
 
 
-@router.get("/{video_id}", response_model=schemas.VideoOut)
-def read_video(video_id: int, db: Session = Depends(get_db)):
-    video = crud.get_video(db, video_id)
-    if not video:
+@router.get("/search", response_model=List[schemas.VideoOut])
+async def search_videos(
+    q: str = Query(..., min_length=1, max_length=200),
+    genre: str | None = None,
+    age_rating: str | None = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Database = Depends(get_database),
+):
+    """Ranked full-text search; every word must match (as a prefix) in title, genre, publisher or producer."""
+    return await db.run(search.search_videos, q, genre=genre, age_rating=age_rating, skip=skip, limit=limit)
+
+
+@router.get("/{video_id}/stream")
+async def stream_video(video_id: int, request: Request, db: Database = Depends(get_database)):
+    """Range-capable playback: seeking costs one small 206 read instead of a re-download."""
+    video = await db.run(crud.get_video, video_id)
+    if not video or not video.blob_uri:
         raise HTTPException(status_code=404, detail="Video not found")
-    return video
+
+    storage = get_storage()
+    key = storage.key_for_uri(video.blob_uri)
+    if key is None:
+        # not something we host (e.g. an external URL set via update_video)
+        return RedirectResponse(video.blob_uri, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    stat = await storage.stat(key)
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Video file not found")
+    if settings.RANKING_ENABLED and request.headers.get("range", "bytes=0-").startswith("bytes=0-"):
+        ranking.record_view(video_id)  # playback starts count, seeks don't
+
+    return range_response(
+        request,
+        size=stat.size,
+        etag=stat.etag,
+        last_modified=stat.last_modified,
+        media_type=stat.content_type or mimetypes.guess_type(key)[0] or "application/octet-stream",
+        path=storage.local_path(key),
+        reader=lambda start, end: storage.get_range(key, start, end),
+    )
+
+
+@router.get("/{video_id}/similar", response_model=List[schemas.VideoOut])
+async def similar_videos(
+    video_id: int,
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    db: Database = Depends(get_database),
+):
+    """Videos rated by the same people, best match first (lists are precomputed; see app/similar.py)."""
+    async def render():
+        videos = await db.run(crud.get_similar_videos, video_id, limit)
+        if videos is None:
+            raise HTTPException(status_code=404, detail="Video not found")
+        return _video_list.dump_json(_video_list.validate_python(videos, from_attributes=True))
+    return await response_cache.respond(request, ["videos", f"video:{video_id}", "similar"], render)
 
 
-@router.get("/", response_model=List[schemas.VideoOut])
-def list_videos(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_videos(db, skip=skip, limit=limit)
+@router.get("/{video_id}", response_model=schemas.VideoOut)
+async def read_video(video_id: int, request: Request, db: Database = Depends(get_database)):
+    async def render():
+        video = await db.run(crud.get_video, video_id)
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        return schemas.VideoOut.model_validate(video).model_dump_json().encode()
+    return await response_cache.respond(request, [f"video:{video_id}"], render)
+
+
+@router.get("/", response_model=List[schemas.VideoFeedOut], response_model_exclude_unset=True)
+async def list_videos(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: str | None = None,
+    sort: Literal["latest", "trending", "top"] = "latest",
+    expand: str | None = Query(None, description="Comma-separated: creator, stats"),
+    db: Database = Depends(get_database),
+):
+    # `cursor` (keyset) wins over `skip`; `skip` stays for older clients
+    try:
+        after = (utils.decode_cursor if sort == "latest" else utils.decode_score_cursor)(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    wanted = {e.strip() for e in expand.split(",") if e.strip()} if expand else set()
+    if wanted - crud.FEED_EXPANSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown expand: {', '.join(sorted(wanted - crud.FEED_EXPANSIONS))}")
+
+    async def render():
+        headers = {}
+        if sort != "latest":
+            # ranked: ids from the in-memory snapshot, rows by primary key
+            ranked = await ranking.page(db, sort, after, skip, limit)
+            videos = await db.run(crud.get_videos_by_ids, [vid for vid, _ in ranked], wanted)
+            if len(ranked) == limit and ranked:
+                headers[utils.NEXT_CURSOR_HEADER] = utils.encode_score_cursor(ranked[-1][1], ranked[-1][0])
+        elif wanted:
+            videos = await db.run(crud.get_videos_expanded, wanted, skip=skip, limit=limit, cursor=after)
+        else:
+            videos = await db.run(crud.get_video_rows, skip=skip, limit=limit, cursor=after)
+        # plain dicts in VideoFeedOut's shape, encoded without per-row models (app/fastjson.py)
+        if sort == "latest" and len(videos) == limit and videos:
+            last = videos[-1]
+            headers[utils.NEXT_CURSOR_HEADER] = utils.encode_cursor(last["upload_date"], last["video_id"])
+        return fastjson.dumps(videos), headers
+
+    # expanded pages also change when ratings/comments/creators do; ranked ones when the snapshot does
+    tags = ["videos"] + (["ratings", "comments"] if "stats" in wanted else []) + (["users"] if "creator" in wanted else [])
+    if sort != "latest":
+        tags.append("ranking")
+    return await response_cache.respond(request, tags, render)
 
 
 @router.put("/{video_id}", response_model=schemas.VideoOut)
-def update_video(video_id: int, video_update: schemas.VideoUpdate, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    db_video = crud.get_video(db, video_id)
+async def update_video(video_id: int, video_update: schemas.VideoUpdate, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    db_video = await db.run(crud.get_video, video_id)
     _ensure_owner_or_admin(db_video, user)
-    for k, v in video_update.dict(exclude_unset=True).items():
-        setattr(db_video, k, v)
-    db.commit(); db.refresh(db_video)
+    db_video = await db.write(crud.update_video, db_video, video_update.dict(exclude_unset=True))
+    await response_cache.invalidate("videos", f"video:{video_id}")
     return db_video
 
 
-def _try_delete_blob(blob_url: str):
-    # Only applies to Azure URLs when we have a container client
-    if not _container_client or not blob_url:
-        return
-    path = urlparse(blob_url).path  # /<container>/<blob_name>
-    parts = [p for p in path.split("/") if p]
-    if len(parts) >= 2:  # container + blob
-        blob_name = "/".join(parts[1:])
-        try:
-            _container_client.delete_blob(blob_name)
-        except Exception:
-            pass
-
-
 @router.delete("/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_video(video_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    db_video = crud.get_video(db, video_id)
+async def delete_video(video_id: int, background_tasks: BackgroundTasks, db: Database = Depends(get_database), user: models.User = Depends(get_current_user)):
+    db_video = await db.run(crud.get_video, video_id)
     _ensure_owner_or_admin(db_video, user)
-    blob_url = db_video.blob_uri
-    db.delete(db_video); db.commit()
-    _try_delete_blob(blob_url)
+    storage = get_storage()
+    orphan = await db.write(crud.delete_video, db_video)  # None while other videos share the blob
+    await response_cache.invalidate("videos", f"video:{video_id}", f"ratings:{video_id}")
+    if key := storage.key_for_uri(orphan):
+        background_tasks.add_task(storage.delete_many, [key])
     return None
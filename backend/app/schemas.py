@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
 from app.models import UserRole
@@ -60,8 +60,28 @@ class VideoOut(VideoBase):
     video_id: int
     upload_date: datetime
     creator_id: int
+    processing_status: str = "pending"
+    duration_seconds: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    size_bytes: Optional[int] = None
     class Config: from_attributes = True
 
+class VideoCreator(BaseModel):
+    user_id: int
+    username: str
+    display_name: Optional[str] = None
+
+class VideoStats(BaseModel):
+    rating_average: float
+    rating_count: int
+    comment_count: int
+
+class VideoFeedOut(VideoOut):
+    # only present when requested via ?expand=creator,stats
+    creator: Optional[VideoCreator] = None
+    stats: Optional[VideoStats] = None
+
 class VideoUpdate(BaseModel):
     title: Optional[str] = None
     publisher: Optional[str] = None
@@ -70,6 +90,32 @@ class VideoUpdate(BaseModel):
     age_rating: Optional[str] = None
     blob_uri: Optional[str] = None
 
+# Resumable uploads
+class UploadSessionCreate(BaseModel):
+    filename: str
+    content_type: str
+    size: int = Field(gt=0)
+    chunk_size: Optional[int] = None  # server default when omitted; clamped to the allowed range
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")  # lets the server skip content it already has
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    size: int
+    chunk_size: int
+    chunk_count: int
+    received: List[Tuple[int, int]]  # inclusive chunk-index ranges already stored
+    received_bytes: int
+    complete: bool
+    deduplicated: bool = False  # content already stored: go straight to complete
+    expires_at: datetime
+
+class UploadFinish(BaseModel):
+    title: str
+    publisher: Optional[str] = None
+    producer: Optional[str] = None
+    genre: Optional[str] = None
+    age_rating: Optional[str] = None
+
 # Comments
 class CommentBase(BaseModel):
     comment_text: str
@@ -103,3 +149,9 @@ class RatingOut(RatingBase):
 
 class RatingUpdate(BaseModel):
     rating: int = Field(ge=1, le=5)
+
+class RatingSummary(BaseModel):
+    video_id: int
+    average: float
+    count: int
+    histogram: Dict[int, int]  # stars (1-5) -> number of ratings
@@ -0,0 +1,159 @@
+# app/search.py
+"""Full-text search over video title/genre/publisher/producer.
+
+SQLite gets an FTS5 table (``video_fts``, rowid = video_id) ranked with bm25;
+other databases use the ``video_search_terms`` inverted index. Either way the
+index is updated in the same transaction as the video row (``index_video`` /
+``remove_video``), and ``rebuild`` repopulates it from scratch.
+"""
+from __future__ import annotations
+import re
+import unicodedata
+
+from sqlalchemy import Float, Integer, event, func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import Base, is_sqlite
+
+# Column weights; title hits rank well above publisher/producer hits.
+FIELD_WEIGHTS = {"title": 8, "genre": 4, "publisher": 2, "producer": 2}
+FIELDS = tuple(FIELD_WEIGHTS)
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 64
+
+_word = re.compile(r"[^\W_]+")  # same word split as FTS5's unicode61 tokenizer
+
+
+def tokenize(value: str | None) -> list[str]:
+    if not value:
+        return []
+    folded = unicodedata.normalize("NFKD", value.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))  # remove_diacritics
+    return [t[:MAX_TERM_LENGTH] for t in _word.findall(folded)]
+
+
+# --- Schema: FTS5 is a virtual table, so create_all can't make it from a model
+_FTS_DDL = (
+    "CREATE VIRTUAL TABLE video_fts USING fts5("
+    "title, genre, publisher, producer, "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+)
+_FTS_FILL = (
+    "INSERT INTO video_fts(rowid, title, genre, publisher, producer) "
+    "SELECT video_id, title, genre, publisher, producer FROM videos"
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_fts(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_fts'"
+    ).first()
+    if not exists:
+        connection.exec_driver_sql(_FTS_DDL)
+        connection.exec_driver_sql(_FTS_FILL)  # backfill videos that predate the index
+
+
+# --- Incremental maintenance (caller commits)
+def index_video(db: Session, video: models.Video) -> None:
+    db.flush()  # make sure a new video has its id
+    if is_sqlite:
+        db.execute(text("DELETE FROM video_fts WHERE rowid = :id"), {"id": video.video_id})
+        db.execute(
+            text("INSERT INTO video_fts(rowid, title, genre, publisher, producer) "
+                 "VALUES (:id, :title, :genre, :publisher, :producer)"),
+            {"id": video.video_id, **{f: getattr(video, f) for f in FIELDS}},
+        )
+        return
+    T = models.VideoSearchTerm
+    db.execute(T.__table__.delete().where(T.video_id == video.video_id))
+    rows = _term_rows(video.video_id, {f: getattr(video, f) for f in FIELDS})
+    if rows:
+        db.execute(insert(T), rows)
+
+
+def remove_video(db: Session, video_id: int) -> None:
+    if is_sqlite:
+        db.execute(text("DELETE FROM video_fts WHERE rowid = :id"), {"id": video_id})
+    else:
+        T = models.VideoSearchTerm
+        db.execute(T.__table__.delete().where(T.video_id == video_id))
+
+
+def _term_rows(video_id: int, values: dict) -> list[dict]:
+    weights: dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(values.get(field)):
+            weights[term] = weights.get(term, 0) + weight
+    return [{"term": t, "video_id": video_id, "weight": w} for t, w in weights.items()]
+
+
+def rebuild(db: Session, batch_size: int = 1000) -> int:
+    """Drop and repopulate the whole index; returns the number of videos indexed."""
+    V = models.Video
+    if is_sqlite:
+        db.execute(text("DELETE FROM video_fts"))
+        db.execute(text(_FTS_FILL))
+    else:
+        T = models.VideoSearchTerm
+        db.execute(T.__table__.delete())
+        stmt = select(V.video_id, *(getattr(V, f) for f in FIELDS)).execution_options(yield_per=batch_size)
+        for part in db.execute(stmt).partitions():
+            rows = [r for row in part for r in _term_rows(row.video_id, row._mapping)]
+            if rows:
+                db.execute(insert(T), rows)
+    db.commit()
+    return db.query(func.count(V.video_id)).scalar()
+
+
+# --- Query
+def _ranked_ids(terms: list[str]):
+    """Subquery of (video_id, score) for videos matching every term as a prefix; higher score is better."""
+    if is_sqlite:
+        # each term quoted (so FTS syntax in user input is inert) and prefix-matched; implicit AND
+        match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+        weights = ", ".join(str(float(FIELD_WEIGHTS[f])) for f in FIELDS)
+        return (
+            text(f"SELECT rowid AS video_id, -bm25(video_fts, {weights}) AS score "
+                 "FROM video_fts WHERE video_fts MATCH :match")
+            .bindparams(match=match)
+            .columns(video_id=Integer, score=Float)
+            .subquery("ranked")
+        )
+    T = models.VideoSearchTerm
+    hits = union_all(*(
+        select(T.video_id, literal(i).label("qi"), T.weight)
+        .where(T.term.startswith(term, autoescape=True))
+        for i, term in enumerate(terms)
+    )).subquery("hits")
+    return (
+        select(hits.c.video_id, func.sum(hits.c.weight).label("score"))
+        .group_by(hits.c.video_id)
+        .having(func.count(func.distinct(hits.c.qi)) == len(terms))
+        .subquery("ranked")
+    )
+
+
+def search_videos(
+    db: Session,
+    query: str,
+    genre: str | None = None,
+    age_rating: str | None = None,
+    skip: int = 0,
+    limit: int = 20,
+) -> list[models.Video]:
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    V = models.Video
+    ranked = _ranked_ids(terms)
+    q = db.query(V).join(ranked, ranked.c.video_id == V.video_id)
+    if genre:
+        q = q.filter(func.lower(V.genre) == genre.casefold())
+    if age_rating:
+        q = q.filter(V.age_rating == age_rating)
+    q = q.order_by(ranked.c.score.desc(), V.upload_date.desc(), V.video_id.desc())
+    return q.offset(skip).limit(limit).all()
@@ -12,18 +12,98 @@ class Settings(BaseSettings):
     # For free Azure (SQLite on /home). Later we can swap to Azure SQL DSN.
     
     DATABASE_URL: str
+    # True → request path on an async engine (aiosqlite / asyncpg / aioodbc); False → sync engine on the threadpool
+    DATABASE_ASYNC: bool = False
+    # Override when the async URL can't be derived from DATABASE_URL
+    DATABASE_ASYNC_URL: str = ""
+    # Per-engine connection pool (the sync stack is further capped by the 40-thread threadpool)
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    # Optional read replica for request reads; writes and recent writers' reads stay on DATABASE_URL
+    DATABASE_READ_URL: str = ""
+    DATABASE_READ_YOUR_WRITES_SECONDS: int = 5
+    # SQLite production mode: WAL + pragmas, read-only request pool, one group-committing writer
+    SQLITE_TUNED: bool = False
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_BYTES: int = 256 * 1024 * 1024
+    SQLITE_CACHE_KB: int = 64 * 1024
+    SQLITE_WRITE_BATCH: int = 256  # max writes folded into one commit
 
     # --- Auth ---
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Verified-token / user principal cache used by get_current_user
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    # bcrypt runs on its own pool; beyond workers + queue, login/register answer 503
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 32
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+
+    # --- Response cache (public GET endpoints) ---
+    # Off by default: without RESPONSE_CACHE_REDIS_URL invalidations only reach the worker that
+    # made the write, so only enable it without Redis when running a single worker.
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Set to share entries and invalidations across workers, e.g. redis://localhost:6379/0
+    RESPONSE_CACHE_REDIS_URL: str = ""
+
+    # --- Request body limits (413 once exceeded, even for chunked bodies) ---
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024  # single-request POST /videos; bigger files use /uploads
+    MAX_REQUEST_BODY_BYTES: int = 1024 * 1024  # any other request with a body
+
+    # --- Metrics (/metrics, Prometheus text format; per worker process) ---
+    METRICS_ENABLED: bool = True
+    METRICS_BEARER_TOKEN: str = ""  # when set, scrapes must send "Authorization: Bearer <token>"
+
+    # --- SQL profiler (opt-in; X-SQL-Profile header, N+1 and slow-query logs) ---
+    SQL_PROFILE_ENABLED: bool = False
+    SQL_PROFILE_SLOW_MS: float = 100  # slower statements are logged with their EXPLAIN plan
+    SQL_PROFILE_N_PLUS_ONE: int = 5  # same statement shape this many times in one request → N+1 warning
 
     # --- CORS (list of origins) ---
     
     CORS_ORIGINS: List[str] = []
 
     # --- Storage ---
+    # "local" | "azure" | "memory"; empty → azure if a connection string is set, else local.
+    STORAGE_BACKEND: str = ""
     # If set → use Azure Blob Storage; if empty (dev) → fallback to local filesystem.
     AZURE_STORAGE_CONNECTION_STRING: str = ""
     AZURE_BLOB_CONTAINER: str = "videos"
+    # HTTP connection pool / retry policy shared by every storage call
+    STORAGE_POOL_SIZE: int = 16
+    STORAGE_RETRIES: int = 3
+    STORAGE_TIMEOUT_SECONDS: int = 30
+    # Uploads are staged as blocks of this size, with at most N blocks in flight.
+    UPLOAD_CHUNK_BYTES: int = 4 * 1024 * 1024
+    UPLOAD_MAX_CONCURRENCY: int = 4
+    # Resumable upload sessions (/uploads): chunk size, per-file cap, idle expiry and staging dir
+    UPLOAD_SESSION_CHUNK_BYTES: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_MAX_BYTES: int = 20 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    UPLOAD_GC_INTERVAL_SECONDS: int = 900
+    UPLOAD_STAGING_DIR: str = "./upload-staging"
+
+    # --- Post-upload processing (faststart, probe, checksum) ---
+    MEDIA_PROCESSING_ENABLED: bool = True
+    MEDIA_WORKERS: int = 2
+
+    # --- Ranked feeds (GET /videos?sort=trending|top) ---
+    RANKING_ENABLED: bool = True
+    RANKING_REFRESH_SECONDS: int = 60
+    RANKING_HALF_LIFE_HOURS: float = 24  # trending: activity loses half its weight per half-life
+    RANKING_SNAPSHOT_SIZE: int = 1000  # ranked ids kept in memory per sort; deeper pages use the index
+    RANKING_TOP_PRIOR_VOTES: int = 5  # "top" blends this many PRIOR_MEAN ratings into every average
+    RANKING_TOP_PRIOR_MEAN: float = 3.0
+
+    # --- Similar videos (GET /videos/{id}/similar; lists are computed with numpy + scipy) ---
+    SIMILAR_ENABLED: bool = True
+    SIMILAR_REFRESH_SECONDS: int = 300
+    SIMILAR_NEIGHBORS: int = 20  # neighbours stored per video
+    SIMILAR_MIN_COMMON_RATERS: int = 2  # videos rated together by fewer users are not similar
 
     # --- Dev only (ignored in prod) ---
     LOCAL_DEV_UPLOAD_DIR: str = "./uploads"
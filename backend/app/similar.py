@@ -0,0 +1,315 @@
+# app/similar.py
+"""Similar videos: ``GET /videos/{id}/similar``.
+
+Item-item collaborative filtering over the ratings table. Two videos are
+similar when the same people rated them: the score is the cosine of their
+star vectors (one entry per user). Pairs with fewer than
+``SIMILAR_MIN_COMMON_RATERS`` raters in common score 0. The best
+``SIMILAR_NEIGHBORS`` per video are stored in ``video_neighbors``, so a
+request is one indexed lookup.
+
+Lists are computed with numpy/scipy on a sparse user x video matrix ``X``.
+The similarity rows of a block of videos are one sparse product
+(``X[:, block].T @ X``) and their top K one ``argpartition``; blocks are
+sized so a dense block stays under ``BLOCK_CELLS`` cells.
+
+Passes are incremental, like app/ranking.py. Every rating written through
+``crud.upsert_rating`` (or discounted with its user) stamps the video's
+``video_rating_stats.updated_at``. A pass recomputes the rows of those
+videos only, from the ratings of the people who rated them (full column
+norms come from the stats histograms), then patches every other list the
+change reaches: the video enters, moves within or leaves it. A full list
+whose member lost score is recomputed, since an outsider may now beat it.
+The first pass rebuilds everything, and so does one that would take on
+more than ``MAX_DIRTY`` changed videos or patch more than ``MAX_REACH`` of
+the lists (a few changes to popular videos reach most of a sparse catalog).
+
+Lists are computed from a plain session and stored through ``write_now``,
+so the SQLite writer is held for the write only. Concurrent passes are
+serialized by a version check on ``similar_state``; the loser's work is
+dropped (the winner covered the same changes).
+
+numpy and scipy are optional: without them passes are skipped (logged once)
+and the endpoint serves the lists already stored, or empty ones.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from itertools import chain
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import crud, models, response_cache
+from .database import SessionLocal, write_now
+from .settings import settings
+
+try:  # optional: pip install numpy scipy
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+logger = logging.getLogger("uvicorn.error")
+
+BLOCK_CELLS = 4_000_000  # similarity cells per dense block (float32: 16 MB)
+MAX_DIRTY = 2000  # changed videos one incremental pass takes on; beyond it, rebuild
+MAX_REACH = 0.5  # share of the rated catalog's lists a pass may patch; beyond it, rebuild
+STATS_OVERLAP = timedelta(seconds=5)  # how late a rating-stats change may commit and still be seen
+
+N, State = models.VideoNeighbor, models.SimilarState
+Lists = dict[int, dict[int, float]]  # video_id -> {neighbor_id: score}
+
+
+def available() -> bool:
+    return np is not None
+
+
+# --- Vectorized similarity
+def _matrix(rows) -> tuple:
+    """Sparse users x videos star matrix from ``(user_id, video_id, stars)`` rows, and the video id of each column."""
+    data = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+    user_ids, users = np.unique(data[:, 0], return_inverse=True)
+    video_ids, videos = np.unique(data[:, 1], return_inverse=True)
+    X = sparse.csr_matrix((data[:, 2].astype(np.float32), (users, videos)), shape=(len(user_ids), len(video_ids)))
+    return X, video_ids
+
+
+def _column_norms(X):
+    return np.sqrt(np.asarray(X.multiply(X).sum(axis=0)).ravel())
+
+
+def _similarities(X, norms, cols):
+    """Yield ``(block, S)``: ``S[i, j]`` is the cosine of columns ``block[i]`` and ``j``.
+
+    Zero on the diagonal and for pairs with too few common raters. ``norms``
+    are over every rater, which ``X`` may hold only some of.
+    """
+    XT = X.T.tocsr()
+    B = X.copy()
+    B.data[:] = 1  # who rated what
+    BT = B.T.tocsr()
+    inverse = np.divide(1, norms, out=np.zeros_like(norms, dtype=np.float32), where=norms > 0)
+    step = max(1, BLOCK_CELLS // X.shape[1])
+    for i in range(0, len(cols), step):
+        block = cols[i:i + step]
+        S = (XT[block] @ X).toarray()
+        S *= inverse[block, None]
+        S *= inverse[None, :]
+        if settings.SIMILAR_MIN_COMMON_RATERS > 1:
+            S[(BT[block] @ B).toarray() < settings.SIMILAR_MIN_COMMON_RATERS] = 0
+        S[np.arange(len(block)), block] = 0
+        yield block, S
+
+
+def _top(video_ids, block, S) -> Lists:
+    """Each row's best ``SIMILAR_NEIGHBORS`` positive scores."""
+    k = min(settings.SIMILAR_NEIGHBORS, S.shape[1])
+    idx = np.argpartition(-S, k - 1, axis=1)[:, :k]
+    scores = np.take_along_axis(S, idx, axis=1)
+    lists = {}
+    for col, row_idx, row_scores in zip(block.tolist(), idx, scores):
+        keep = row_scores > 0
+        lists[int(video_ids[col])] = dict(zip(video_ids[row_idx[keep]].tolist(), row_scores[keep].tolist()))
+    return lists
+
+
+def _build(db: Session) -> Lists:
+    R = models.Rating
+    rows = db.connection().execute(select(R.user_id, R.video_id, R.rating)).all()  # Core rows: no ORM loading
+    if not rows:
+        return {}
+    X, video_ids = _matrix(rows)
+    lists = {}
+    for block, S in _similarities(X, _column_norms(X), np.arange(len(video_ids))):
+        lists.update(_top(video_ids, block, S))
+    return lists
+
+
+def _local(db: Session, video_ids: list[int]):
+    """``(X, column ids, norms)`` over the people who rated ``video_ids``: enough for those videos' rows."""
+    R, S = models.Rating, models.VideoRatingStats
+    raters = select(R.user_id).where(R.video_id.in_(video_ids))
+    rows = db.connection().execute(select(R.user_id, R.video_id, R.rating).where(R.user_id.in_(raters))).all()
+    if not rows:
+        return None
+    X, ids = _matrix(rows)
+    norm2 = sum(v * v * getattr(S, f"stars_{v}") for v in crud.STAR_VALUES)
+    full = dict(db.connection().execute(select(S.video_id, norm2).where(S.video_id.in_(select(R.video_id).where(R.user_id.in_(raters))))).all())
+    # the stats may trail the ratings read a moment ago; never let a local column outweigh its norm
+    norms = np.maximum(np.sqrt(np.array([full.get(v, 0) for v in ids.tolist()], dtype=np.float32)), _column_norms(X))
+    return X, ids, norms
+
+
+def _floors(db: Session, ids, k: int):
+    """Per column: the score a newcomer must beat to enter that video's list (0 while it has room)."""
+    floors = np.zeros(len(ids), dtype=np.float32)
+    position = {vid: i for i, vid in enumerate(ids.tolist())}
+    for chunk in crud.chunked(ids.tolist()):
+        for vid, lowest, n in db.connection().execute(select(N.video_id, func.min(N.score), func.count())
+                                         .where(N.video_id.in_(chunk)).group_by(N.video_id)):
+            if n >= k:
+                floors[position[vid]] = lowest
+    return floors
+
+
+def _current(db: Session, column, ids) -> Lists:
+    """Stored entries whose ``column`` (N.video_id or N.neighbor_id) is in ``ids``, keyed by list."""
+    lists: Lists = {}
+    for chunk in crud.chunked(sorted(ids)):
+        for vid, nid, score in db.connection().execute(select(N.video_id, N.neighbor_id, N.score).where(column.in_(chunk))):
+            lists.setdefault(vid, {})[nid] = score
+    return lists
+
+
+def _recompute(db: Session, video_ids: list[int]) -> Lists:
+    lists: Lists = {vid: {} for vid in video_ids}  # no raters left: empty list
+    local = _local(db, video_ids) if video_ids else None
+    if local is not None:
+        X, ids, norms = local
+        position = {vid: i for i, vid in enumerate(ids.tolist())}
+        for block, S in _similarities(X, norms, np.array([position[v] for v in video_ids if v in position])):
+            lists.update(_top(ids, block, S))
+    return lists
+
+
+def _incremental(db: Session, dirty: list[int]) -> Lists | None:
+    """New lists for the changed videos and every list they reach; None when a rebuild is cheaper."""
+    k = settings.SIMILAR_NEIGHBORS
+    lists = {vid: {} for vid in dirty}
+    containing = _current(db, N.neighbor_id, dirty)  # lists a changed video sits in now
+    reached: Lists = {}  # other video -> {changed video: new score}, where that may change its list
+    local = _local(db, dirty)
+    if local is not None:
+        X, ids, norms = local
+        position = {vid: i for i, vid in enumerate(ids.tolist())}
+        floors = _floors(db, ids, k)
+        members = {}  # changed video -> columns of the lists holding it
+        for vid, held in containing.items():
+            for d in held:
+                if vid in position:
+                    members.setdefault(d, []).append(position[vid])
+        for block, S in _similarities(X, norms, np.array([position[d] for d in dirty if d in position])):
+            lists.update(_top(ids, block, S))
+            hit = S > floors[None, :]
+            for row, col in enumerate(block.tolist()):
+                hit[row, members.get(int(ids[col]), [])] = True
+            for row, col in zip(*np.nonzero(hit)):
+                reached.setdefault(int(ids[col]), {})[int(ids[block[row]])] = float(S[row, col])
+
+    dirty_set = set(dirty)
+    others = (reached.keys() | containing.keys()) - dirty_set
+    stats = models.VideoRatingStats
+    if len(others) > MAX_REACH * db.query(func.count(stats.video_id)).filter(stats.rating_count > 0).scalar():
+        return None
+    stored = _current(db, N.video_id, others)
+    recompute = []
+    for vid in others:
+        merged = dict(stored.get(vid, {}))
+        full = len(merged) >= k
+        new = reached.get(vid, {})
+        if any(new.get(d, 0.0) < old and full for d, old in merged.items() if d in dirty_set):
+            recompute.append(vid)  # a member lost score: an outsider may beat it now
+            continue
+        for d in dirty_set & merged.keys():
+            merged.pop(d)
+        merged.update((d, s) for d, s in new.items() if s > 0)
+        lists[vid] = dict(sorted(merged.items(), key=lambda kv: -kv[1])[:k])
+    if len(recompute) > MAX_DIRTY:
+        return None
+    lists.update(_recompute(db, recompute))
+    return lists
+
+
+# --- Passes
+def compute(db: Session) -> tuple[int, Lists, bool, datetime]:
+    """Read side of a pass: ``(state version, lists to store, whether they replace all, stats seen up to)``."""
+    now = datetime.utcnow()
+    state = db.query(State.version, State.stats_seen_at).filter(State.id == 1).first()
+    version, seen_at = state if state else (0, None)
+    lists = None
+    if seen_at is not None:
+        S = models.VideoRatingStats
+        dirty = [vid for (vid,) in db.query(S.video_id).filter(S.updated_at > seen_at).limit(MAX_DIRTY + 1)]
+        if len(dirty) <= MAX_DIRTY:
+            lists = _incremental(db, sorted(dirty)) if dirty else {}
+    full = lists is None
+    if full:
+        lists = _build(db)
+    # stats stamped within STATS_OVERLAP of now get another look next pass (in case they commit late)
+    return version, lists, full, max(filter(None, (seen_at, now - STATS_OVERLAP)))
+
+
+def store(db: Session, version: int, lists: Lists, full: bool, seen_at: datetime) -> int | None:
+    """Write side: replace the lists unless another pass committed since ``version`` was read.
+
+    Returns the number of lists written, or None when nothing was.
+    """
+    if version == 0:
+        try:
+            with db.begin_nested():
+                db.add(State(id=1, version=1))
+        except IntegrityError:
+            db.rollback()
+            return None
+    elif not db.query(State).filter(State.id == 1, State.version == version).update(
+            {State.version: version + 1}, synchronize_session=False):
+        db.rollback()
+        return None
+
+    V = models.Video
+    involved = sorted(lists.keys() | {nid for neighbours in lists.values() for nid in neighbours})
+    alive = set()
+    for ids in crud.chunked(involved):
+        alive.update(vid for (vid,) in db.query(V.video_id).filter(V.video_id.in_(ids)))
+    if full:
+        db.execute(delete(N))
+    else:
+        for ids in crud.chunked(sorted(lists)):
+            db.execute(delete(N).where(N.video_id.in_(ids)))
+    rows = [{"video_id": vid, "neighbor_id": nid, "score": score}
+            for vid, neighbours in lists.items() if vid in alive
+            for nid, score in neighbours.items() if nid in alive]  # skips videos deleted since the read
+    if rows:
+        db.execute(N.__table__.insert(), rows)  # Core executemany: no ORM bookkeeping per row
+    db.query(State).filter(State.id == 1).update(
+        {State.stats_seen_at: seen_at, State.refreshed_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return len(lists)
+
+
+def refresh_lists(db: Session) -> int | None:
+    """One pass: read through ``db``, store through the writer. See ``store`` for the result."""
+    if np is None:
+        raise RuntimeError("similar videos need numpy and scipy (pip install numpy scipy)")
+    return write_now(store, *compute(db))
+
+
+def rebuild(db: Session) -> None:
+    """Make the next pass recompute every list (the current ones are served until it stores)."""
+    db.query(State).delete(synchronize_session=False)
+    db.commit()
+
+
+def _pass() -> int | None:
+    with SessionLocal() as db:
+        return refresh_lists(db)
+
+
+async def refresh() -> None:
+    if await asyncio.to_thread(_pass):
+        await response_cache.invalidate("similar")
+
+
+async def run_forever() -> None:
+    if np is None:
+        logger.warning("numpy/scipy not installed; similar-video lists will not be updated")
+        return
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.warning("similar-videos refresh failed", exc_info=True)
+        await asyncio.sleep(settings.SIMILAR_REFRESH_SECONDS)
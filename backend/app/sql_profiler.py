@@ -0,0 +1,239 @@
+# app/sql_profiler.py
+"""Opt-in per-request SQL profiler (``SQL_PROFILE_ENABLED=true``).
+
+Every statement a request runs is recorded with its normalized shape
+(literals and parameters replaced by ``?``, ``IN (?, ?, ...)`` collapsed),
+its duration and the app frame that issued it. Then:
+
+* the response carries ``X-SQL-Profile: queries=12; time_ms=4.1; n_plus_one=1; slow=0``;
+* a shape repeated ``SQL_PROFILE_N_PLUS_ONE`` times in one request is logged
+  as a likely N+1, with the call sites that issued it;
+* a statement slower than ``SQL_PROFILE_SLOW_MS`` is logged with its
+  ``EXPLAIN`` plan (SELECTs on SQLite, PostgreSQL and MySQL).
+
+Statements are attributed through a contextvar, which follows the request
+into threadpool and async sessions and onto the SQLite writer thread.
+
+For tests, ``query_budget`` asserts how many statements a block may run:
+
+    from app.sql_profiler import query_budget
+
+    def test_feed_is_one_query(client):
+        with query_budget(2):
+            assert client.get("/videos/").status_code == 200
+
+It works whether or not the profiler is enabled (engines are hooked on first
+use) and sees statements from TestClient's portal thread as well. Cached
+responses (``RESPONSE_CACHE_ENABLED``) run no SQL at all.
+"""
+from __future__ import annotations
+import contextvars
+import functools
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .settings import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+HEADER = "X-SQL-Profile"
+_APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_BACKEND_DIR = os.path.dirname(_APP_DIR.rstrip(os.sep)) + os.sep
+# our own plumbing: a call site is the first app frame outside these
+_PLUMBING = {os.path.join(_APP_DIR, name) for name in ("database.py", "sqlite_perf.py", "sql_profiler.py", "metrics.py")}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)+\)", re.IGNORECASE)
+_ROWS = re.compile(r"(\(\?(?:, \?)*\))(?:, \1)+")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize(statement: str) -> str:
+    """The statement's shape: what stays the same across the iterations of an N+1 loop."""
+    sql = _SPACE.sub(" ", statement).strip()
+    sql = _NUMBER.sub("?", _PARAM.sub("?", _STRING.sub("?", sql)))  # params first: $1 is one placeholder
+    return _ROWS.sub(r"\1, ...", _IN_LIST.sub("IN (...)", sql))
+
+
+def call_site() -> str:
+    """``file.py:line in function`` of the innermost app frame outside the DB plumbing."""
+    frame, fallback = sys._getframe(2), None
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(_APP_DIR) and path not in _PLUMBING:
+            return f"{os.path.relpath(path, _BACKEND_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        if fallback is None and "sqlalchemy" not in path and path not in _PLUMBING:
+            fallback = f"{os.path.basename(path)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "?"
+
+
+@dataclass
+class Query:
+    shape: str
+    seconds: float
+    site: str
+    engine: str
+
+
+@dataclass
+class Profile:
+    queries: list[Query] = field(default_factory=list)
+    slow: int = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(q.seconds for q in self.queries)
+
+    def n_plus_one(self, threshold: int | None = None) -> list[tuple[str, int, list[str]]]:
+        """(shape, times run, call sites) for every shape run at least ``threshold`` times."""
+        threshold = threshold or settings.SQL_PROFILE_N_PLUS_ONE
+        runs: dict[str, list[str]] = {}
+        for q in self.queries:
+            runs.setdefault(q.shape, []).append(q.site)
+        return [(shape, len(sites), sorted(set(sites))) for shape, sites in runs.items() if len(sites) >= threshold]
+
+    def summary(self) -> str:
+        return (f"queries={self.count}; time_ms={self.seconds * 1000:.1f}; "
+                f"n_plus_one={len(self.n_plus_one())}; slow={self.slow}")
+
+    def report(self) -> str:
+        lines = [self.summary()]
+        lines += [f"  {q.seconds * 1000:7.2f} ms  {q.site}  [{q.engine}]  {q.shape}" for q in self.queries]
+        return "\n".join(lines)
+
+
+# the current request's profile; module-level captures come from profile() (tests, scripts)
+_current: contextvars.ContextVar[Profile | None] = contextvars.ContextVar("sql_profile", default=None)
+_captures: list[Profile] = []
+
+
+# --- Engine hooks
+_EXPLAIN = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN ", "mysql": "EXPLAIN ", "mariadb": "EXPLAIN "}
+_instrumented: set[int] = set()
+
+
+def explain(conn, statement: str, parameters) -> str | None:
+    """The plan for a SELECT, run on the same connection; None where unsupported."""
+    prefix = _EXPLAIN.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if conn.dialect.name == "sqlite":
+        return "\n".join(str(row[-1]) for row in rows)  # (id, parent, notused, detail)
+    return "\n".join(" ".join(str(col) for col in row) for row in rows)
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Record statements into the active profiles; repeated calls are no-ops."""
+    sync = getattr(engine, "sync_engine", engine)
+    if id(sync) in _instrumented:
+        return
+    _instrumented.add(id(sync))
+
+    @event.listens_for(sync, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and (_current.get() is not None or _captures):
+            context._profile_start = time.perf_counter()
+
+    @event.listens_for(sync, "after_cursor_execute")
+    def _done(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_profile_start", None)
+        if start is None:
+            return
+        context._profile_start = None
+        elapsed = time.perf_counter() - start
+        query = Query(normalize(statement), elapsed, call_site(), name)
+        profiles = [p for p in (_current.get(), *_captures) if p is not None]
+        slow = elapsed * 1000 >= settings.SQL_PROFILE_SLOW_MS
+        for p in profiles:
+            p.queries.append(query)
+            p.slow += slow
+        if slow:
+            try:
+                plan = None if executemany else explain(conn, statement, parameters)
+            except Exception as exc:  # the plan is a courtesy; never fail the request over it
+                plan = f"EXPLAIN failed: {exc}"
+            logger.warning("slow query %.1f ms at %s [%s]: %s%s", elapsed * 1000, query.site, name,
+                           _SPACE.sub(" ", statement).strip(), f"\n{plan}" if plan else "")
+
+
+def instrument_database() -> None:
+    from . import database
+
+    for name, engine in database.engines().items():
+        instrument_engine(engine, name)
+
+
+# --- Request middleware
+class SQLProfilerMiddleware:
+    """Pure ASGI: profiles each HTTP request, adds the summary header and logs likely N+1s."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = Profile()
+
+        async def send_with_header(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(HEADER, profile.summary())
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current.reset(token)
+            for shape, times, sites in profile.n_plus_one():
+                logger.warning("possible N+1 in %s %s: %d x %s (from %s)",
+                               scope["method"], scope["path"], times, shape, ", ".join(sites))
+
+
+# --- Test helpers
+@contextmanager
+def profile() -> Iterator[Profile]:
+    """Record every statement run in this process while the block runs."""
+    instrument_database()
+    captured = Profile()
+    _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        _captures.remove(captured)
+
+
+@contextmanager
+def query_budget(max_queries: int, *, n_plus_one: bool = False) -> Iterator[Profile]:
+    """Fail (AssertionError) if the block runs more than ``max_queries`` statements or, unless allowed, an N+1."""
+    with profile() as captured:
+        yield captured
+    if captured.count > max_queries:
+        raise AssertionError(f"{captured.count} SQL statements, budget {max_queries}\n{captured.report()}")
+    if not n_plus_one and captured.n_plus_one():
+        raise AssertionError(f"N+1 query pattern\n{captured.report()}")
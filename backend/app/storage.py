@@ -0,0 +1,520 @@
+# app/storage.py
+"""Pluggable blob storage.
+
+Every backend exposes the same async surface (``put_stream``, ``get_range``,
+``stat``, ``delete_many``, ``presign``, and the ``stage_*`` calls behind
+resumable uploads) so routers never touch SDK clients directly. The active
+backend comes from ``Settings`` and is built lazily on first use, so importing
+the app never makes a network call.
+
+Identical uploads share one blob (``models.Blob``, keyed by the SHA-256 from
+``sha256_stream`` / ``stage_digest``), so callers hash before they transfer.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+from urllib.parse import urlparse
+from uuid import uuid4
+
+import aiofiles
+
+from . import metrics
+from .blob_upload import AsyncReader, _block_id, upload_in_blocks
+from .settings import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+READ_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class BlobStat:
+    size: int
+    etag: str  # quoted, ready for an ETag header
+    last_modified: datetime | None
+    content_type: str | None
+
+
+def new_blob_key(user_id: int, filename: str | None) -> str:
+    name = os.path.basename(filename or "") or "upload"
+    return f"{user_id}/{uuid4()}_{name}"
+
+
+async def sha256_stream(source: AsyncReader) -> tuple[str, int]:
+    """Hex digest and length of everything ``source`` yields (e.g. a spooled ``UploadFile``)."""
+    digest, size = hashlib.sha256(), 0
+    while chunk := await source.read(READ_CHUNK):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _sha256_file(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StorageBackend(ABC):
+    name: str
+
+    @abstractmethod
+    async def put_stream(self, key: str, source: AsyncReader, content_type: str | None = None) -> str:
+        """Store ``source`` under ``key``; returns the URI to persist in ``Video.blob_uri``."""
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes ``start..end`` (inclusive)."""
+
+    @abstractmethod
+    async def stat(self, key: str) -> BlobStat | None: ...
+
+    @abstractmethod
+    async def delete_many(self, keys: Iterable[str]) -> None:
+        """Best effort; missing keys are ignored."""
+
+    @abstractmethod
+    async def presign(self, key: str, expires_in: int = 3600) -> str: ...
+
+    @abstractmethod
+    def key_for_uri(self, uri: str | None) -> str | None:
+        """Map a stored ``blob_uri`` back to a key, or None if this backend doesn't own it."""
+
+    def local_path(self, key: str) -> str | None:
+        """Filesystem path for zero-copy sends, when the backend has one."""
+        return None
+
+    # Resumable uploads: chunks of ``upload_id`` arrive in any order (and may repeat)
+    # and only become the blob ``key`` on ``stage_commit``.
+    @abstractmethod
+    async def stage_open(self, upload_id: str, key: str, size: int) -> None: ...
+
+    @abstractmethod
+    async def stage_chunk(self, upload_id: str, key: str, index: int, offset: int, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def stage_commit(self, upload_id: str, key: str, chunk_count: int, content_type: str | None = None) -> str:
+        """Assemble the chunks into ``key``; returns the URI, like ``put_stream``."""
+
+    @abstractmethod
+    async def stage_abort(self, upload_id: str, key: str) -> None:
+        """Drop staged data; missing staging is ignored."""
+
+    async def stage_digest(self, upload_id: str) -> str | None:
+        """SHA-256 of the fully staged upload, or None if the backend can't read staged data back."""
+        return None
+
+
+# --- Local filesystem (dev): files under LOCAL_DEV_UPLOAD_DIR, served at /static
+class LocalStorage(StorageBackend):
+    name = "local"
+    prefix = "/static/"
+
+    def __init__(self, root: str, staging: str):
+        self.root = Path(root).resolve()
+        self.staging = Path(staging).resolve()  # outside root, so partial uploads are never served
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"key escapes storage root: {key!r}")
+        return path
+
+    async def put_stream(self, key, source, content_type=None):
+        path = self._path(key)
+        await asyncio.to_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        async with aiofiles.open(path, "wb") as f:
+            while chunk := await source.read(READ_CHUNK):
+                await f.write(chunk)
+        return self.prefix + key
+
+    async def get_range(self, key, start, end):
+        async with aiofiles.open(self._path(key), "rb") as f:
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def stat(self, key):
+        try:
+            st = await asyncio.to_thread(os.stat, self._path(key))
+        except (FileNotFoundError, ValueError):
+            return None
+        return BlobStat(
+            size=st.st_size,
+            etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            last_modified=datetime.fromtimestamp(int(st.st_mtime), tz=timezone.utc),
+            content_type=None,
+        )
+
+    async def delete_many(self, keys):
+        def _rm(paths):
+            for p in paths:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+        await asyncio.to_thread(_rm, [self._path(k) for k in keys])
+
+    async def presign(self, key, expires_in=3600):
+        return self.prefix + key  # dev: /static is public
+
+    def key_for_uri(self, uri):
+        if uri and uri.startswith(self.prefix):
+            return uri[len(self.prefix):]
+        return None
+
+    def local_path(self, key):
+        return str(self._path(key))
+
+    def _staged(self, upload_id: str) -> Path:
+        return self.staging / upload_id
+
+    async def stage_open(self, upload_id, key, size):
+        def _create():
+            self.staging.mkdir(parents=True, exist_ok=True)
+            with open(self._staged(upload_id), "wb") as f:
+                f.truncate(size)  # sparse: chunks fill it in place, in any order
+        await asyncio.to_thread(_create)
+
+    async def stage_chunk(self, upload_id, key, index, offset, data):
+        def _write():
+            fd = os.open(self._staged(upload_id), os.O_WRONLY)
+            try:
+                os.pwrite(fd, data, offset)
+            finally:
+                os.close(fd)
+        await asyncio.to_thread(_write)
+
+    async def stage_commit(self, upload_id, key, chunk_count, content_type=None):
+        def _move():
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(self._staged(upload_id), path)  # a rename when staging shares the filesystem
+        await asyncio.to_thread(_move)
+        return self.prefix + key
+
+    async def stage_abort(self, upload_id, key):
+        try:
+            await asyncio.to_thread(os.remove, self._staged(upload_id))
+        except FileNotFoundError:
+            pass
+
+    async def stage_digest(self, upload_id):
+        try:
+            return await asyncio.to_thread(_sha256_file, self._staged(upload_id))
+        except FileNotFoundError:
+            return None
+
+
+# --- Azure Blob Storage, one pooled client per process
+class AzureStorage(StorageBackend):
+    name = "azure"
+
+    def __init__(self, connection_string: str, container: str):
+        # Import here so local dev works without azure-storage-blob installed.
+        import requests
+        from requests.adapters import HTTPAdapter
+        from azure.core.pipeline.transport import RequestsTransport
+        from azure.storage.blob import BlobServiceClient, ContentSettings
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=settings.STORAGE_POOL_SIZE, pool_maxsize=settings.STORAGE_POOL_SIZE
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        transport = RequestsTransport(
+            session=session,
+            connection_timeout=settings.STORAGE_TIMEOUT_SECONDS,
+            read_timeout=settings.STORAGE_TIMEOUT_SECONDS,
+        )
+        self._service = BlobServiceClient.from_connection_string(
+            connection_string, transport=transport, retry_total=settings.STORAGE_RETRIES
+        )
+        self._ContentSettings = ContentSettings
+        self._container = self._service.get_container_client(container)
+        self._container_name = container
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _ensure_container(self):
+        # Create the container once, on first use, rather than at import time.
+        with self._ready_lock:
+            if not self._ready:
+                try:
+                    self._container.create_container()
+                except Exception:
+                    pass  # already exists
+                self._ready = True
+
+    async def _client(self):
+        if not self._ready:
+            await asyncio.to_thread(self._ensure_container)
+        return self._container
+
+    async def put_stream(self, key, source, content_type=None):
+        container = await self._client()
+        blob = container.get_blob_client(blob=key)
+        await upload_in_blocks(
+            blob, source,
+            chunk_size=settings.UPLOAD_CHUNK_BYTES,
+            max_concurrency=settings.UPLOAD_MAX_CONCURRENCY,
+            content_settings=self._ContentSettings(content_type=content_type) if content_type else None,
+        )
+        return blob.url
+
+    async def get_range(self, key, start, end):
+        blob = (await self._client()).get_blob_client(blob=key)
+        downloader = await asyncio.to_thread(blob.download_blob, offset=start, length=end - start + 1)
+        chunks = downloader.chunks()
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield chunk
+
+    async def stat(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+        blob = (await self._client()).get_blob_client(blob=key)
+        try:
+            props = await asyncio.to_thread(blob.get_blob_properties)
+        except ResourceNotFoundError:
+            return None
+        etag = props.etag if props.etag.startswith('"') else f'"{props.etag}"'
+        return BlobStat(props.size, etag, props.last_modified, props.content_settings.content_type)
+
+    async def delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        container = await self._client()
+        # delete_blobs batches up to 256 deletes per request
+        for i in range(0, len(keys), 256):
+            try:
+                await asyncio.to_thread(container.delete_blobs, *keys[i:i + 256], raise_on_any_failure=False)
+            except Exception:
+                logger.warning("blob batch delete failed", exc_info=True)
+
+    async def stage_open(self, upload_id, key, size):
+        pass  # blocks are staged straight onto the target blob
+
+    async def stage_chunk(self, upload_id, key, index, offset, data):
+        blob = (await self._client()).get_blob_client(blob=key)
+        await asyncio.to_thread(blob.stage_block, block_id=_block_id(index), data=data)
+
+    async def stage_commit(self, upload_id, key, chunk_count, content_type=None):
+        blob = (await self._client()).get_blob_client(blob=key)
+        await asyncio.to_thread(
+            blob.commit_block_list, [_block_id(i) for i in range(chunk_count)],
+            content_settings=self._ContentSettings(content_type=content_type) if content_type else None,
+        )
+        return blob.url
+
+    async def stage_abort(self, upload_id, key):
+        pass  # Azure discards uncommitted blocks after a week
+
+    # no stage_digest: uncommitted blocks can't be read back, so these uploads
+    # only dedup when the client declares the hash up front
+
+    async def presign(self, key, expires_in=3600):
+        from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+        blob = (await self._client()).get_blob_client(blob=key)
+        account_key = getattr(self._service.credential, "account_key", None)
+        if not account_key:
+            return blob.url  # public container or AAD auth: nothing to sign
+        sas = generate_blob_sas(
+            account_name=self._service.account_name,
+            container_name=self._container_name,
+            blob_name=key,
+            account_key=account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        )
+        return f"{blob.url}?{sas}"
+
+    def key_for_uri(self, uri):
+        if not uri or not uri.startswith(("http://", "https://")):
+            return None
+        parts = [p for p in urlparse(uri).path.split("/") if p]  # /<container>/<blob_name>
+        if len(parts) >= 2 and parts[0] == self._container_name:
+            return "/".join(parts[1:])
+        return None
+
+
+# --- In-memory stand-in (tests, benchmarks)
+class MemoryStorage(StorageBackend):
+    name = "memory"
+    prefix = "memory://"
+
+    def __init__(self):
+        self._blobs: dict[str, tuple[bytes, BlobStat]] = {}
+        self._staged: dict[str, bytearray] = {}
+
+    async def put_stream(self, key, source, content_type=None):
+        buf = bytearray()
+        while chunk := await source.read(READ_CHUNK):
+            buf += chunk
+        return self._store(key, bytes(buf), content_type)
+
+    def _store(self, key: str, data: bytes, content_type: str | None) -> str:
+        self._blobs[key] = (data, BlobStat(
+            size=len(data),
+            etag=f'"{hashlib.md5(data).hexdigest()}"',
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            content_type=content_type,
+        ))
+        return self.prefix + key
+
+    async def get_range(self, key, start, end):
+        data, _ = self._blobs[key]
+        for pos in range(start, end + 1, READ_CHUNK):
+            yield data[pos:min(pos + READ_CHUNK, end + 1)]
+
+    async def stat(self, key):
+        entry = self._blobs.get(key)
+        return entry[1] if entry else None
+
+    async def delete_many(self, keys):
+        for k in keys:
+            self._blobs.pop(k, None)
+
+    async def presign(self, key, expires_in=3600):
+        return self.prefix + key
+
+    def key_for_uri(self, uri):
+        if uri and uri.startswith(self.prefix):
+            return uri[len(self.prefix):]
+        return None
+
+    async def stage_open(self, upload_id, key, size):
+        self._staged[upload_id] = bytearray(size)
+
+    async def stage_chunk(self, upload_id, key, index, offset, data):
+        self._staged[upload_id][offset:offset + len(data)] = data
+
+    async def stage_commit(self, upload_id, key, chunk_count, content_type=None):
+        return self._store(key, bytes(self._staged.pop(upload_id)), content_type)
+
+    async def stage_abort(self, upload_id, key):
+        self._staged.pop(upload_id, None)
+
+    async def stage_digest(self, upload_id):
+        staged = self._staged.get(upload_id)
+        return hashlib.sha256(staged).hexdigest() if staged is not None else None
+
+
+# --- Latency metrics around any backend
+class InstrumentedStorage(StorageBackend):
+    """Times every call of ``inner`` into ``metrics.STORAGE_LATENCY`` (``get_range`` until the last chunk)."""
+
+    def __init__(self, inner: StorageBackend):
+        self.inner, self.name = inner, inner.name
+
+    def __getattr__(self, attr):
+        return getattr(self.inner, attr)  # backend-specific extras
+
+    async def _timed(self, op: str, call):
+        start = time.perf_counter()
+        try:
+            return await call
+        except Exception:
+            metrics.STORAGE_ERRORS.inc((self.name, op))
+            raise
+        finally:
+            metrics.STORAGE_LATENCY.observe((self.name, op), time.perf_counter() - start)
+
+    async def put_stream(self, key, source, content_type=None):
+        return await self._timed("put_stream", self.inner.put_stream(key, source, content_type))
+
+    async def get_range(self, key, start, end):
+        began, op = time.perf_counter(), "get_range"
+        try:
+            async for chunk in self.inner.get_range(key, start, end):
+                yield chunk
+        except Exception:
+            metrics.STORAGE_ERRORS.inc((self.name, op))
+            raise
+        finally:
+            metrics.STORAGE_LATENCY.observe((self.name, op), time.perf_counter() - began)
+
+    async def stat(self, key):
+        return await self._timed("stat", self.inner.stat(key))
+
+    async def delete_many(self, keys):
+        return await self._timed("delete_many", self.inner.delete_many(keys))
+
+    async def presign(self, key, expires_in=3600):
+        return await self._timed("presign", self.inner.presign(key, expires_in))
+
+    def key_for_uri(self, uri):
+        return self.inner.key_for_uri(uri)
+
+    def local_path(self, key):
+        return self.inner.local_path(key)
+
+    async def stage_open(self, upload_id, key, size):
+        return await self._timed("stage_open", self.inner.stage_open(upload_id, key, size))
+
+    async def stage_chunk(self, upload_id, key, index, offset, data):
+        return await self._timed("stage_chunk", self.inner.stage_chunk(upload_id, key, index, offset, data))
+
+    async def stage_commit(self, upload_id, key, chunk_count, content_type=None):
+        return await self._timed("stage_commit", self.inner.stage_commit(upload_id, key, chunk_count, content_type))
+
+    async def stage_abort(self, upload_id, key):
+        return await self._timed("stage_abort", self.inner.stage_abort(upload_id, key))
+
+    async def stage_digest(self, upload_id):
+        return await self._timed("stage_digest", self.inner.stage_digest(upload_id))
+
+
+# --- Selection
+_backend: StorageBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend() -> StorageBackend:
+    kind = (settings.STORAGE_BACKEND or ("azure" if settings.AZURE_STORAGE_CONNECTION_STRING else "local")).lower()
+    if kind == "azure":
+        try:
+            return AzureStorage(settings.AZURE_STORAGE_CONNECTION_STRING, settings.AZURE_BLOB_CONTAINER)
+        except ImportError:
+            # Azure libs not installed -> fall back to local filesystem
+            logger.warning("azure-storage-blob not installed; using local storage")
+            kind = "local"
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "local":
+        return LocalStorage(settings.LOCAL_DEV_UPLOAD_DIR, settings.UPLOAD_STAGING_DIR)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind!r}")
+
+
+def get_storage() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = _build_backend()
+                _backend = InstrumentedStorage(backend) if settings.METRICS_ENABLED else backend
+    return _backend
+
+
+def set_storage(backend: StorageBackend | None) -> None:
+    """Swap the process-wide backend (tests/benchmarks); None re-reads Settings on next use."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
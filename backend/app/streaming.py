@@ -0,0 +1,135 @@
+# app/streaming.py
+"""HTTP byte-range helpers for the video streaming route.
+
+Handles Range / If-Range / If-None-Match and builds 200, 206, 304 or 416
+responses. Local files are sent with the ASGI zero-copy extension when the
+server offers it, otherwise from an mmap of the file; remote blobs are
+proxied chunk by chunk from an async iterator.
+"""
+from __future__ import annotations
+import mmap
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, Callable
+
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+CACHE_CONTROL = "public, max-age=3600"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Return an inclusive (start, end) for a single ``bytes=`` range, or None for the whole body."""
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # unknown unit or multipart ranges: ignore and send the full body
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)  # bytes=-N → the last N bytes
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start < 0 or start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((t[2:] if t.startswith("W/") else t) == bare for t in tags)
+
+
+def _if_range_ok(header: str | None, etag: str, last_modified: datetime | None) -> bool:
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag and not etag.startswith("W/")  # strong comparison only
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(header) >= last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+
+class FileRangeResponse(Response):
+    """Send ``path[start:end+1]`` without buffering it in Python."""
+
+    def __init__(self, path: str, start: int, end: int, **kwargs):
+        super().__init__(content=None, **kwargs)
+        self.path, self.start, self.end = path, start, end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope["method"] == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                # the server does the sendfile(2)
+                await send({"type": "http.response.zerocopy", "file": f, "offset": self.start, "count": count})
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos, stop = self.start, self.end + 1
+                while pos < stop:
+                    nxt = min(pos + CHUNK_SIZE, stop)
+                    await send({"type": "http.response.body", "body": mm[pos:nxt], "more_body": nxt < stop})
+                    pos = nxt
+
+
+def range_response(
+    request,
+    *,
+    size: int,
+    etag: str,
+    last_modified: datetime | None,
+    media_type: str,
+    path: str | None = None,
+    reader: Callable[[int, int], AsyncIterator[bytes]] | None = None,
+) -> Response:
+    """Answer a GET for a ``size``-byte object from a local ``path`` or a remote ``reader(start, end)``."""
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    inm = request.headers.get("if-none-match")
+    if inm and _etag_matches(inm, etag):
+        return Response(status_code=304, headers=headers)
+
+    status_code, start, end = 200, 0, size - 1
+    if _if_range_ok(request.headers.get("if-range"), etag, last_modified):
+        try:
+            rng = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if rng is not None:
+            status_code, (start, end) = 206, rng
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    if path is not None:
+        return FileRangeResponse(path, start, end, status_code=status_code, headers=headers, media_type=media_type)
+    if size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(reader(start, end), status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,59 @@
+# app/upload_gc.py
+"""Garbage collection of abandoned resumable uploads and unreferenced blobs.
+
+A session idle for UPLOAD_SESSION_TTL_HOURS loses its staged chunks and its
+rows. Blobs whose refcount dropped to zero outside a video delete (an edited
+``blob_uri``) lose their row, then their file. The app runs ``run_forever``
+from its lifespan (every worker does; the work is idempotent) and
+``python -m app.cli gc-uploads`` does one pass.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from . import crud
+from .database import SessionLocal, write_now
+from .settings import settings
+from .storage import get_storage
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _expired(idle_since: datetime):
+    with SessionLocal() as db:
+        return crud.get_expired_upload_sessions(db, idle_since)
+
+
+async def collect(now: datetime | None = None) -> int:
+    """One pass; returns the number of sessions removed."""
+    idle_since = (now or datetime.utcnow()) - timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    storage, removed = get_storage(), 0
+    while expired := await asyncio.to_thread(_expired, idle_since):
+        for upload_id, blob_key in expired:
+            await storage.stage_abort(upload_id, blob_key)
+            await asyncio.to_thread(write_now, crud.delete_upload_session, upload_id)
+        removed += len(expired)
+    return removed
+
+
+async def collect_blobs() -> int:
+    """One pass over refcount-0 blobs; returns the number removed."""
+    storage, removed = get_storage(), 0
+    while uris := await asyncio.to_thread(write_now, crud.drop_unreferenced_blobs):
+        # rows go first, so a concurrent upload can't pick up a blob we're deleting
+        await storage.delete_many([k for k in map(storage.key_for_uri, uris) if k])
+        removed += len(uris)
+    return removed
+
+
+async def run_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.UPLOAD_GC_INTERVAL_SECONDS)
+        try:
+            if n := await collect():
+                logger.info("removed %d abandoned upload sessions", n)
+            if n := await collect_blobs():
+                logger.info("removed %d unreferenced blobs", n)
+        except Exception:
+            logger.warning("upload session GC failed", exc_info=True)
@@ -1,10 +1,19 @@
 # app/utils.py
+import asyncio
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 from .settings import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds == default_rounds: hashes below the current cost are flagged for rehash on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -12,6 +21,35 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+# --- bcrypt off the shared threadpool
+# bcrypt releases the GIL, so a small dedicated thread pool gets real parallelism
+# without starving the anyio threads that serve sync endpoints. Admission is
+# bounded: running + queued jobs never exceed workers + PASSWORD_HASH_QUEUE.
+class HashingBusy(Exception):
+    """The password hashing queue is full; callers should answer 503."""
+
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        fut = _hash_pool.submit(fn, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # release when the job really finishes, even if the awaiting request goes away
+    fut.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(fut)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+async def verify_and_update_async(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(valid, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return await _run_hashing(pwd_context.verify_and_update, plain, hashed)
+
 ALGORITHM = "HS256"
 
 def create_access_token(data: dict, expires_minutes: int | None = None) -> str:
@@ -19,3 +57,33 @@ def create_access_token(data: dict, expires_minutes: int | None = None) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+# --- Keyset pagination cursors: opaque "<iso timestamp>|<id>" tokens
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError on anything that isn't a cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    """Cursor for ranked lists: "<score>|<id>" (repr round-trips the float exactly)."""
+    raw = f"{score!r}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_score_cursor(cursor: str) -> tuple[float, int]:
+    """Raises ValueError on anything that isn't a score cursor we issued."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, row_id = raw.rsplit("|", 1)
+        return float(score), int(row_id)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
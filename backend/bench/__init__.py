@@ -0,0 +1 @@
+"""Benchmarks for the API. Run modules with ``python -m bench.<name>`` from backend/."""
@@ -0,0 +1,101 @@
+# bench/body_limit.py
+"""Per-request cost of the upload size guard: BaseHTTPMiddleware vs plain ASGI.
+
+    cd backend && python -m bench.body_limit --requests 20000
+
+Calls a one-route FastAPI app directly over ASGI (no sockets, no httpx) so the
+middleware is most of what is measured. ``legacy`` is the Content-Length-only
+``BaseHTTPMiddleware`` guard ``main.py`` used to install; ``asgi`` is
+``app.body_limit.BodySizeLimitMiddleware`` with the app's rules.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse, Response  # noqa: E402
+
+from app.body_limit import BodySizeLimitMiddleware  # noqa: E402
+
+LIMIT = 200 * 1024 * 1024
+
+
+class LegacyLimit(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.method == "POST" and request.url.path.startswith("/videos"):
+            cl = request.headers.get("content-length")
+            if cl and int(cl) > LIMIT:
+                return JSONResponse({"detail": "File too large"}, status_code=413)
+        return await call_next(request)
+
+
+def build(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/videos/{video_id}")
+    async def read(video_id: int):
+        return Response(b"{}", media_type="application/json")
+
+    @app.post("/comments/")
+    async def create(request: Request):
+        return Response(str(len(await request.body())))
+
+    if variant == "legacy":
+        app.add_middleware(LegacyLimit)
+    elif variant == "asgi":
+        app.add_middleware(BodySizeLimitMiddleware, limits={"POST /videos/": LIMIT}, default=1024 * 1024)
+    return app
+
+
+async def call(app, method: str, path: str, body: bytes) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)  # like a server: nothing more until disconnect
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure(app, method: str, path: str, body: bytes, n: int) -> float:
+    for _ in range(200):
+        await call(app, method, path, body)  # warm-up
+    runs = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(n // 5):
+            await call(app, method, path, body)
+        runs.append((time.perf_counter() - t0) / (n // 5) * 1e6)
+    return statistics.median(runs)
+
+
+async def main(args):
+    body = b"x" * 512
+    for variant in ("none", "legacy", "asgi"):
+        app = build(variant)
+        get = await measure(app, "GET", "/videos/1", b"", args.requests)
+        post = await measure(app, "POST", "/comments/", body, args.requests)
+        print(f"{variant:7s}: GET {get:7.1f} us/req   POST(512 B) {post:7.1f} us/req")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+# bench/dataset.py
+"""Synthetic dataset for benchmarks, written straight through ``models``.
+
+    cd backend && python -m bench.dataset --users 1000 --videos 5000 --comments 50000 --ratings 100000
+
+Popularity is Zipf-skewed: the video at popularity rank r gets weight
+1/r**skew, so a few videos collect most comments and ratings (and, through
+``Dataset.pick_video``, most of the traffic in bench.load). Ranks are
+shuffled against ids and upload dates. Everyone shares ``PASSWORD``; the hash
+is computed once. Rating stats, the search index, the ranking scores and
+(with numpy/scipy) the similar-video lists are rebuilt afterwards, as the CLI
+would. The same ``seed`` gives the same
+dataset.
+"""
+from __future__ import annotations
+import argparse
+import bisect
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import crud, models, ranking, search, similar, utils  # noqa: E402
+
+PASSWORD = "benchpass1"
+BATCH = 10_000
+
+WORDS = ("space", "ocean", "city", "night", "cooking", "guitar", "travel", "history", "robot", "garden",
+         "winter", "street", "mountain", "jazz", "coffee", "football", "science", "desert", "river", "dance")
+GENRES = ("drama", "comedy", "documentary", "music", "sports", "education", "travel", "gaming")
+AGE_RATINGS = ("G", "PG", "PG-13", "R")
+
+
+@dataclass
+class Dataset:
+    user_ids: list[int]
+    emails: list[str]
+    creator_ids: list[int]
+    video_ids: list[int]  # most popular first
+    cum_weights: list[float]
+
+    def pick_video(self, rng: random.Random) -> int:
+        """A video id, Zipf-weighted by popularity."""
+        i = bisect.bisect_left(self.cum_weights, rng.random() * self.cum_weights[-1])
+        return self.video_ids[min(i, len(self.video_ids) - 1)]
+
+    def pick_user(self, rng: random.Random) -> tuple[int, str]:
+        i = rng.randrange(len(self.user_ids))
+        return self.user_ids[i], self.emails[i]
+
+
+def _bulk(db: Session, model, rows: list[dict]) -> None:
+    for i in range(0, len(rows), BATCH):
+        db.execute(insert(model), rows[i:i + BATCH])
+
+
+def generate(db: Session, users: int = 200, videos: int = 1000, comments: int = 10_000, ratings: int = 20_000,
+             skew: float = 1.1, creators: float = 0.1, days: int = 90, seed: int = 0) -> Dataset:
+    """Insert the dataset into an empty database and return what load scenarios need to address it."""
+    rng, now = random.Random(seed), datetime.utcnow()
+    hashed = utils.hash_password(PASSWORD)
+
+    n_creators = max(1, int(users * creators))
+    _bulk(db, models.User, [
+        dict(email=f"user{i}@example.com", username=f"user{i}", display_name=f"User {i}", hashed_password=hashed,
+             role=models.UserRole.creator if i < n_creators else models.UserRole.consumer, created_at=now - timedelta(days=days))
+        for i in range(users)
+    ])
+    U = models.User
+    user_rows = db.query(U.user_id, U.email).order_by(U.user_id).all()
+    user_ids, emails = [u for u, _ in user_rows], [e for _, e in user_rows]
+    creator_ids = user_ids[:n_creators]
+
+    _bulk(db, models.Video, [
+        dict(title=" ".join(rng.sample(WORDS, 3)).title(), genre=rng.choice(GENRES), age_rating=rng.choice(AGE_RATINGS),
+             publisher=f"Studio {rng.randrange(50)}", creator_id=rng.choice(creator_ids), processing_status="ready",
+             upload_date=now - timedelta(seconds=rng.uniform(0, days * 86400)))
+        for _ in range(videos)
+    ])
+    V = models.Video
+    uploaded = dict(db.query(V.video_id, V.upload_date).all())
+    video_ids = list(uploaded)
+    rng.shuffle(video_ids)  # popularity rank, independent of id and age
+    cum_weights = list(accumulate(1 / (rank + 1) ** skew for rank in range(len(video_ids))))
+    data = Dataset(user_ids, emails, creator_ids, video_ids, cum_weights)
+
+    def after_upload(video_id: int) -> datetime:
+        start = uploaded[video_id]
+        return start + (now - start) * rng.random()
+
+    rows = []
+    for _ in range(comments):
+        vid = data.pick_video(rng)
+        rows.append(dict(video_id=vid, user_id=rng.choice(user_ids), comment_text=" ".join(rng.choices(WORDS, k=8)),
+                         created_at=after_upload(vid)))
+    _bulk(db, models.Comment, rows)
+
+    # one rating per (video, user): stop early if popular videos run out of raters
+    seen, rows, attempts = set(), [], 0
+    quality = {vid: rng.uniform(1.5, 5) for vid in video_ids}
+    while len(rows) < min(ratings, users * videos) and attempts < ratings * 4:
+        attempts += 1
+        pair = (data.pick_video(rng), rng.choice(user_ids))
+        if pair in seen:
+            continue
+        seen.add(pair)
+        stars = min(5, max(1, round(rng.gauss(quality[pair[0]], 1))))
+        rows.append(dict(video_id=pair[0], user_id=pair[1], rating=stars, created_at=after_upload(pair[0])))
+    _bulk(db, models.Rating, rows)
+    db.commit()
+
+    crud.rebuild_rating_stats(db)
+    search.rebuild(db)
+    while ranking.refresh_scores(db):
+        pass
+    if similar.available():
+        similar.refresh_lists(db)
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed DATABASE_URL (must be empty) with a synthetic dataset")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=10_000)
+    parser.add_argument("--ratings", type=int, default=20_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of video popularity")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app.database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        generate(db, args.users, args.videos, args.comments, args.ratings, skew=args.skew, seed=args.seed)
+    print(f"seeded {args.users} users, {args.videos} videos in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,116 @@
+# bench/db_stacks.py
+"""Sync (threadpool) vs async database stack under high request concurrency.
+
+    cd backend && python -m bench.db_stacks --concurrency 200 --duration 5
+
+Each stack runs in its own subprocess (the engine is chosen at import time)
+against a throwaway SQLite DB, or against ``DATABASE_URL`` if you export one
+(the async URL is derived from it). The response cache is off so every
+request reaches the database. The sync stack is capped by anyio's threadpool
+(40 threads by default); the async one is not.
+
+Local SQLite answers in microseconds, which hides the difference; use
+``--latency-ms`` to add a simulated network round trip to every statement
+(a blocking sleep on the sync engine, an awaited one on the async engine).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+READS = ("/videos/{id}", "/videos/?limit=20", "/videos/{id}/comments/?limit=20", "/videos/{id}/ratings/summary")
+
+
+def pct(samples, p):
+    return statistics.quantiles(samples, n=100)[p - 1] * 1000 if len(samples) > 1 else float("nan")
+
+
+def add_latency(database, seconds: float):
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+
+    if database.async_engine is not None:
+        @event.listens_for(database.async_engine.sync_engine, "before_cursor_execute")
+        def _wait(*_):
+            await_only(asyncio.sleep(seconds))  # runs inside SQLAlchemy's greenlet
+    else:
+        @event.listens_for(database.engine, "before_cursor_execute")
+        def _block(*_):
+            time.sleep(seconds)
+
+
+async def run_worker(args):
+    import httpx
+    from app import database, models, utils
+    from app.database import SessionLocal
+    from app.main import app
+
+    if args.latency_ms:
+        add_latency(database, args.latency_ms / 1000)
+
+    db = SessionLocal()
+    user = models.User(email="bench@example.com", username="bench", hashed_password=utils.hash_password("benchpass1"))
+    db.add(user); db.commit()
+    videos = [models.Video(title=f"video {i}", creator_id=user.user_id) for i in range(args.videos)]
+    db.add_all(videos); db.commit()
+    db.add_all(models.Comment(video_id=v.video_id, user_id=user.user_id, comment_text="nice") for v in videos for _ in range(5))
+    db.commit(); db.close()
+
+    latencies, errors = [], 0
+    stop = time.perf_counter() + args.duration
+
+    async def client_loop(client):
+        nonlocal errors
+        while time.perf_counter() < stop:
+            path = random.choice(READS).format(id=random.randint(1, args.videos))
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code >= 400
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await database.dispose_engines()
+    stack = "async" if database.AsyncSessionLocal is not None else "sync"
+    print(f"{stack:5s}: {len(latencies) / elapsed:8.1f} req/s  p50={pct(latencies, 50):7.2f}ms "
+          f"p95={pct(latencies, 95):7.2f}ms p99={pct(latencies, 99):7.2f}ms errors={errors}")
+
+
+def main(args):
+    for stack in ("sync", "async"):
+        tmp = tempfile.mkdtemp(prefix="bench-")
+        env = {
+            **os.environ,
+            "SECRET_KEY": "bench", "ENV": "dev",
+            "LOCAL_DEV_UPLOAD_DIR": f"{tmp}/uploads",
+            "RESPONSE_CACHE_ENABLED": "false",
+            "DATABASE_ASYNC": "true" if stack == "async" else "false",
+        }
+        env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+        cmd = [sys.executable, "-m", "bench.db_stacks", "--worker",
+               "--concurrency", str(args.concurrency), "--duration", str(args.duration), "--videos", str(args.videos),
+               "--latency-ms", str(args.latency_ms)]
+        subprocess.run(cmd, env=env, check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated DB round trip per statement")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        asyncio.run(run_worker(args))
+    else:
+        main(args)
@@ -0,0 +1,115 @@
+# bench/lean_lists.py
+"""CPU per 100-row list page: ORM + Pydantic vs Core rows + app/fastjson.py.
+
+    cd backend && python -m bench.lean_lists
+
+Seeds a throwaway SQLite database through bench.dataset (in a subprocess,
+since settings are read at import), then times, in process CPU seconds and
+with a fresh session per page as in a request, one 100-row page of:
+
+* ``GET /videos``: before, ORM ``crud.get_videos`` validated and dumped
+  through ``TypeAdapter(List[VideoOut])``; after, ``crud.get_video_rows``;
+* ``GET /users`` and ``GET /videos/{id}/comments``: before, ORM objects
+  through FastAPI's ``response_model`` serialization (``serialize_response``
+  then ``JSONResponse``); after, ``get_user_rows``/``get_comment_rows``.
+
+Both sides include the query. Each pair is checked to give the same bytes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+
+def cpu_us(fn, n: int) -> float:
+    for _ in range(20):
+        fn()  # warm-up
+    runs = []
+    for _ in range(5):
+        t0 = time.process_time()
+        for _ in range(n // 5):
+            fn()
+        runs.append((time.process_time() - t0) / (n // 5) * 1e6)
+    return statistics.median(runs)
+
+
+def child(n: int) -> None:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from pydantic import TypeAdapter
+
+    from app import crud, fastjson, schemas
+    from app.database import Base, SessionLocal, engine
+    from app.main import app  # noqa: F401  (registers every table)
+    from bench import dataset
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        data = dataset.generate(db, users=500, videos=1000, comments=20_000, ratings=0)
+    video_id = data.video_ids[0]  # the most popular video has hundreds of comments
+
+    video_list = TypeAdapter(List[schemas.VideoOut])
+
+    def response_model(schema, objects) -> bytes:
+        field = create_model_field(name="response", type_=List[schema], mode="serialization")
+        return JSONResponse(asyncio.run(serialize_response(field=field, response_content=objects))).body
+
+    def page(fetch, encode):
+        def run():
+            with SessionLocal() as db:
+                return encode(fetch(db))
+        return run
+
+    cases = {
+        "GET /videos": (
+            page(lambda db: crud.get_videos(db, limit=100),
+                 lambda videos: video_list.dump_json(video_list.validate_python(videos, from_attributes=True))),
+            page(lambda db: crud.get_video_rows(db, limit=100), fastjson.dumps),
+        ),
+        "GET /users": (
+            page(lambda db: crud.get_users(db, limit=100), lambda users: response_model(schemas.UserOut, users)),
+            page(lambda db: crud.get_user_rows(db, limit=100), fastjson.dumps),
+        ),
+        "GET /videos/{id}/comments": (
+            page(lambda db: crud.get_comments(db, video_id, limit=100), lambda comments: response_model(schemas.CommentOut, comments)),
+            page(lambda db: crud.get_comment_rows(db, video_id, limit=100), fastjson.dumps),
+        ),
+    }
+    results = []
+    for name, (before, after) in cases.items():
+        same = before() == after()
+        results.append({"endpoint": name, "rows": len(json.loads(after())), "same": same,
+                        "before_us": cpu_us(before, n), "after_us": cpu_us(after, n)})
+    print(json.dumps({"orjson": fastjson.orjson is not None, "results": results}))
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SECRET_KEY="bench", ENV="dev", DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                   STORAGE_BACKEND="memory", MEDIA_PROCESSING_ENABLED="false")
+        out = subprocess.run([sys.executable, "-m", "bench.lean_lists", "--child", "--pages", str(args.pages)],
+                             env=env, check=True, stdout=subprocess.PIPE, text=True)
+    r = json.loads(out.stdout.splitlines()[-1])
+    print(f"CPU per page, encoder: {'orjson' if r['orjson'] else 'stdlib json'}")
+    print(f"{'endpoint':<26} {'rows':>5} {'before':>9} {'after':>9} {'speedup':>8}  same bytes")
+    for e in r["results"]:
+        print(f"{e['endpoint']:<26} {e['rows']:5d} {e['before_us']:7.0f}us {e['after_us']:7.0f}us "
+              f"{e['before_us'] / e['after_us']:7.1f}x  {'yes' if e['same'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.pages)
+    else:
+        main(args)
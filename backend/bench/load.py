@@ -0,0 +1,337 @@
+# bench/load.py
+"""Scenario-mix load test of the real app, with per-endpoint latency and a baseline check.
+
+    cd backend && python -m bench.load --mix browse --concurrency 50 --duration 20 --out bench/baseline.json
+    cd backend && python -m bench.load --mix browse --concurrency 50 --duration 20 --baseline bench/baseline.json
+
+Seeds a throwaway SQLite DB with bench.dataset (or ``DATABASE_URL`` if you
+export one; it must be empty), then drives ``app.main.app`` either in-process
+over ASGI (``--server inprocess``, no sockets) or as a ``uvicorn`` subprocess
+over HTTP (``--server uvicorn``; client and server share the machine, so keep
+``--workers`` below the core count). Storage is the in-memory backend and
+post-upload processing is off, so uploads measure the request path only.
+
+Each of ``--concurrency`` virtual users loops over scenarios drawn from the
+mix: feed scroll, ranked feed scroll (``trending``, custom mixes only), watch
+page, search, rate, comment, login, upload. Video picks follow the dataset's
+Zipf popularity. Results (req/s and p50/p95/p99 per
+endpoint) are printed and written as JSON to ``--out``; with ``--baseline``
+an endpoint whose p95 grew, or whose throughput fell, by more than
+``--tolerance`` is flagged (given ``--min-samples`` requests in both runs)
+and the exit status is 1. Other settings pass
+through the environment (e.g. ``SQLITE_TUNED=true``, ``RESPONSE_CACHE_ENABLED=true``).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+_tmp = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("LOCAL_DEV_UPLOAD_DIR", f"{_tmp}/uploads")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("MEDIA_PROCESSING_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from app import utils  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from bench.dataset import PASSWORD, WORDS, Dataset, generate  # noqa: E402
+
+MIXES = {
+    "browse": {"feed": 40, "watch": 35, "search": 10, "rate": 7, "comment": 5, "login": 2, "upload": 1},
+    "write-heavy": {"feed": 20, "watch": 20, "search": 5, "rate": 30, "comment": 20, "login": 3, "upload": 2},
+    "read-only": {"feed": 50, "watch": 40, "search": 10},
+}
+UPLOAD_BYTES = 256 * 1024
+
+
+def parse_mix(spec: str) -> dict[str, int]:
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = {name: int(weight) for name, weight in (part.split("=") for part in spec.split(","))}
+    unknown = mix.keys() - SCENARIOS.keys()
+    if unknown:
+        raise SystemExit(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    return mix
+
+
+def pct(samples, p):
+    return statistics.quantiles(samples, n=100)[p - 1] * 1000 if len(samples) > 1 else float("nan")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    def add(self, label: str, seconds: float, ok: bool) -> None:
+        if self.recording:
+            self.latencies[label].append(seconds)
+            self.errors[label] += not ok
+
+    def summary(self, elapsed: float) -> dict:
+        def row(samples, errors):
+            return {"count": len(samples), "rps": round(len(samples) / elapsed, 2), "errors": errors,
+                    "p50_ms": round(pct(samples, 50), 3), "p95_ms": round(pct(samples, 95), 3), "p99_ms": round(pct(samples, 99), 3)}
+        endpoints = {label: row(s, self.errors[label]) for label, s in sorted(self.latencies.items())}
+        everything = [x for s in self.latencies.values() for x in s]
+        return {"endpoints": endpoints, "total": row(everything, sum(self.errors.values()))}
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, data: Dataset, recorder: Recorder, rng: random.Random):
+        self.client, self.data, self.recorder, self.rng = client, data, recorder, rng
+        user_id, self.email = data.pick_user(rng)
+        self.auth = {"Authorization": "Bearer " + utils.create_access_token({"sub": str(user_id)})}
+        creator = rng.choice(data.creator_ids)
+        self.creator_auth = {"Authorization": "Bearer " + utils.create_access_token({"sub": str(creator)})}
+
+    async def call(self, label: str, method: str, url: str, **kw) -> httpx.Response | None:
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+        except httpx.HTTPError:
+            self.recorder.add(label, time.perf_counter() - t0, False)
+            return None
+        self.recorder.add(label, time.perf_counter() - t0, r.status_code < 400)
+        return r
+
+
+# --- Scenarios: one user action each, possibly several requests
+async def feed(vu: VirtualUser):
+    """Open the feed and scroll a page or two, as the frontend's infinite scroll does."""
+    r = await vu.call("GET /videos/", "GET", "/videos/", params={"limit": 12})
+    for _ in range(vu.rng.choice((0, 1, 1, 2))):
+        cursor = r is not None and r.headers.get(utils.NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+        r = await vu.call("GET /videos/?cursor", "GET", "/videos/", params={"limit": 12, "cursor": cursor})
+
+
+async def trending(vu: VirtualUser):
+    """Scroll a ranked feed (served from the ranking snapshot)."""
+    sort = vu.rng.choice(("trending", "trending", "top"))
+    r = await vu.call(f"GET /videos/?sort={sort}", "GET", "/videos/", params={"sort": sort, "limit": 12})
+    for _ in range(vu.rng.choice((0, 1, 2))):
+        cursor = r is not None and r.headers.get(utils.NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+        r = await vu.call(f"GET /videos/?sort={sort}&cursor", "GET", "/videos/", params={"sort": sort, "limit": 12, "cursor": cursor})
+
+
+async def watch(vu: VirtualUser):
+    vid = vu.data.pick_video(vu.rng)
+    await vu.call("GET /videos/{id}", "GET", f"/videos/{vid}")
+    await vu.call("GET /videos/{id}/ratings/summary", "GET", f"/videos/{vid}/ratings/summary")
+    await vu.call("GET /videos/{id}/comments/", "GET", f"/videos/{vid}/comments/", params={"limit": 20})
+    await vu.call("GET /videos/{id}/similar", "GET", f"/videos/{vid}/similar", params={"limit": 10})
+
+
+async def search(vu: VirtualUser):
+    q = " ".join(vu.rng.sample(WORDS, vu.rng.choice((1, 1, 2))))
+    await vu.call("GET /videos/search", "GET", "/videos/search", params={"q": q[:vu.rng.randint(3, len(q))], "limit": 24})
+
+
+async def rate(vu: VirtualUser):
+    vid = vu.data.pick_video(vu.rng)
+    await vu.call("PUT /videos/{id}/ratings/", "PUT", f"/videos/{vid}/ratings/", json={"rating": vu.rng.randint(1, 5)}, headers=vu.auth)
+
+
+async def comment(vu: VirtualUser):
+    vid = vu.data.pick_video(vu.rng)
+    text = " ".join(vu.rng.choices(WORDS, k=vu.rng.randint(3, 20)))
+    await vu.call("POST /videos/{id}/comments/", "POST", f"/videos/{vid}/comments/", json={"comment_text": text}, headers=vu.auth)
+
+
+async def login(vu: VirtualUser):
+    await vu.call("POST /auth/login", "POST", "/auth/login", data={"username": vu.email, "password": PASSWORD})
+
+
+async def upload(vu: VirtualUser):
+    body = vu.rng.randbytes(UPLOAD_BYTES)  # unique, so dedup doesn't skip the transfer
+    await vu.call("POST /videos/", "POST", "/videos/", data={"title": "bench upload"},
+                  files={"file": ("bench.mp4", body, "video/mp4")}, headers=vu.creator_auth)
+
+
+SCENARIOS = {"feed": feed, "trending": trending, "watch": watch, "search": search, "rate": rate, "comment": comment, "login": login, "upload": upload}
+
+
+async def drive(client: httpx.AsyncClient, data: Dataset, args) -> dict:
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    recorder, master = Recorder(), random.Random(args.seed)
+    users = [VirtualUser(client, data, recorder, random.Random(master.random())) for _ in range(args.concurrency)]
+    stop = time.perf_counter() + args.warmup + args.duration
+
+    async def loop(vu: VirtualUser):
+        while time.perf_counter() < stop:
+            await SCENARIOS[vu.rng.choices(names, weights)[0]](vu)
+            # in-process, a cached response completes without ever yielding; let the other users (and the warm-up timer) run
+            await asyncio.sleep(vu.rng.expovariate(1000 / args.think_ms) if args.think_ms else 0)
+
+    async def start_recording():
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        return time.perf_counter()
+
+    started, *_ = await asyncio.gather(start_recording(), *(loop(vu) for vu in users))
+    return recorder.summary(time.perf_counter() - started)
+
+
+# --- Servers
+async def run_inprocess(data: Dataset, args) -> dict:
+    from app.database import dispose_engines
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        result = await drive(client, data, args)
+    await dispose_engines()
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(data: Dataset, args) -> dict:
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(cmd, env=os.environ.copy())
+    base = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/healthz")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                await asyncio.sleep(0.1)
+            return await drive(client, data, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+# --- Results
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(result: dict) -> None:
+    print(f"{'endpoint':34s} {'count':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'errors':>6s}")
+    for label, row in [*result["endpoints"].items(), ("ALL", result["total"])]:
+        print(f"{label:34s} {row['count']:7d} {row['rps']:8.1f} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} {row['errors']:6d}")
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float, min_samples: int) -> list[str]:
+    """Endpoints that got slower (p95) or lost throughput beyond ``tolerance``; also prints the deltas.
+
+    Endpoints with fewer than ``min_samples`` requests in either run are shown but never flagged.
+    """
+    comparable = ("server", "mix", "concurrency", "dataset")
+    for key in comparable:
+        if result["meta"].get(key) != baseline["meta"].get(key):
+            print(f"warning: {key} differs from the baseline ({baseline['meta'].get(key)!r} -> {result['meta'].get(key)!r})")
+    regressions = []
+    print(f"\n{'endpoint':34s} {'p95 base':>9s} {'p95 now':>9s} {'change':>8s} {'req/s base':>11s} {'req/s now':>10s} {'change':>8s}")
+    rows = {**result["endpoints"], "ALL": result["total"]}
+    base_rows = {**baseline["endpoints"], "ALL": baseline["total"]}
+    for label, now in rows.items():
+        base = base_rows.get(label)
+        if not base or not base["count"]:
+            continue
+        p95_change = now["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_change = now["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        flags = []
+        if min(now["count"], base["count"]) < min_samples:
+            pass  # too few samples for a p95 to mean much
+        elif p95_change > tolerance and now["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            flags.append("p95")
+        elif rps_change < -tolerance:
+            flags.append("req/s")
+        if flags:
+            regressions.append(f"{label}: {' and '.join(flags)}")
+        print(f"{label:34s} {base['p95_ms']:9.2f} {now['p95_ms']:9.2f} {p95_change:+8.1%} {base['rps']:11.1f} {now['rps']:10.1f} {rps_change:+8.1%}"
+              f"{'  REGRESSION' if flags else ''}")
+    return regressions
+
+
+def main(args) -> int:
+    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
+    dataset = dict(users=args.users, videos=args.videos, comments=args.comments, ratings=args.ratings, skew=args.skew)
+    with SessionLocal() as db:
+        data = generate(db, **dataset, seed=args.seed)
+    engine.dispose()
+    print(f"seeded in {time.perf_counter() - t0:.1f}s: {dataset}")
+
+    runner = run_uvicorn if args.server == "uvicorn" else run_inprocess
+    result = asyncio.run(runner(data, args))
+    result["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"), "git": _git_rev(),
+        "python": platform.python_version(), "cpus": os.cpu_count(),
+        "server": args.server if args.server == "inprocess" else f"uvicorn x{args.workers}",
+        "mix": parse_mix(args.mix), "concurrency": args.concurrency, "duration": args.duration,
+        "think_ms": args.think_ms, "dataset": dataset, "seed": args.seed,
+    }
+    print_table(result)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_delta_ms, args.min_samples)
+        if regressions:
+            print("\nregressions: " + "; ".join(regressions))
+            return 1
+        print("\nno regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--mix", default="browse", help=f"{' | '.join(MIXES)} or weights like feed=60,watch=40")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds run before measuring")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's actions")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=20_000)
+    parser.add_argument("--ratings", type=int, default=50_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="", help="write results JSON here")
+    parser.add_argument("--baseline", default="", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative p95 / req/s change")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 changes smaller than this")
+    parser.add_argument("--min-samples", type=int, default=100, help="don't judge endpoints with fewer requests")
+    sys.exit(main(parser.parse_args()))
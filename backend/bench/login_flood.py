@@ -0,0 +1,86 @@
+# bench/login_flood.py
+"""Feed latency with and without a concurrent login flood.
+
+    cd backend && python -m bench.login_flood --concurrency 100 --duration 5
+
+Runs the app in-process against a throwaway SQLite DB. With bcrypt on its own
+pool the feed p95 should stay close to the idle baseline; excess logins are
+shed with 503 instead of queueing behind the feed.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ENV", "dev")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+os.environ.setdefault("LOCAL_DEV_UPLOAD_DIR", f"{_tmp}/uploads")
+
+import httpx  # noqa: E402
+
+from app import models, utils  # noqa: E402
+from app.database import SessionLocal, dispose_engines  # noqa: E402
+from app.main import app  # noqa: E402
+
+EMAIL, PASSWORD = "bench@example.com", "benchpass1"
+
+
+def seed(videos: int):
+    db = SessionLocal()
+    user = models.User(email=EMAIL, username="bench", hashed_password=utils.hash_password(PASSWORD),
+                       role=models.UserRole.creator)
+    db.add(user); db.commit()
+    db.add_all(models.Video(title=f"video {i}", creator_id=user.user_id) for i in range(videos))
+    db.commit(); db.close()
+
+
+def pct(samples, p):
+    return statistics.quantiles(samples, n=100)[p - 1] * 1000 if len(samples) > 1 else float("nan")
+
+
+async def feed_latencies(client, duration: float):
+    out, end = [], time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        r = await client.get("/videos/", params={"limit": 20})
+        r.raise_for_status()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+async def login_flood(client, concurrency: int, codes: dict[int, int], stop: asyncio.Event):
+    """Keep ``concurrency`` logins in flight until ``stop`` is set."""
+    async def worker():
+        while not stop.is_set():
+            r = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def main(args):
+    seed(200)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await feed_latencies(client, args.duration)
+        codes: dict[int, int] = {}
+        stop = asyncio.Event()
+        flood = asyncio.create_task(login_flood(client, args.concurrency, codes, stop))
+        busy = await feed_latencies(client, args.duration)
+        stop.set()
+        await flood
+    await dispose_engines()
+    print(f"feed idle   : n={len(idle):5d} p50={pct(idle, 50):7.2f}ms p95={pct(idle, 95):7.2f}ms")
+    print(f"feed flooded: n={len(busy):5d} p50={pct(busy, 50):7.2f}ms p95={pct(busy, 95):7.2f}ms")
+    print(f"logins      : {dict(sorted(codes.items()))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=3.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+# bench/metrics_overhead.py
+"""Per-request cost of the /metrics instrumentation (middleware + engine events).
+
+    cd backend && python -m bench.metrics_overhead --requests 3000
+
+Settings are read at import, so each variant runs in its own subprocess
+against the same throwaway SQLite file, seeded through bench.dataset; the
+variants alternate for ``--rounds`` and each keeps its best. The app is
+called directly over ASGI (no sockets) with the response cache off, so every
+request reaches the database. End-to-end numbers on a busy machine swing by
+more than the instrumentation costs, so the middleware is also timed alone.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PATHS = ("/healthz", "/videos/1", "/videos/?limit=20")
+
+
+async def call(app, path: str) -> int:
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, n: int) -> float:
+    for _ in range(100):
+        assert await call(app, path) == 200, path  # warm-up
+    runs = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(n // 5):
+            await call(app, path)
+        runs.append((time.perf_counter() - t0) / (n // 5) * 1e6)
+    return statistics.median(runs)
+
+
+def child(n: int) -> None:
+    from app.main import app
+    print(json.dumps({path: asyncio.run(measure(app, path, n)) for path in PATHS}))
+
+
+async def middleware_only(n: int = 100_000) -> tuple[float, float]:
+    """MetricsMiddleware around an app that only starts a response: its own cost, free of DB noise."""
+    from fastapi import FastAPI
+    from app.metrics import MetricsMiddleware
+
+    routes = FastAPI()
+    routes.get("/videos/{video_id}")(lambda video_id: None)
+    scope = {"type": "http", "method": "GET", "path": "/videos/1"}
+
+    async def bare(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        pass
+
+    timings = []
+    for app in (bare, MetricsMiddleware(bare, routes=routes.routes)):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await app(scope, None, send)
+        timings.append((time.perf_counter() - t0) / n * 1e6)
+    return timings[0], timings[1]
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SECRET_KEY="bench", ENV="dev", DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                   STORAGE_BACKEND="memory", MEDIA_PROCESSING_ENABLED="false", RESPONSE_CACHE_ENABLED="false")
+        seed = ("from app.database import Base, SessionLocal, engine; from bench import dataset; "
+                "Base.metadata.create_all(bind=engine); "
+                "dataset.generate(SessionLocal(), users=50, videos=200, comments=2000, ratings=2000)")
+        subprocess.run([sys.executable, "-c", seed], env=env, check=True)
+        results = {"false": {}, "true": {}}
+        for _ in range(args.rounds):  # alternate, and keep each variant's best round
+            for enabled, best in results.items():
+                out = subprocess.run([sys.executable, "-m", "bench.metrics_overhead", "--child", "--requests", str(args.requests)],
+                                     env=dict(env, METRICS_ENABLED=enabled), check=True, stdout=subprocess.PIPE, text=True)
+                for path, us in json.loads(out.stdout.splitlines()[-1]).items():
+                    best[path] = min(us, best.get(path, us))
+    for path in PATHS:
+        off, on = results["false"][path], results["true"][path]
+        print(f"{path:18s} off {off:7.1f} us/req   on {on:7.1f} us/req   {on - off:+7.1f} us ({(on / off - 1) * 100:+.1f}%)")
+    bare, wrapped = asyncio.run(middleware_only())
+    print(f"middleware alone: {wrapped - bare:.1f} us/req")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.requests)
+    else:
+        main(args)
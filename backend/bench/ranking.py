@@ -0,0 +1,129 @@
+# bench/ranking.py
+"""Ranked feed page latency as the catalog grows (GET /videos?sort=trending).
+
+    cd backend && python -m bench.ranking --sizes 1000,10000,30000
+
+Each catalog size gets its own throwaway SQLite database, seeded through
+bench.dataset (5 comments and 5 ratings per video), in a subprocess, since
+settings are read at import. Reported per size:
+
+* the initial scoring (``ranking.rebuild`` and passes until caught up) and
+  one incremental pass after 100 new comments;
+* ranked pages over ASGI with the response cache off: the first page, a
+  cursor page from inside the snapshot and one halfway down the catalog,
+  past the snapshot (index keyset; n/a when the snapshot holds everything);
+* for comparison, the query a ranked page would need without the
+  materialized scores: decayed activity summed over all comments and ratings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.metrics_overhead import call
+
+
+async def timed(fn, n: int) -> float:
+    for _ in range(20):
+        await fn()  # warm-up
+    runs = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(n // 5):
+            await fn()
+        runs.append((time.perf_counter() - t0) / (n // 5) * 1e6)
+    return statistics.median(runs)
+
+
+def child(size: int, n: int) -> None:
+    from sqlalchemy import func, select, union_all
+
+    from app import models, ranking, utils
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from bench import dataset
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        dataset.generate(db, users=max(50, size // 20), videos=size, comments=size * 5, ratings=size * 5)
+        t0 = time.perf_counter()
+        ranking.rebuild(db)
+        while ranking.refresh_scores(db):
+            pass
+        build = time.perf_counter() - t0
+        db.execute(models.Comment.__table__.insert(), [
+            {"video_id": vid, "user_id": 1, "comment_text": "bench"} for vid in range(1, 101)])
+        db.commit()
+        t0 = time.perf_counter()
+        ranking.refresh_scores(db)
+        incremental = time.perf_counter() - t0
+
+        # what a page costs without video_scores: decay every event at request time
+        C, R = models.Comment, models.Rating
+        half_life = ranking.settings.RANKING_HALF_LIFE_HOURS / 24
+        events = union_all(select(C.video_id, C.created_at.label("at")), select(R.video_id, R.created_at.label("at"))).subquery()
+        naive = (select(events.c.video_id)
+                 .group_by(events.c.video_id)
+                 .order_by(func.sum(func.pow(2, (func.julianday(events.c.at) - func.julianday("now")) / half_life)).desc())
+                 .limit(20))
+        try:
+            db.execute(naive).all()
+            t0 = time.perf_counter()
+            for _ in range(3):
+                db.execute(naive).all()
+            naive_us = (time.perf_counter() - t0) / 3 * 1e6
+        except Exception:  # SQLite built without math functions
+            naive_us = None
+
+    async def run():
+        await ranking.reload_snapshots()
+        snapshot = ranking._snapshots["trending"]
+        inside = utils.encode_score_cursor(snapshot.scores[len(snapshot.ids) // 2], snapshot.ids[len(snapshot.ids) // 2])
+        result = {
+            "first": await timed(lambda: call(app, "/videos/?sort=trending&limit=20"), n),
+            "inside": await timed(lambda: call(app, f"/videos/?sort=trending&limit=20&cursor={inside}"), n),
+            "past": None,
+        }
+        with SessionLocal() as db:  # halfway down the catalog, well past the snapshot
+            deep = ranking.page_from_index(db, "trending", None, max(size // 2, len(snapshot.ids) + 20), 1)
+        if deep:
+            past = utils.encode_score_cursor(deep[0][1], deep[0][0])
+            result["past"] = await timed(lambda: call(app, f"/videos/?sort=trending&limit=20&cursor={past}"), n)
+        return result
+
+    pages = asyncio.run(run())
+    print(json.dumps({"size": size, "build_s": build, "incremental_ms": incremental * 1000, "naive_us": naive_us, **pages}))
+
+
+def main(args) -> None:
+    print(f"{'videos':>7} {'build':>8} {'+100 comments':>14} {'first page':>11} {'in snapshot':>12} {'past it':>9} {'no scores':>10}")
+    for size in map(int, args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SECRET_KEY="bench", ENV="dev", DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                       STORAGE_BACKEND="memory", MEDIA_PROCESSING_ENABLED="false", RESPONSE_CACHE_ENABLED="false",
+                       RANKING_SNAPSHOT_SIZE=str(args.snapshot))
+            out = subprocess.run([sys.executable, "-m", "bench.ranking", "--child", str(size), "--requests", str(args.requests)],
+                                 env=env, check=True, stdout=subprocess.PIPE, text=True)
+        r = json.loads(out.stdout.splitlines()[-1])
+        naive = f"{r['naive_us'] / 1000:8.1f}ms" if r["naive_us"] is not None else "       n/a"
+        past = f"{r['past']:7.0f}us" if r["past"] is not None else "      n/a"
+        print(f"{size:7d} {r['build_s']:7.2f}s {r['incremental_ms']:12.1f}ms "
+              f"{r['first']:9.0f}us {r['inside']:10.0f}us {past} {naive}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,30000")
+    parser.add_argument("--snapshot", type=int, default=1000, help="RANKING_SNAPSHOT_SIZE")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.requests)
+    else:
+        main(args)
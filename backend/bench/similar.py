@@ -0,0 +1,123 @@
+# bench/similar.py
+"""Similar-video lists as the catalog grows (GET /videos/{id}/similar).
+
+    cd backend && python -m bench.similar --sizes 1000,10000,30000
+
+Each catalog size gets its own throwaway SQLite database, seeded through
+bench.dataset (10 ratings per video, a user per 5 videos), in a subprocess,
+since settings are read at import. Reported per size:
+
+* the full build (first pass: every list, vectorized with numpy/scipy);
+* one pass after 100 rating changes on random videos through
+  ``crud.upsert_rating``, and how many lists it rewrote (``*``: it rebuilt);
+* the endpoint over ASGI with the response cache off;
+* for comparison, the same cosine top-K as a pure-Python loop over each
+  user's rated pairs, given ``--python-budget`` seconds (then extrapolated
+  from the share of pairs it got through).
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bench.metrics_overhead import call
+from bench.ranking import timed
+
+
+def python_lists(rows, k: int, min_common: int, budget: float):
+    """The double loop the vectorized passes replace; returns (seconds, share of user pairs done)."""
+    t0 = time.perf_counter()
+    by_user, norm2 = defaultdict(list), defaultdict(float)
+    for user, video, stars in rows:
+        by_user[user].append((video, stars))
+        norm2[video] += stars * stars
+    total = sum(len(r) * (len(r) - 1) for r in by_user.values()) or 1
+    dot, common, done = defaultdict(float), defaultdict(int), 0
+    for rated in by_user.values():
+        for a, sa in rated:
+            for b, sb in rated:
+                if a != b:
+                    dot[a, b] += sa * sb
+                    common[a, b] += 1
+        done += len(rated) * (len(rated) - 1)
+        if time.perf_counter() - t0 > budget:
+            return (time.perf_counter() - t0) * total / done, done / total
+    best = defaultdict(list)
+    for (a, b), d in dot.items():
+        if common[a, b] >= min_common:
+            heapq.heappush(best[a], (d / math.sqrt(norm2[a] * norm2[b]), b))
+            if len(best[a]) > k:
+                heapq.heappop(best[a])
+    return time.perf_counter() - t0, 1.0
+
+
+def child(size: int, n: int, budget: float) -> None:
+    from app import crud, models, similar
+    from app.database import Base, SessionLocal, engine, write_now
+    from app.main import app
+    from bench import dataset
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        data = dataset.generate(db, users=max(50, size // 5), videos=size, comments=0, ratings=size * 10)
+        rows = db.query(models.Rating.user_id, models.Rating.video_id, models.Rating.rating).all()
+        t0 = time.perf_counter()
+        similar.refresh_lists(db)
+        build = time.perf_counter() - t0
+
+        # move the watermark past the seeding, then change 100 ratings
+        past = datetime.utcnow() - timedelta(hours=1)
+        db.query(models.SimilarState).update({models.SimilarState.stats_seen_at: past})
+        db.query(models.VideoRatingStats).update({models.VideoRatingStats.updated_at: past})
+        db.commit()
+        rng = random.Random(0)
+        for _ in range(100):  # long-tail videos: a popular one's raters reach most lists, and the pass rebuilds
+            crud.upsert_rating(db, rng.choice(data.video_ids), rng.choice(data.user_ids), rng.randint(1, 5))
+        t0 = time.perf_counter()
+        version, lists, rebuilt, seen_at = similar.compute(db)
+        write_now(similar.store, version, lists, rebuilt, seen_at)
+        incremental = time.perf_counter() - t0
+        popular = data.pick_video(rng)
+
+    python_s, python_share = python_lists(rows, similar.settings.SIMILAR_NEIGHBORS,
+                                          similar.settings.SIMILAR_MIN_COMMON_RATERS, budget)
+    page = asyncio.run(timed(lambda: call(app, f"/videos/{popular}/similar?limit=10"), n))
+    print(json.dumps({"size": size, "ratings": len(rows), "build_s": build, "incremental_ms": incremental * 1000,
+                      "rewritten": len(lists), "rebuilt": rebuilt, "page_us": page, "python_s": python_s, "python_share": python_share}))
+
+
+def main(args) -> None:
+    print(f"{'videos':>7} {'ratings':>8} {'build':>8} {'+100 ratings':>13} {'lists':>6} {'endpoint':>9} {'python loop':>12}")
+    for size in map(int, args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SECRET_KEY="bench", ENV="dev", DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+                       STORAGE_BACKEND="memory", MEDIA_PROCESSING_ENABLED="false", RESPONSE_CACHE_ENABLED="false")
+            out = subprocess.run([sys.executable, "-m", "bench.similar", "--child", str(size), "--requests", str(args.requests),
+                                  "--python-budget", str(args.python_budget)],
+                                 env=env, check=True, stdout=subprocess.PIPE, text=True)
+        r = json.loads(out.stdout.splitlines()[-1])
+        python = f"{r['python_s']:8.1f}s" + ("" if r["python_share"] == 1 else " ~")
+        print(f"{size:7d} {r['ratings']:8d} {r['build_s']:7.2f}s {r['incremental_ms']:11.0f}ms {r['rewritten']:6d}{'*' if r['rebuilt'] else ' '}"
+              f"{r['page_us']:7.0f}us {python:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,30000")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--python-budget", type=float, default=30, help="seconds before the pure-Python loop is extrapolated")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.requests, args.python_budget)
+    else:
+        main(args)
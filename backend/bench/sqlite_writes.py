@@ -0,0 +1,99 @@
+# bench/sqlite_writes.py
+"""Rating/comment write throughput on SQLite: default vs ``SQLITE_TUNED``.
+
+    cd backend && python -m bench.sqlite_writes --concurrency 100 --duration 5
+
+Each mode runs in its own subprocess against a fresh file DB (the engines are
+built at import time). Clients PUT ratings and POST comments as random users;
+``--write-mix`` is the share of ratings. In tuned mode the writer's batch
+counters show how many writes each commit carried.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def pct(samples, p):
+    return statistics.quantiles(samples, n=100)[p - 1] * 1000 if len(samples) > 1 else float("nan")
+
+
+async def run_worker(args):
+    import httpx
+    from app import database, models, utils
+    from app.database import SessionLocal
+    from app.main import app
+
+    db = SessionLocal()
+    users = [models.User(email=f"w{i}@example.com", username=f"w{i}", hashed_password="!") for i in range(args.users)]
+    db.add_all(users); db.commit()
+    db.add_all(models.Video(title=f"video {i}", creator_id=users[0].user_id) for i in range(args.videos))
+    db.commit()
+    tokens = [{"Authorization": "Bearer " + utils.create_access_token({"sub": str(u.user_id)})} for u in users]
+    db.close()
+
+    latencies, errors = [], 0
+    stop = time.perf_counter() + args.duration
+
+    async def client_loop(client):
+        nonlocal errors
+        while time.perf_counter() < stop:
+            video_id, headers = random.randint(1, args.videos), random.choice(tokens)
+            t0 = time.perf_counter()
+            if random.random() < args.write_mix:
+                r = await client.put(f"/videos/{video_id}/ratings/", json={"rating": random.randint(1, 5)}, headers=headers)
+            else:
+                r = await client.post(f"/videos/{video_id}/comments/", json={"comment_text": "nice"}, headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code >= 400
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await database.dispose_engines()
+    mode = "tuned" if database.write_queue is not None else "default"
+    line = (f"{mode:7s}: {len(latencies) / elapsed:8.1f} writes/s  p50={pct(latencies, 50):7.2f}ms "
+            f"p95={pct(latencies, 95):7.2f}ms p99={pct(latencies, 99):7.2f}ms errors={errors}")
+    if database.write_queue is not None:
+        s = database.write_queue.stats()
+        line += f"  commits={s['batches']} avg_batch={s['jobs'] / max(s['batches'], 1):.1f} max_batch={s['largest_batch']}"
+    print(line)
+
+
+def main(args):
+    for mode in ("default", "tuned"):
+        tmp = tempfile.mkdtemp(prefix="bench-")
+        env = {
+            **os.environ,
+            "SECRET_KEY": "bench", "ENV": "dev",
+            "LOCAL_DEV_UPLOAD_DIR": f"{tmp}/uploads",
+            "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+            "SQLITE_TUNED": "true" if mode == "tuned" else "false",
+        }
+        cmd = [sys.executable, "-m", "bench.sqlite_writes", "--worker",
+               "--concurrency", str(args.concurrency), "--duration", str(args.duration),
+               "--videos", str(args.videos), "--users", str(args.users), "--write-mix", str(args.write_mix)]
+        subprocess.run(cmd, env=env, check=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--write-mix", type=float, default=0.7, help="share of writes that are ratings (rest are comments)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        asyncio.run(run_worker(args))
+    else:
+        main(args)
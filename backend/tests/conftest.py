@@ -0,0 +1,54 @@
+# tests/conftest.py
+"""Shared fixtures: the app on a throwaway SQLite database and upload dir.
+
+Settings are read at import, so the environment is set up before ``app`` is
+imported. Run from backend/: ``python -m pytest``.
+"""
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="video-app-tests-")
+os.environ.update(
+    ENV="dev",
+    SECRET_KEY="test-secret",
+    DATABASE_URL=f"sqlite:///{_tmp}/test.db",
+    LOCAL_DEV_UPLOAD_DIR=f"{_tmp}/uploads",
+    UPLOAD_STAGING_DIR=f"{_tmp}/upload-staging",
+    RESPONSE_CACHE_ENABLED="false",  # every request runs its queries
+    MEDIA_PROCESSING_ENABLED="false",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models, utils  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def creator(db):
+    n = db.query(models.User).count()
+    user = models.User(email=f"creator{n}@example.com", username=f"creator{n}", hashed_password="x", role=models.UserRole.creator)
+    db.add(user); db.commit(); db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def creator_auth(creator):
+    return {"Authorization": f"Bearer {utils.create_access_token({'sub': str(creator.user_id)})}"}
@@ -0,0 +1,52 @@
+# tests/fake_blob.py
+"""In-memory stand-ins for the Azure ``ContainerClient``/``BlobClient`` block API."""
+import threading
+import time
+
+
+class FakeBlobClient:
+    def __init__(self, container: "FakeContainerClient", name: str):
+        self.container, self.name = container, name
+
+    def stage_block(self, block_id: str, data: bytes) -> None:
+        c = self.container
+        with c.lock:
+            c.in_flight += 1
+            c.max_in_flight = max(c.max_in_flight, c.in_flight)
+        try:
+            time.sleep(c.delay(block_id) if callable(c.delay) else c.delay)
+            if block_id == c.fail_on_block:
+                raise IOError(f"injected failure staging block {block_id}")
+            with c.lock:
+                c.staged.setdefault(self.name, {})[block_id] = bytes(data)
+                c.finished.append(block_id)
+        finally:
+            with c.lock:
+                c.in_flight -= 1
+
+    def commit_block_list(self, block_list, content_settings=None) -> None:
+        c = self.container
+        with c.lock:
+            staged = c.staged.pop(self.name, {})
+            c.commits.append((self.name, list(block_list)))
+            c.blobs[self.name] = b"".join(staged[block_id] for block_id in block_list)  # KeyError: block never staged
+
+
+class FakeContainerClient:
+    """Blocks are kept per blob until ``commit_block_list`` joins them, in list order, into ``blobs``.
+
+    ``delay`` (seconds, or a function of the block id) slows ``stage_block``;
+    ``fail_on_block`` makes staging that block raise.
+    """
+
+    def __init__(self, delay=0.0, fail_on_block: str | None = None):
+        self.delay, self.fail_on_block = delay, fail_on_block
+        self.lock = threading.Lock()
+        self.staged: dict[str, dict[str, bytes]] = {}
+        self.blobs: dict[str, bytes] = {}
+        self.commits: list[tuple[str, list[str]]] = []
+        self.finished: list[str] = []  # block ids in the order staging completed
+        self.in_flight = self.max_in_flight = 0
+
+    def get_blob_client(self, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self, blob)
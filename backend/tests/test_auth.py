@@ -0,0 +1,36 @@
+# tests/test_auth.py
+import pytest
+
+from app import crud
+from app.database import Database
+
+
+@pytest.fixture
+def lagging_replica(monkeypatch):
+    """Reads through ``db.run`` don't see users yet, as on a replica that hasn't caught up."""
+    run = Database.run
+
+    async def stale(self, fn, /, *args, **kwargs):
+        if fn in (crud.get_user_by_email, crud.get_user_by_username):
+            return None
+        return await run(self, fn, *args, **kwargs)
+
+    monkeypatch.setattr(Database, "run", stale)
+
+
+def test_login_right_after_register(client, lagging_replica):
+    user = {"email": "fresh@example.com", "username": "fresh", "password": "password1"}
+    assert client.post("/auth/register", json=user).status_code == 200
+    r = client.post("/auth/login", data={"username": user["email"], "password": user["password"]})
+    assert r.status_code == 200, r.text
+
+
+def test_double_submitted_register_is_rejected(client, lagging_replica, monkeypatch):
+    user = {"email": "twice@example.com", "username": "twice", "password": "password1"}
+    assert client.post("/auth/register", json=user).status_code == 200
+    assert client.post("/auth/register", json=user).status_code == 400
+    # both checks passed before the first insert committed
+    monkeypatch.setattr(crud, "get_user_by_email", lambda db, email: None)
+    monkeypatch.setattr(crud, "get_user_by_username", lambda db, username: None)
+    r = client.post("/auth/register", json=user)
+    assert r.status_code == 400, r.text
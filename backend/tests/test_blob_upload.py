@@ -0,0 +1,75 @@
+# tests/test_blob_upload.py
+import asyncio
+import io
+import os
+
+import pytest
+
+from app.blob_upload import upload_in_blocks
+from fake_blob import FakeContainerClient
+
+
+class Source:
+    """Async reader over bytes that records how much was read before each block finished staging."""
+
+    def __init__(self, data: bytes, container: FakeContainerClient):
+        self.buf, self.container = io.BytesIO(data), container
+        self.reads = 0
+        self.max_unstaged = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self.buf.read(size)
+        if chunk:
+            self.reads += 1
+            with self.container.lock:
+                finished = sum(len(blocks) for blocks in self.container.staged.values())
+            self.max_unstaged = max(self.max_unstaged, self.reads - finished)
+        return chunk
+
+
+def upload(container, data: bytes, chunk_size: int, max_concurrency: int, source=None):
+    source = source or Source(data, container)
+    return asyncio.run(upload_in_blocks(container.get_blob_client("clip.mp4"), source,
+                                        chunk_size=chunk_size, max_concurrency=max_concurrency))
+
+
+def test_blocks_are_committed_in_source_order_with_fixed_width_ids():
+    data = os.urandom(10_000)
+    # later blocks finish first, so staging completes out of order
+    container = FakeContainerClient(delay=lambda block_id: 0.02 / (int(block_id) + 1))
+    assert upload(container, data, chunk_size=1024, max_concurrency=4) == len(data)
+
+    (name, block_list), = container.commits
+    assert block_list == [f"{i:08d}" for i in range(10)]
+    assert container.finished != block_list  # staging did finish out of order
+    assert container.blobs["clip.mp4"] == data
+
+
+def test_empty_source_commits_an_empty_blob():
+    container = FakeContainerClient()
+    assert upload(container, b"", chunk_size=1024, max_concurrency=4) == 0
+    assert container.commits == [("clip.mp4", [])]
+    assert container.blobs["clip.mp4"] == b""
+
+
+def test_at_most_max_concurrency_blocks_are_held_in_memory():
+    data = os.urandom(64 * 1024)
+    container = FakeContainerClient(delay=0.005)
+    source = Source(data, container)
+    upload(container, data, chunk_size=1024, max_concurrency=3, source=source)
+
+    assert container.max_in_flight == 3
+    assert source.max_unstaged <= 3  # chunks read but not yet staged: memory ~ chunk_size * max_concurrency
+    assert container.blobs["clip.mp4"] == data
+
+
+def test_failed_block_aborts_without_commit_or_reading_the_rest():
+    data = os.urandom(200 * 1024)
+    container = FakeContainerClient(delay=0.005, fail_on_block="00000003")
+    source = Source(data, container)
+    with pytest.raises(IOError, match="00000003"):
+        upload(container, data, chunk_size=1024, max_concurrency=2, source=source)
+
+    assert container.commits == []
+    assert "clip.mp4" not in container.blobs
+    assert source.reads < 200
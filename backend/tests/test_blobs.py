@@ -0,0 +1,63 @@
+# tests/test_blobs.py
+import pytest
+
+from app import crud, models, utils
+
+
+def _upload(client, headers, body: bytes) -> dict:
+    r = client.post("/videos/", data={"title": "clip"}, files={"file": ("clip.mp4", body, "video/mp4")}, headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+def test_deleting_a_video_pointed_at_someone_elses_blob_keeps_the_file(client, db, creator, creator_auth):
+    mallory = models.User(email="mallory@example.com", username="mallory", hashed_password="x", role=models.UserRole.creator)
+    db.add(mallory); db.commit()
+    mallory_auth = {"Authorization": f"Bearer {utils.create_access_token({'sub': str(mallory.user_id)})}"}
+
+    mine = _upload(client, creator_auth, b"creator's video")
+    theirs = _upload(client, mallory_auth, b"mallory's video")
+    r = client.put(f"/videos/{theirs['video_id']}", json={"blob_uri": mine["blob_uri"]}, headers=mallory_auth)
+    assert r.status_code == 200
+    assert client.delete(f"/videos/{theirs['video_id']}", headers=mallory_auth).status_code == 204
+
+    r = client.get(f"/videos/{mine['video_id']}/stream")
+    assert r.status_code == 200
+    assert r.content == b"creator's video"
+    assert db.query(models.Blob).filter_by(blob_uri=mine["blob_uri"]).one().refcount == 1
+
+
+def test_deleting_the_last_video_on_a_blob_removes_the_file(client, db, creator_auth):
+    video = _upload(client, creator_auth, b"short-lived")
+    assert client.delete(f"/videos/{video['video_id']}", headers=creator_auth).status_code == 204
+    assert db.query(models.Blob).filter_by(blob_uri=video["blob_uri"]).count() == 0
+    assert client.get(video["blob_uri"]).status_code == 404
+
+
+def test_deleting_a_creator_removes_their_videos_with_the_files(client, db, creator, creator_auth):
+    admin = models.User(email="admin@example.com", username="admin", hashed_password="x", role=models.UserRole.admin)
+    db.add(admin); db.commit()
+    admin_auth = {"Authorization": f"Bearer {utils.create_access_token({'sub': str(admin.user_id)})}"}
+    video = _upload(client, creator_auth, b"the creator's only video")
+    assert client.post(f"/videos/{video['video_id']}/comments", json={"comment_text": "nice"}, headers=admin_auth).status_code == 201
+
+    assert client.delete(f"/users/{creator.user_id}", headers=admin_auth).status_code == 204
+    assert client.get(f"/videos/{video['video_id']}").status_code == 404
+    assert video["video_id"] not in [v["video_id"] for v in client.get("/videos/", params={"limit": 100}).json()]
+    assert db.query(models.Comment).filter_by(video_id=video["video_id"]).count() == 0
+    assert db.query(models.Blob).filter_by(blob_uri=video["blob_uri"]).count() == 0
+    assert client.get(video["blob_uri"]).status_code == 404
+
+
+def test_a_failed_insert_removes_the_transferred_file(client, creator_auth, monkeypatch):
+    stored = []
+
+    def fail(db, *, blob_url, **kwargs):
+        stored.append(blob_url)
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(crud, "create_video", fail)
+    with pytest.raises(RuntimeError):
+        client.post("/videos/", data={"title": "clip"}, files={"file": ("clip.mp4", b"never indexed", "video/mp4")},
+                    headers=creator_auth)
+    assert stored[0] and client.get(stored[0]).status_code == 404
@@ -0,0 +1,51 @@
+# tests/test_comments.py
+import json
+from datetime import datetime
+
+import pytest
+
+from app import models, utils
+
+
+@pytest.fixture
+def thread(db, creator):
+    video = models.Video(title="talked about", creator_id=creator.user_id)
+    db.add(video); db.flush()
+    at = datetime(2026, 1, 1)
+    # pairs share a timestamp, so pages must break ties on comment_id
+    db.add_all(models.Comment(video_id=video.video_id, user_id=creator.user_id, comment_text=f"#{i}", created_at=at.replace(minute=i // 2))
+               for i in range(7))
+    db.commit()
+    return video
+
+
+def _auth(db, role: models.UserRole) -> dict:
+    n = db.query(models.User).count()
+    user = models.User(email=f"{role.value}{n}@example.com", username=f"{role.value}{n}", hashed_password="x", role=role)
+    db.add(user); db.commit()
+    return {"Authorization": f"Bearer {utils.create_access_token({'sub': str(user.user_id)})}"}
+
+
+def test_cursor_pages_cover_every_comment_once(client, thread):
+    pages, cursor = [], None
+    while True:
+        r = client.get(f"/videos/{thread.video_id}/comments/", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        pages.append([c["comment_text"] for c in r.json()])
+        cursor = r.headers.get(utils.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert sum(pages, []) == [f"#{i}" for i in (6, 5, 4, 3, 2, 1, 0)]
+
+
+def test_export_is_for_admins(client, db, thread):
+    url = f"/videos/{thread.video_id}/comments/export"
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=_auth(db, models.UserRole.creator)).status_code == 403
+
+    admin = _auth(db, models.UserRole.admin)
+    r = client.get(url, headers=admin)
+    assert r.status_code == 200
+    assert [json.loads(line)["comment_text"] for line in r.text.splitlines()] == [f"#{i}" for i in (6, 5, 4, 3, 2, 1, 0)]
+    assert client.get("/videos/999999/comments/export", headers=admin).status_code == 404
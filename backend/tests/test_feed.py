@@ -0,0 +1,36 @@
+# tests/test_feed.py
+import pytest
+from sqlalchemy import insert
+
+from app import crud, models
+from app.sql_profiler import query_budget
+
+
+@pytest.fixture
+def catalog(db, creator):
+    """60 videos, each with two comments and a rating from its creator."""
+    db.execute(insert(models.Video), [{"title": f"video {i}", "creator_id": creator.user_id} for i in range(60)])
+    db.commit()
+    video_ids = [vid for (vid,) in db.query(models.Video.video_id).filter(models.Video.creator_id == creator.user_id)]
+    db.execute(insert(models.Comment), [{"video_id": vid, "user_id": creator.user_id, "comment_text": "nice"}
+                                        for vid in video_ids for _ in range(2)])
+    db.commit()
+    for vid in video_ids:
+        crud.upsert_rating(db, vid, creator.user_id, 4)
+    return video_ids
+
+
+@pytest.mark.parametrize("limit", [10, 50])
+def test_expanded_feed_page_is_one_query(client, catalog, limit):
+    with query_budget(1) as profile:
+        r = client.get(f"/videos/?expand=creator,stats&limit={limit}")
+    assert r.status_code == 200
+    assert profile.count == 1  # the same at any page size: no per-row creator/stats lookups
+    page = r.json()
+    assert len(page) == limit
+    assert all(v["creator"]["username"] and v["stats"]["rating_count"] == 1 and v["stats"]["comment_count"] == 2 for v in page)
+
+
+@pytest.mark.parametrize("params, status", [({"limit": 100}, 200), ({"limit": 101}, 422), ({"limit": 0}, 422), ({"skip": -1}, 422)])
+def test_feed_page_size_is_bounded(client, params, status):
+    assert client.get("/videos/", params=params).status_code == status
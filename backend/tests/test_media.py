@@ -0,0 +1,115 @@
+# tests/test_media.py
+import asyncio
+import hashlib
+import struct
+from pathlib import Path
+
+import pytest
+
+from app import media, models, processing
+from app.settings import settings
+
+CHUNKS = [b"frame-one" * 10, b"frame-two" * 10]
+
+
+def box(kind: bytes, *parts: bytes) -> bytes:
+    body = b"".join(parts)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def moov(offsets: list[int], table: bytes = b"stco") -> bytes:
+    """A one-track moov: 10 s at 1000/s, 1280x720, chunks at ``offsets``."""
+    mvhd = box(b"mvhd", bytes(12), struct.pack(">II", 1000, 10_000), bytes(80))
+    tkhd = box(b"tkhd", bytes(76), struct.pack(">II", 1280 << 16, 720 << 16))
+    hdlr = box(b"hdlr", bytes(8), b"vide", bytes(13))
+    fmt = ">I" if table == b"stco" else ">Q"
+    offsets_table = box(table, struct.pack(">4sI", bytes(4), len(offsets)), *(struct.pack(fmt, o) for o in offsets))
+    stbl = box(b"stbl", box(b"stsd", bytes(8)), offsets_table)
+    return box(b"moov", mvhd, box(b"trak", tkhd, box(b"mdia", hdlr, box(b"minf", stbl))))
+
+
+def chunk_offsets(data: bytes) -> tuple[bytes, list[int]]:
+    """The kind and entries of the first stco/co64 table in ``data``."""
+    for kind, fmt in ((b"stco", ">I"), (b"co64", ">Q")):
+        at = data.find(kind)
+        if at >= 0:
+            (count,) = struct.unpack_from(">I", data, at + 8)
+            width = struct.calcsize(fmt)
+            return kind, [struct.unpack_from(fmt, data, at + 12 + i * width)[0] for i in range(count)]
+    raise AssertionError("no chunk offset table")
+
+
+def moov_at_end() -> bytes:
+    ftyp = box(b"ftyp", b"isom", bytes(4), b"isomavc1")
+    mdat_at = len(ftyp)
+    offsets = [mdat_at + 8, mdat_at + 8 + len(CHUNKS[0])]
+    return ftyp + box(b"mdat", *CHUNKS) + moov(offsets)
+
+
+def test_faststart_moves_moov_forward_and_shifts_offsets(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(moov_at_end())
+
+    info = media.process_file(str(path))
+
+    data = path.read_bytes()
+    with path.open("rb") as f:
+        kinds = [a.kind for a in media.top_level_atoms(f, len(data))]
+    assert kinds == [b"ftyp", b"moov", b"mdat"]
+    kind, offsets = chunk_offsets(data)
+    assert kind == b"stco"
+    assert [data[o:o + len(c)] for o, c in zip(offsets, CHUNKS)] == CHUNKS
+    assert info.faststart_applied
+    assert (info.duration_seconds, info.width, info.height) == (10.0, 1280, 720)
+    assert (info.size_bytes, info.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert info.bitrate == len(data) * 8 // 10
+
+
+def test_offsets_past_4_gib_widen_stco_to_co64():
+    # moov sits behind 8 GiB of mdat: chunks near 4 GiB no longer fit 32 bits once shifted
+    original = moov([100, 0xFFFFFF00])
+    patched = media._faststart_moov(original, insert_at=32, moov_at=8 << 30)
+
+    assert len(patched) == len(original) + 8  # two entries, 4 more bytes each
+    assert chunk_offsets(patched) == (b"co64", [100 + len(patched), 0xFFFFFF00 + len(patched)])
+    assert media.probe_moov(bytes(patched)) == media.probe_moov(original)  # parents resized consistently
+
+
+def test_offsets_that_fit_keep_stco():
+    original = moov([100, 200])
+    patched = media._faststart_moov(original, insert_at=32, moov_at=1000)
+    assert chunk_offsets(patched) == (b"stco", [100 + len(original), 200 + len(original)])
+
+
+def test_already_faststart_file_is_left_alone(tmp_path):
+    ftyp = box(b"ftyp", b"isom", bytes(4), b"isomavc1")
+    head = ftyp + moov([0, 0])
+    original = head + box(b"mdat", *CHUNKS)
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(original)
+    stat = path.stat()
+
+    info = media.process_file(str(path))
+
+    assert not info.faststart_applied
+    assert path.read_bytes() == original
+    assert (path.stat().st_ino, path.stat().st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns)
+    assert info.sha256 == hashlib.sha256(original).hexdigest()
+
+
+@pytest.mark.parametrize("body", [
+    moov_at_end()[:-20],  # moov cut short
+    box(b"ftyp", b"isom") + struct.pack(">I4s", 4096, b"mdat") + b"garbage",  # mdat claims more than there is
+])
+def test_broken_file_fails_the_video(db, creator, body):
+    key = f"broken-{hashlib.sha256(body).hexdigest()[:8]}.mp4"
+    Path(settings.LOCAL_DEV_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    Path(settings.LOCAL_DEV_UPLOAD_DIR, key).write_bytes(body)
+    video = models.Video(title="broken", creator_id=creator.user_id, blob_uri=f"/static/{key}")
+    db.add(video); db.commit()
+
+    asyncio.run(processing.process_video(video.video_id))
+
+    db.refresh(video)
+    assert video.processing_status == processing.FAILED
+    assert Path(settings.LOCAL_DEV_UPLOAD_DIR, key).read_bytes() == body
@@ -0,0 +1,33 @@
+# tests/test_principals.py
+import pytest
+
+from app import models, principals, utils
+
+
+@pytest.fixture
+def admins(db):
+    n = db.query(models.User).count()
+    users = [models.User(email=f"staff{n + i}@example.com", username=f"staff{n + i}", hashed_password="x",
+                         role=models.UserRole.admin) for i in range(2)]
+    db.add_all(users); db.commit()
+    return [(u, {"Authorization": f"Bearer {utils.create_access_token({'sub': str(u.user_id)})}"}) for u in users]
+
+
+def test_demotion_applies_to_the_next_request(client, admins):
+    (demoted, demoted_auth), (_, admin_auth) = admins
+    assert client.get("/users/", headers=demoted_auth).status_code == 200
+    assert principals.get_principal(demoted.user_id).role == models.UserRole.admin  # warm
+
+    r = client.put(f"/users/{demoted.user_id}", json={"email": demoted.email, "display_name": None, "role": "consumer"},
+                   headers=admin_auth)
+    assert r.status_code == 200
+    assert client.get("/users/", headers=demoted_auth).status_code == 403
+
+
+def test_deletion_applies_to_the_next_request(client, admins):
+    (deleted, deleted_auth), (_, admin_auth) = admins
+    assert client.get("/auth/me", headers=deleted_auth).status_code == 200
+    assert principals.get_principal(deleted.user_id) is not None  # warm
+
+    assert client.delete(f"/users/{deleted.user_id}", headers=admin_auth).status_code == 204
+    assert client.get("/auth/me", headers=deleted_auth).status_code == 401
@@ -0,0 +1,65 @@
+# tests/test_ranking.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import models, ranking
+
+
+def _catch_up(db, now):
+    while ranking.refresh_scores(db, now=now):
+        pass
+
+
+def _trending(db, video_id: int) -> float:
+    db.expire_all()
+    return db.get(models.VideoScore, video_id).trending
+
+
+def _comment(db, comment_id: int, video: models.Video, at: datetime):
+    db.add(models.Comment(comment_id=comment_id, video_id=video.video_id, user_id=video.creator_id,
+                          comment_text="hi", created_at=at))
+    db.commit()
+
+
+@pytest.fixture
+def video(db, creator):
+    video = models.Video(title="ranked", creator_id=creator.user_id)
+    db.add(video); db.commit()
+    return video
+
+
+def test_comment_committing_behind_the_watermark_is_counted_once(db, video):
+    now = datetime.utcnow()
+    _catch_up(db, now)
+    before = _trending(db, video.video_id)
+    first = (db.query(func.max(models.Comment.comment_id)).scalar() or 0) + 1
+
+    _comment(db, first + 1, video, now)  # the later id commits first
+    ranking.refresh_scores(db, now=now)
+    assert db.get(models.RankingState, 1).late_ids["comment"].keys() == {str(first)}
+
+    _comment(db, first, video, now)
+    ranking.refresh_scores(db, now=now + timedelta(seconds=1))
+    ranking.refresh_scores(db, now=now + timedelta(seconds=2))
+
+    stamp = ranking._stamp(now, ranking.WEIGHTS["comment"])
+    assert _trending(db, video.video_id) == pytest.approx(ranking._log2_add(ranking._log2_add(before, stamp), stamp))
+    assert db.get(models.RankingState, 1).late_ids["comment"] == {}
+
+
+def test_skipped_id_is_given_up_after_the_overlap(db, video):
+    now = datetime.utcnow()
+    _catch_up(db, now)
+    first = (db.query(func.max(models.Comment.comment_id)).scalar() or 0) + 1
+
+    _comment(db, first + 1, video, now)  # `first` rolled back and never commits
+    ranking.refresh_scores(db, now=now)
+    ranking.refresh_scores(db, now=now + ranking.OVERLAP)
+    db.expire_all()
+    assert db.get(models.RankingState, 1).late_ids["comment"].keys() == {str(first)}
+
+    ranking.refresh_scores(db, now=now + ranking.OVERLAP + timedelta(seconds=1))
+    db.expire_all()
+    assert db.get(models.RankingState, 1).late_ids["comment"] == {}
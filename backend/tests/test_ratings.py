@@ -0,0 +1,36 @@
+# tests/test_ratings.py
+from sqlalchemy import event, insert
+
+from app import crud, models
+
+
+def _user(db, name: str) -> models.User:
+    user = models.User(email=f"{name}@example.com", username=name, hashed_password="x", role=models.UserRole.consumer)
+    db.add(user); db.commit()
+    return user
+
+
+def test_first_ratings_racing_to_seed_the_stats_row(db, creator):
+    video = models.Video(title="clip", creator_id=creator.user_id)
+    db.add(video); db.commit()
+    alice, bob = _user(db, "alice"), _user(db, "bob")
+
+    def bob_seeds_first(state):
+        # bob's first rating commits its seed right after our stats UPDATE found no row
+        if not (state.is_update and state.statement.table.name == "video_rating_stats"):
+            return None
+        event.remove(db, "do_orm_execute", bob_seeds_first)
+        result = state.invoke_statement()
+        conn = state.session.connection()
+        conn.execute(insert(models.Rating).values(video_id=video.video_id, user_id=bob.user_id, rating=3))
+        conn.execute(insert(models.VideoRatingStats).values(video_id=video.video_id, rating_sum=3, rating_count=1,
+                                                            stars_1=0, stars_2=0, stars_3=1, stars_4=0, stars_5=0))
+        return result
+
+    event.listen(db, "do_orm_execute", bob_seeds_first)
+    crud.upsert_rating(db, video.video_id, alice.user_id, 5)
+
+    db.expire_all()
+    summary = crud.rating_summary(db, video.video_id)
+    assert (summary["count"], summary["average"]) == (2, 4.0)
+    assert summary["histogram"] == {1: 0, 2: 0, 3: 1, 4: 0, 5: 1}
@@ -0,0 +1,114 @@
+# tests/test_response_cache.py
+import pytest
+
+from app import models, response_cache, utils
+from app.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "_backend", response_cache.LocalBackend())
+
+
+@pytest.fixture
+def video(db, creator):
+    video = models.Video(title="cached", creator_id=creator.user_id)
+    db.add(video); db.commit()
+    return video
+
+
+@pytest.fixture
+def viewer_auth(db):
+    n = db.query(models.User).count()
+    user = models.User(email=f"viewer{n}@example.com", username=f"viewer{n}", hashed_password="x")
+    db.add(user); db.commit()
+    return {"Authorization": f"Bearer {utils.create_access_token({'sub': str(user.user_id)})}"}
+
+
+def _warm(client, url: str):
+    assert client.get(url).headers["X-Cache"] == "MISS"
+    r = client.get(url)
+    assert r.headers["X-Cache"] == "HIT"
+    return r
+
+
+def _feed_item(r, video_id: int) -> dict:
+    return next(v for v in r.json() if v["video_id"] == video_id)
+
+
+def test_if_none_match_gets_a_304(client, video):
+    url = f"/videos/{video.video_id}"
+    etag = _warm(client, url).headers["ETag"]
+
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert (r.status_code, r.content, r.headers["ETag"]) == (304, b"", etag)
+    assert client.get(url, headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_video_update_refreshes_its_routes(client, video, creator_auth):
+    urls = [f"/videos/{video.video_id}", "/videos/?limit=100", f"/videos/{video.video_id}/similar"]
+    for url in urls:
+        _warm(client, url)
+
+    assert client.put(f"/videos/{video.video_id}", json={"title": "renamed"}, headers=creator_auth).status_code == 200
+    assert [client.get(url).headers["X-Cache"] for url in urls] == ["MISS"] * len(urls)
+    assert client.get(urls[0]).json()["title"] == "renamed"
+    assert _feed_item(client.get(urls[1]), video.video_id)["title"] == "renamed"
+
+
+def test_video_delete_refreshes_its_routes(client, video, creator_auth):
+    summary = f"/videos/{video.video_id}/ratings/summary"
+    for url in (f"/videos/{video.video_id}", "/videos/?limit=100", summary):
+        _warm(client, url)
+
+    assert client.delete(f"/videos/{video.video_id}", headers=creator_auth).status_code == 204
+    assert client.get(f"/videos/{video.video_id}").status_code == 404
+    feed = client.get("/videos/?limit=100")
+    assert feed.headers["X-Cache"] == "MISS"
+    assert video.video_id not in [v["video_id"] for v in feed.json()]
+    assert client.get(summary).headers["X-Cache"] == "MISS"
+
+
+def test_comments_refresh_the_expanded_feed(client, video, viewer_auth):
+    feed = "/videos/?limit=100&expand=stats"
+    _warm(client, feed)
+
+    r = client.post(f"/videos/{video.video_id}/comments/", json={"comment_text": "first"}, headers=viewer_auth)
+    assert r.status_code == 201
+    r = client.get(feed)
+    assert r.headers["X-Cache"] == "MISS"
+    assert _feed_item(r, video.video_id)["stats"]["comment_count"] == 1
+
+    assert client.get(feed).headers["X-Cache"] == "HIT"
+    comment_id = client.get(f"/videos/{video.video_id}/comments/").json()[0]["comment_id"]
+    assert client.delete(f"/videos/{video.video_id}/comments/{comment_id}", headers=viewer_auth).status_code == 204
+    r = client.get(feed)
+    assert r.headers["X-Cache"] == "MISS"
+    assert _feed_item(r, video.video_id)["stats"]["comment_count"] == 0
+
+
+def test_rating_refreshes_summaries_and_the_expanded_feed(client, video, viewer_auth):
+    urls = [f"/videos/{video.video_id}/ratings/summary", f"/videos/ratings/summary?ids={video.video_id}",
+            "/videos/?limit=100&expand=stats"]
+    for url in urls:
+        _warm(client, url)
+
+    assert client.put(f"/videos/{video.video_id}/ratings/", json={"rating": 4}, headers=viewer_auth).status_code == 200
+    assert [client.get(url).headers["X-Cache"] for url in urls] == ["MISS"] * len(urls)
+    assert client.get(urls[0]).json()["count"] == 1
+    assert client.get(urls[1]).json()[str(video.video_id)]["count"] == 1
+    assert _feed_item(client.get(urls[2]), video.video_id)["stats"]["rating_count"] == 1
+
+
+def test_deleting_a_user_drops_every_entry(client, db, video, creator):
+    admin = models.User(email="cache-admin@example.com", username="cache-admin", hashed_password="x", role=models.UserRole.admin)
+    db.add(admin); db.commit()
+    _warm(client, f"/users/{creator.user_id}")
+    _warm(client, f"/videos/{video.video_id}")
+
+    admin_auth = {"Authorization": f"Bearer {utils.create_access_token({'sub': str(admin.user_id)})}"}
+    assert client.delete(f"/users/{creator.user_id}", headers=admin_auth).status_code == 204
+    assert client.get(f"/users/{creator.user_id}").status_code == 404
+    assert client.get(f"/videos/{video.video_id}").status_code == 404
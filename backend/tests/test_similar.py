@@ -0,0 +1,156 @@
+# tests/test_similar.py
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, models, similar
+from app.settings import settings
+
+pytestmark = pytest.mark.skipif(not similar.available(), reason="needs numpy and scipy")
+
+
+@pytest.fixture(autouse=True)
+def short_lists(monkeypatch):
+    monkeypatch.setattr(settings, "SIMILAR_NEIGHBORS", 3)
+    monkeypatch.setattr(settings, "SIMILAR_MIN_COMMON_RATERS", 1)
+    monkeypatch.setattr(similar, "MAX_REACH", 1.0)  # small catalogs: every change reaches most lists
+
+
+def _users(db, n: int) -> list[int]:
+    first = db.query(models.User).count()
+    users = [models.User(email=f"rater{first + i}@example.com", username=f"rater{first + i}", hashed_password="x")
+             for i in range(n)]
+    db.add_all(users); db.commit()
+    return [u.user_id for u in users]
+
+
+def _videos(db, creator, n: int) -> list[int]:
+    videos = [models.Video(title=f"v{i}", creator_id=creator.user_id) for i in range(n)]
+    db.add_all(videos); db.commit()
+    return [v.video_id for v in videos]
+
+
+def _pass(db) -> bool:
+    """One pass, stored; returns whether it rebuilt every list."""
+    version, lists, full, seen_at = similar.compute(db)
+    assert similar.store(db, version, lists, full, seen_at) is not None
+    return full
+
+
+def _settle(db):
+    """Move the watermark past every change so far: the next pass sees only what follows."""
+    past = datetime.utcnow() - timedelta(hours=1)
+    db.query(models.SimilarState).update({models.SimilarState.stats_seen_at: past})
+    db.query(models.VideoRatingStats).update({models.VideoRatingStats.updated_at: past})
+    db.commit()
+
+
+def _start(db):
+    similar.rebuild(db)
+    assert _pass(db)
+    _settle(db)
+
+
+def _stored(db, video_ids) -> similar.Lists:
+    N = models.VideoNeighbor
+    lists = {}
+    for vid, nid, score in db.query(N.video_id, N.neighbor_id, N.score).filter(N.video_id.in_(video_ids)):
+        lists.setdefault(vid, {})[nid] = score
+    return lists
+
+
+def _assert_same_lists(got: similar.Lists, want: similar.Lists, video_ids):
+    for vid in video_ids:
+        g, w = got.get(vid, {}), want.get(vid, {})
+        assert sorted(g.values()) == pytest.approx(sorted(w.values()), abs=1e-5), vid
+        # members may differ only among ties for the last place
+        cutoff = min(w.values(), default=0.0) + 1e-5
+        assert {n for n, s in g.items() if s > cutoff} == {n for n, s in w.items() if s > cutoff}, vid
+
+
+def test_incremental_passes_match_a_rebuild(db, creator):
+    rng = random.Random(7)
+    users, videos = _users(db, 25), _videos(db, creator, 30)
+    for user in users:
+        for video in rng.sample(videos, 5):
+            crud.upsert_rating(db, video, user, rng.randint(1, 5))
+    _start(db)
+
+    for _ in range(8):
+        for _ in range(4):
+            crud.upsert_rating(db, rng.choice(videos), rng.choice(users), rng.randint(1, 5))
+        assert not _pass(db)
+        _settle(db)
+        _assert_same_lists(_stored(db, videos), similar._build(db), videos)
+
+
+@pytest.fixture
+def triangle(db, creator):
+    """A, B and C rated by u1 and u2; A's one-entry list holds B (cosine 1), C trails at 0.83."""
+    (u1, u2, u3), (a, b, c) = _users(db, 3), _videos(db, creator, 3)
+    for user, video, stars in ((u1, a, 5), (u2, a, 5), (u1, b, 5), (u2, b, 5), (u1, c, 5), (u2, c, 1)):
+        crud.upsert_rating(db, video, user, stars)
+    return (u1, u2, u3), (a, b, c)
+
+
+def test_list_whose_member_lost_score_is_recomputed(db, triangle, monkeypatch):
+    monkeypatch.setattr(settings, "SIMILAR_NEIGHBORS", 1)
+    (_, _, u3), (a, b, c) = triangle
+    _start(db)
+    assert _stored(db, [a])[a].keys() == {b}
+
+    recomputed = []
+    recompute = similar._recompute
+    monkeypatch.setattr(similar, "_recompute", lambda db, ids: recomputed.extend(ids) or recompute(db, ids))
+    crud.upsert_rating(db, b, u3, 5)  # cos(A, B) drops to 0.82: C now beats B
+    assert not _pass(db)
+    assert a in recomputed
+    assert _stored(db, [a])[a].keys() == {c}
+
+
+def test_too_many_changes_rebuild(db, triangle, monkeypatch):
+    (u1, u2, u3), (a, b, c) = triangle
+    _start(db)
+    monkeypatch.setattr(similar, "MAX_DIRTY", 2)
+    for video in (a, b, c):
+        crud.upsert_rating(db, video, u3, 3)
+    assert _pass(db)
+
+
+def test_changes_reaching_most_lists_rebuild(db, triangle, monkeypatch):
+    (u1, u2, u3), (a, b, c) = triangle
+    _start(db)
+    monkeypatch.setattr(similar, "MAX_REACH", 0.0)
+    crud.upsert_rating(db, a, u1, 4)
+    assert _pass(db)
+
+
+def test_store_drops_a_pass_that_lost_the_race(db, triangle):
+    (u1, u2, u3), (a, b, c) = triangle
+    _start(db)
+    crud.upsert_rating(db, a, u3, 1)
+    stale = similar.compute(db)
+    assert not _pass(db)  # another worker's pass commits first
+    before = _stored(db, [a, b, c])
+    _settle(db)
+
+    assert similar.store(db, *stale) is None
+    assert _stored(db, [a, b, c]) == before
+
+
+def test_first_passes_racing_to_create_the_state(db, triangle):
+    similar.rebuild(db)
+    first, second = similar.compute(db), similar.compute(db)
+    assert first[0] == second[0] == 0
+    assert similar.store(db, *first) is not None
+    assert similar.store(db, *second) is None
+
+
+def test_similar_endpoint(client, db, triangle):
+    _, (a, b, c) = triangle
+    _start(db)
+    r = client.get(f"/videos/{a}/similar")
+    assert r.status_code == 200
+    assert [v["video_id"] for v in r.json()] == [b, c]  # cosine 1, then 0.83
+    assert client.get("/videos/999999/similar").status_code == 404
@@ -0,0 +1,87 @@
+# tests/test_sql_profiler.py
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import crud, models
+from app.database import SessionLocal
+from app.main import app
+from app.sql_profiler import HEADER, SQLProfilerMiddleware, normalize, profile, query_budget
+
+
+@pytest.mark.parametrize("statement, shape", [
+    ("SELECT * FROM videos WHERE video_id = 42 AND title = 'it''s'", "SELECT * FROM videos WHERE video_id = ? AND title = ?"),
+    ("SELECT *\n  FROM videos\n WHERE video_id = :video_id_1", "SELECT * FROM videos WHERE video_id = ?"),
+    ("SELECT * FROM videos WHERE video_id IN (?, ?, ?)", "SELECT * FROM videos WHERE video_id IN (...)"),
+    ("SELECT * FROM videos WHERE video_id IN (%(p_1)s, %(p_2)s)", "SELECT * FROM videos WHERE video_id IN (...)"),
+    ("INSERT INTO comments (video_id, user_id) VALUES (?, ?), (?, ?), (?, ?)", "INSERT INTO comments (video_id, user_id) VALUES (?, ?), ..."),
+    ("SELECT * FROM t WHERE a = $1 AND b = 3.5", "SELECT * FROM t WHERE a = ? AND b = ?"),
+])
+def test_normalize(statement, shape):
+    assert normalize(statement) == shape
+
+
+def test_in_lists_of_any_length_share_a_shape():
+    assert normalize("SELECT 1 FROM t WHERE id IN (?, ?)") == normalize("SELECT 1 FROM t WHERE id IN (?, ?, ?, ?, ?)")
+
+
+@pytest.fixture
+def videos(db, creator):
+    rows = [models.Video(title=f"v{i}", creator_id=creator.user_id) for i in range(6)]
+    db.add_all(rows); db.commit()
+    return [v.video_id for v in rows]
+
+
+def test_profile_flags_a_repeated_shape_as_n_plus_one(videos):
+    with SessionLocal() as db, profile() as captured:
+        for video_id in videos:
+            crud.get_video(db, video_id)
+        db.execute(text("SELECT 1")).all()
+
+    assert captured.count == len(videos) + 1
+    (shape, times, sites), = captured.n_plus_one(threshold=5)
+    assert times == len(videos) and "FROM videos" in shape
+    assert sites == [sites[0]] and sites[0].startswith("app/crud.py:")
+
+
+def test_query_budget(videos):
+    with SessionLocal() as db:
+        with query_budget(2):
+            crud.get_video(db, videos[0])
+            crud.get_video(db, videos[1])
+
+        with pytest.raises(AssertionError, match="3 SQL statements, budget 2"):
+            with query_budget(2):
+                for video_id in videos[:3]:
+                    crud.get_video(db, video_id)
+
+        with pytest.raises(AssertionError, match="N\\+1"):
+            with query_budget(10):
+                for video_id in videos:
+                    crud.get_video(db, video_id)
+
+        with query_budget(10, n_plus_one=True) as captured:
+            for video_id in videos:
+                crud.get_video(db, video_id)
+        assert captured.count == len(videos)
+
+
+def test_middleware_reports_and_logs(videos, caplog):
+    client = TestClient(SQLProfilerMiddleware(app))
+    r = client.get("/videos/?limit=5")
+    assert r.status_code == 200
+    assert r.headers[HEADER].startswith("queries=1; time_ms=") and r.headers[HEADER].endswith("n_plus_one=0; slow=0")
+
+    looping = FastAPI()
+    @looping.get("/loop")
+    def loop():
+        with SessionLocal() as db:
+            return [crud.get_video(db, video_id).title for video_id in videos]
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        r = TestClient(SQLProfilerMiddleware(looping)).get("/loop")
+    assert f"queries={len(videos)};" in r.headers[HEADER] and "n_plus_one=1" in r.headers[HEADER]
+    assert any("possible N+1 in GET /loop" in message for message in caplog.messages)
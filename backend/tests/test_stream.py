@@ -0,0 +1,33 @@
+# tests/test_stream.py
+from pathlib import Path
+
+from app import models
+from app.settings import settings
+
+
+def _video(db, creator, blob_uri: str) -> int:
+    video = models.Video(title="clip", blob_uri=blob_uri, creator_id=creator.user_id)
+    db.add(video); db.commit()
+    return video.video_id
+
+
+def test_stream_serves_ranges_from_the_upload_dir(client, db, creator):
+    root = Path(settings.LOCAL_DEV_UPLOAD_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "clip.mp4").write_bytes(b"0123456789")
+    video_id = _video(db, creator, "/static/clip.mp4")
+
+    r = client.get(f"/videos/{video_id}/stream", headers={"Range": "bytes=2-5"})
+    assert r.status_code == 206
+    assert r.content == b"2345"
+
+
+def test_stream_rejects_paths_outside_the_upload_dir(client, db, creator):
+    root = Path(settings.LOCAL_DEV_UPLOAD_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    (root.parent / "secret.txt").write_bytes(b"TOP SECRET")
+
+    for blob_uri in ("/static/../secret.txt", "/static/a/../../secret.txt", "/static/" + str(root.parent / "secret.txt")):
+        r = client.get(f"/videos/{_video(db, creator, blob_uri)}/stream")
+        assert r.status_code == 404
+        assert b"TOP SECRET" not in r.content
@@ -0,0 +1,52 @@
+# tests/test_uploads.py
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import crud, models
+from app.routers.uploads import MAX_CHUNKS
+from app.storage import get_storage
+
+
+def _create(client, headers, size: int, chunk_size: int | None = None) -> dict:
+    r = client.post("/uploads/", json={"filename": "clip.mp4", "content_type": "video/mp4", "size": size, "chunk_size": chunk_size},
+                    headers=headers)
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+def test_large_uploads_get_chunks_big_enough_to_commit(client, creator_auth):
+    size = 20 * 1024 ** 3
+    upload = _create(client, creator_auth, size, chunk_size=256 * 1024)
+    assert upload["chunk_count"] <= MAX_CHUNKS
+    assert upload["chunk_size"] * upload["chunk_count"] >= size
+    assert client.delete(f"/uploads/{upload['upload_id']}", headers=creator_auth).status_code == 204
+
+
+def test_concurrent_completes_create_one_video(client, db, creator, creator_auth, monkeypatch):
+    upload = _create(client, creator_auth, 1000)
+    url = f"/uploads/{upload['upload_id']}"
+    assert client.put(f"{url}/chunks/0", content=b"x" * 1000, headers=creator_auth).status_code == 204
+
+    # both requests have checked the session before either finishes it
+    both_checked, get_upload_chunks = threading.Barrier(2, timeout=10), crud.get_upload_chunks
+    def checked(*args):
+        chunks = get_upload_chunks(*args)
+        both_checked.wait()
+        return chunks
+    monkeypatch.setattr(crud, "get_upload_chunks", checked)
+
+    # like Azure's commit_block_list, committing the staged chunks twice succeeds (the local move wouldn't)
+    storage = get_storage()
+    async def stage_commit(upload_id, key, chunk_count, content_type=None):
+        storage._path(key).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(storage._staged(upload_id), storage._path(key))
+        return storage.prefix + key
+    monkeypatch.setattr(storage, "stage_commit", stage_commit)
+
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda _: client.post(f"{url}/complete", json={"title": "raced"}, headers=creator_auth), range(2)))
+
+    assert sorted(r.status_code for r in responses) == [201, 409]
+    assert db.query(models.Video).filter_by(title="raced").count() == 1
+    assert db.query(models.Blob).count() == db.query(models.Blob.blob_uri).distinct().count()
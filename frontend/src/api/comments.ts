@@ -1,10 +1,18 @@
 import { api } from '@/api/client';
 import type { Comment } from '@/types/api';
 
-/** GET /videos/{videoId}/comments/ */
-export async function listComments(videoId: number): Promise<Comment[]> {
-  const { data } = await api.get<Comment[]>(`/videos/${videoId}/comments/`);
-  return data;
+export type CommentPage = { items: Comment[]; nextCursor: string | null };
+
+/** GET /videos/{videoId}/comments/ — newest first; pass the previous page's `nextCursor` to continue. */
+export async function listComments(
+  videoId: number,
+  cursor: string | null = null,
+  limit = 50
+): Promise<CommentPage> {
+  const params: Record<string, string | number> = { limit };
+  if (cursor) params.cursor = cursor;
+  const res = await api.get<Comment[]>(`/videos/${videoId}/comments/`, { params });
+  return { items: res.data, nextCursor: res.headers['x-next-cursor'] ?? null };
 }
 
 /** POST /videos/{videoId}/comments/  body: { comment_text } */
@@ -7,6 +7,12 @@ export async function getRatingSummary(videoId: number): Promise<RatingSummary>
   return data as RatingSummary;
 }
 
+/** GET /videos/ratings/summary?ids=1,2,3 — one request for a whole feed page (max 100 ids) */
+export async function getRatingSummaries(videoIds: number[]): Promise<Record<number, RatingSummary>> {
+  const { data } = await api.get('/videos/ratings/summary', { params: { ids: videoIds.join(',') } });
+  return data as Record<number, RatingSummary>;
+}
+
 /** PUT /videos/{video_id}/ratings/ { rating: number } */
 export async function rateVideo(videoId: number, rating: number) {
   const { data } = await api.put(`/videos/${videoId}/ratings/`, { rating });
@@ -0,0 +1,101 @@
+import { api } from './client';
+import type { Video } from '@/types/api';
+import type { UploadPayload } from './videos';
+
+/** GET/POST /uploads — a resumable upload session */
+export type UploadSession = {
+  upload_id: string;
+  size: number;
+  chunk_size: number;
+  chunk_count: number;
+  /** inclusive chunk-index ranges the server already has */
+  received: [number, number][];
+  received_bytes: number;
+  complete: boolean;
+  expires_at: string;
+};
+
+const PARALLEL_CHUNKS = 4;
+const MAX_RETRIES = 6;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Same file (name/size/mtime) after a reload or dropped connection → same session.
+const resumeKey = (file: File) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+async function openSession(file: File): Promise<UploadSession> {
+  const saved = localStorage.getItem(resumeKey(file));
+  if (saved) {
+    try {
+      const { data } = await api.get<UploadSession>(`/uploads/${saved}`);
+      return data;
+    } catch {
+      localStorage.removeItem(resumeKey(file)); // expired or finished elsewhere
+    }
+  }
+  const { data } = await api.post<UploadSession>('/uploads/', {
+    filename: file.name,
+    content_type: file.type,
+    size: file.size,
+  });
+  localStorage.setItem(resumeKey(file), data.upload_id);
+  return data;
+}
+
+async function putChunk(session: UploadSession, file: File, index: number): Promise<void> {
+  const start = index * session.chunk_size;
+  const body = file.slice(start, Math.min(start + session.chunk_size, session.size));
+  for (let attempt = 0; ; attempt++) {
+    try {
+      await api.put(`/uploads/${session.upload_id}/chunks/${index}`, body, {
+        headers: { 'Content-Type': 'application/octet-stream' },
+      });
+      return;
+    } catch (err: any) {
+      const status: number | undefined = err?.response?.status;
+      // network errors, 5xx, 408 and 429 are worth retrying; other 4xx won't improve
+      const retryable = !status || status >= 500 || status === 408 || status === 429;
+      if (!retryable || attempt >= MAX_RETRIES) throw err;
+      await sleep(Math.min(500 * 2 ** attempt, 15_000));
+    }
+  }
+}
+
+/**
+ * Chunked, parallel, resumable upload: only the chunks the server is missing
+ * are sent, several at a time, each retried with backoff.
+ */
+export async function uploadVideoResumable(
+  payload: UploadPayload,
+  onProgress?: (pct: number) => void
+): Promise<Video> {
+  const { file } = payload;
+  const session = await openSession(file);
+
+  const have = new Set<number>();
+  for (const [first, last] of session.received) for (let i = first; i <= last; i++) have.add(i);
+  const queue = Array.from({ length: session.chunk_count }, (_, i) => i).filter((i) => !have.has(i));
+
+  let sent = session.received_bytes;
+  const report = () => onProgress?.(Math.round((sent / session.size) * 100));
+  report();
+
+  const workers = Array.from({ length: Math.min(PARALLEL_CHUNKS, queue.length) }, async () => {
+    for (let i = queue.shift(); i !== undefined; i = queue.shift()) {
+      await putChunk(session, file, i);
+      sent += Math.min(session.chunk_size, session.size - i * session.chunk_size);
+      report();
+    }
+  });
+  await Promise.all(workers);
+
+  const { data } = await api.post<Video>(`/uploads/${session.upload_id}/complete`, {
+    title: payload.title,
+    publisher: payload.publisher || null,
+    producer: payload.producer || null,
+    genre: payload.genre || null,
+    age_rating: payload.age_rating || null,
+  });
+  localStorage.removeItem(resumeKey(file));
+  return data;
+}
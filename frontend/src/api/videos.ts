@@ -7,11 +7,34 @@ export async function fetchVideos(skip = 0, limit = 12): Promise<Video[]> {
   return data;
 }
 
+export type VideoPage = { items: Video[]; nextCursor: string | null };
+
+/** Keyset page of the feed; pass the previous page's `nextCursor` to continue. */
+export async function fetchVideoPage(cursor: string | null, limit = 12): Promise<VideoPage> {
+  const params: Record<string, string | number> = { limit };
+  if (cursor) params.cursor = cursor;
+  const res = await api.get<Video[]>('/videos/', { params });
+  return { items: res.data, nextCursor: res.headers['x-next-cursor'] ?? null };
+}
+
+/** GET /videos/search — ranked full-text search (prefix match on every word). */
+export async function searchVideos(q: string, genre?: string, limit = 24): Promise<Video[]> {
+  const params: Record<string, string | number> = { q, limit };
+  if (genre) params.genre = genre;
+  const { data } = await api.get<Video[]>('/videos/search', { params });
+  return data;
+}
+
 export async function fetchVideo(id: number): Promise<Video> {
   const { data } = await api.get<Video>(`/videos/${id}`);
   return data;
 }
 
+/** Range-capable playback URL (GET /videos/{id}/stream) for <video src>. */
+export function videoStreamUrl(id: number): string {
+  return `${api.defaults.baseURL ?? ''}/videos/${id}/stream`;
+}
+
 export type UploadPayload = {
   title: string;
   file: File;
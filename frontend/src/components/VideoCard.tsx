@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import type { Video } from '@/types/api';
 import { motion } from 'framer-motion';
 import { Eye } from 'lucide-react';
+import { formatDuration } from '@/lib/utils';
 
 type Props = { video: Video };
 
@@ -38,6 +39,12 @@ export default function VideoCard({ video }: Props) {
           {/* Gradient overlay for readability */}
           <div className="pointer-events-none absolute inset-0 bg-gradient-to-t from-black/80 via-black/15 to-transparent" />
 
+          {video.duration_seconds != null && (
+            <span className="pointer-events-none absolute bottom-2 right-2 rounded bg-black/75 px-1.5 py-0.5 text-[11px] font-medium tabular-nums text-white">
+              {formatDuration(video.duration_seconds)}
+            </span>
+          )}
+
           {/* Hover 'Preview' badge (same as My Videos) */}
           <div className="pointer-events-none absolute inset-0 flex items-end justify-start p-3 opacity-0 transition-opacity duration-200 group-hover:opacity-100">
             <span className="inline-flex items-center gap-2 rounded-full bg-black/60 px-3 py-1.5 text-xs font-medium text-white ring-1 ring-white/10 backdrop-blur">
@@ -1,3 +1,12 @@
 export function cn(...inputs: Array<string | undefined | false | null>) {
   return inputs.filter(Boolean).join(' ');
-}
\ No newline at end of file
+}
+
+/** 75.4 -> "1:15", 3725 -> "1:02:05" */
+export function formatDuration(seconds: number): string {
+  const total = Math.round(seconds);
+  const h = Math.floor(total / 3600);
+  const m = Math.floor((total % 3600) / 60);
+  const s = String(total % 60).padStart(2, '0');
+  return h ? `${h}:${String(m).padStart(2, '0')}:${s}` : `${m}:${s}`;
+}
@@ -1,10 +1,11 @@
 import React, { useMemo, useState } from 'react';
-import { useInfiniteQuery } from '@tanstack/react-query';
-import { fetchVideos } from '@/api/videos';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
+import { fetchVideoPage, searchVideos } from '@/api/videos';
 import VideoCard from '@/components/VideoCard';
 import { VideoCardSkeleton } from '@/components/Skeleton';
 import Spinner from '@/components/Spinner';
 import { useInfiniteScroll } from '@/hooks/useInfiniteScroll';
+import { useDebouncedValue } from '@/hooks/useDebouncedValue';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Search, SlidersHorizontal } from 'lucide-react';
 
@@ -16,30 +17,32 @@ export default function Feed() {
 
   const query = useInfiniteQuery({
     queryKey: ['videos'],
-    queryFn: ({ pageParam = 0 }) => fetchVideos(pageParam, PAGE),
-    initialPageParam: 0,
-    getNextPageParam: (lastPage, allPages) => {
-      if (!lastPage || lastPage.length < PAGE) return undefined;
-      return allPages.flat().length; // next skip
-    },
+    queryFn: ({ pageParam }) => fetchVideoPage(pageParam, PAGE),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage?.nextCursor ?? undefined,
   });
 
-  const flat = useMemo(() => (query.data?.pages ?? []).flat(), [query.data?.pages]);
+  const flat = useMemo(
+    () => (query.data?.pages ?? []).flatMap((p) => p.items),
+    [query.data?.pages]
+  );
+
+  // Text search goes to the server index; the feed itself is only filtered by genre.
+  const term = useDebouncedValue(q.trim());
+  const searchGenre = useDebouncedValue(genre.trim());
+  const searchQ = useQuery({
+    queryKey: ['video-search', term, searchGenre],
+    queryFn: () => searchVideos(term, searchGenre || undefined),
+    enabled: !!term,
+  });
 
   const filtered = useMemo(() => {
-    const term = q.trim().toLowerCase();
-    return flat.filter((v) => {
-      const matchesText =
-        !term ||
-        [v.title, v.publisher, v.producer, v.genre]
-          .filter(Boolean)
-          .some((x) => (x as string).toLowerCase().includes(term));
-      const matchesGenre = !genre || (v.genre || '').toLowerCase() === genre.toLowerCase();
-      return matchesText && matchesGenre;
-    });
-  }, [flat, q, genre]);
+    if (term) return searchQ.data ?? [];
+    return flat.filter((v) => !genre || (v.genre || '').toLowerCase() === genre.toLowerCase());
+  }, [term, searchQ.data, flat, genre]);
 
-  const canLoadMore = !!query.hasNextPage && !query.isFetchingNextPage;
+  const loading = query.status === 'pending' || (!!term && searchQ.status === 'pending');
+  const canLoadMore = !term && !!query.hasNextPage && !query.isFetchingNextPage;
   const sentinelRef = useInfiniteScroll(() => query.fetchNextPage(), canLoadMore);
 
   return (
@@ -78,7 +81,7 @@ export default function Feed() {
         </div>
 
         {/* Grid */}
-        {query.status === 'pending' ? (
+        {loading ? (
           <div className="grid grid-cols-1 gap-5 sm:grid-cols-2 lg:grid-cols-3">
             {Array.from({ length: 9 }).map((_, i) => (
               <VideoCardSkeleton key={i} />
@@ -113,7 +116,7 @@ export default function Feed() {
                 <Spinner label="Loading more…" />
               </div>
             )}
-            {!query.hasNextPage && flat.length > 0 && (
+            {!term && !query.hasNextPage && flat.length > 0 && (
               <p className="mt-6 text-center text-sm text-neutral-500">You’re all caught up.</p>
             )}
           </>
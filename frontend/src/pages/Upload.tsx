@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { useMutation } from '@tanstack/react-query';
-import { uploadVideo } from '@/api/videos';
+import { uploadVideoResumable } from '@/api/uploads';
 import { useToast } from '@/components/Toast';
 import { Button } from '@/components/ui/button';
 import { useNavigate } from 'react-router-dom';
@@ -10,7 +10,7 @@ import { getHttpErrorMessage } from '@/lib/httpError';
 import { motion } from 'framer-motion';
 import { UploadCloud, BadgePlus, Film, Info } from 'lucide-react';
 
-const MAX_BYTES = 90 * 1024 * 1024; // keep under typical App Service limit
+const MAX_BYTES = 20 * 1024 * 1024 * 1024; // resumable uploads send small chunks, so no per-request cap applies
 const ALLOWED = new Set(['video/mp4', 'video/webm', 'video/quicktime']);
 
 export default function Upload() {
@@ -27,7 +27,7 @@ export default function Upload() {
 
   const mut = useMutation({
     mutationFn: () =>
-      uploadVideo(
+      uploadVideoResumable(
         { title, file: file as File, publisher, producer, genre, age_rating: ageRating },
         (p) => setPct(p)
       ),
@@ -53,8 +53,8 @@ export default function Upload() {
       return;
     }
     if (file.size > MAX_BYTES) {
-      const mb = (file.size / (1024 * 1024)).toFixed(1);
-      notify(`File too large (${mb} MB). Choose a video under 90 MB.`, 'error');
+      const gb = (file.size / (1024 * 1024 * 1024)).toFixed(1);
+      notify(`File too large (${gb} GB). Choose a video under 20 GB.`, 'error');
       return;
     }
     if (role !== 'creator' && role !== 'admin') {
@@ -93,7 +93,7 @@ export default function Upload() {
               </p>
             </div>
             <div className="flex items-center gap-2 text-xs text-neutral-400">
-              <Info size={14} /> Max ~90MB • mp4, webm, mov
+              <Info size={14} /> Max 20GB • resumes if interrupted • mp4, webm, mov
             </div>
           </div>
 
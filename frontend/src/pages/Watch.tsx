@@ -1,8 +1,8 @@
-import React from 'react';
+import React, { useMemo } from 'react';
 import { useParams } from 'react-router-dom';
-import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
 
-import { fetchVideo } from '@/api/videos';
+import { fetchVideo, videoStreamUrl } from '@/api/videos';
 import { listComments, addComment, updateComment, deleteComment } from '@/api/comments';
 import { getRatingSummary, rateVideo } from '@/api/ratings';
 
@@ -11,10 +11,14 @@ import RatingStars from '@/components/RatingStars';
 import CommentComposer from '@/components/comments/CommentComposer';
 import CommentList from '@/components/comments/CommentList';
 import { Skeleton } from '@/components/Skeleton';
+import Spinner from '@/components/Spinner';
 import { useToast } from '@/components/Toast';
 import { useAuth } from '@/context/AuthContext';
+import { useInfiniteScroll } from '@/hooks/useInfiniteScroll';
 import { motion } from 'framer-motion';
 
+const COMMENT_PAGE = 50;
+
 export default function Watch() {
   const { id } = useParams<{ id: string }>();
   const videoId = Number(id);
@@ -30,12 +34,22 @@ export default function Watch() {
   });
 
   // ----- Comments -----
-  const commentsQ = useQuery({
+  const commentsQ = useInfiniteQuery({
     queryKey: ['comments', videoId],
-    queryFn: () => listComments(videoId),
+    queryFn: ({ pageParam }) => listComments(videoId, pageParam, COMMENT_PAGE),
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage?.nextCursor ?? undefined,
     enabled: Number.isFinite(videoId),
   });
 
+  const comments = useMemo(
+    () => (commentsQ.data?.pages ?? []).flatMap((p) => p.items),
+    [commentsQ.data?.pages]
+  );
+
+  const canLoadMoreComments = !!commentsQ.hasNextPage && !commentsQ.isFetchingNextPage;
+  const commentsSentinelRef = useInfiniteScroll(() => commentsQ.fetchNextPage(), canLoadMoreComments);
+
   const addMut = useMutation({
     mutationFn: (text: string) => addComment(videoId, text),
     onSuccess: () => qc.invalidateQueries({ queryKey: ['comments', videoId] }),
@@ -107,7 +121,7 @@ export default function Watch() {
           transition={{ duration: 0.25 }}
           className="rounded-2xl border border-brand-line bg-brand-card/80 p-3 shadow-card backdrop-blur"
         >
-          <VideoPlayer src={v.blob_uri ?? ''} className="w-full" />
+          <VideoPlayer src={v.blob_uri ? videoStreamUrl(v.video_id) : ''} className="w-full" />
 
           <div className="mt-3 px-1">
             <h1 className="display text-2xl text-white">{v.title}</h1>
@@ -170,17 +184,25 @@ export default function Watch() {
                 <Skeleton className="h-16 w-full rounded-2xl" />
               </div>
             ) : (
-              <CommentList
-                comments={commentsQ.data ?? []}
-                currentUserId={user?.user_id}
-                isAdmin={role === 'admin'}
-                onEdit={async (id, text) => {
-                  await editMut.mutateAsync({ id, text });
-                }}
-                onDelete={async (id) => {
-                  await delMut.mutateAsync(id);
-                }}
-              />
+              <>
+                <CommentList
+                  comments={comments}
+                  currentUserId={user?.user_id}
+                  isAdmin={role === 'admin'}
+                  onEdit={async (id, text) => {
+                    await editMut.mutateAsync({ id, text });
+                  }}
+                  onDelete={async (id) => {
+                    await delMut.mutateAsync(id);
+                  }}
+                />
+                <div ref={commentsSentinelRef} className="h-8 w-full" />
+                {commentsQ.isFetchingNextPage && (
+                  <div className="mt-4 flex justify-center">
+                    <Spinner label="Loading more…" />
+                  </div>
+                )}
+              </>
             )}
           </div>
         </div>
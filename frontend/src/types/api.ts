@@ -24,6 +24,16 @@ export interface Video {
   blob_uri?: string | null;
   upload_date: string;
   creator_id: number;
+  /** filled in after upload by the processing pipeline */
+  processing_status?: 'pending' | 'processing' | 'ready' | 'failed';
+  duration_seconds?: number | null;
+  width?: number | null;
+  height?: number | null;
+  size_bytes?: number | null;
+  /** present with GET /videos/?expand=creator */
+  creator?: { user_id: number; username: string; display_name?: string | null };
+  /** present with GET /videos/?expand=stats */
+  stats?: { rating_average: number; rating_count: number; comment_count: number };
 }
 
 export interface Comment {
@@ -38,4 +48,6 @@ export interface RatingSummary {
   video_id: number;
   average: number;
   count: number;
+  /** stars (1-5) -> number of ratings */
+  histogram?: Record<string, number>;
 }